@@ -1,90 +1,161 @@
 from flask import Flask, render_template, Response, jsonify, request, redirect, url_for, flash, send_file
-import cv2
+import io
+import json
 import os
 import pickle
-import pandas as pd
-from datetime import datetime, date
+from datetime import datetime
 import threading
-import time
+import zipfile
 from camera import VideoCamera
+from camera_stream import CameraStream
+from load_shedding import OverloadController, PRIORITY_ATTENDANCE
+from registration import RegistrationIngest
+from bulk_import import BulkImporter
+from batch_recognition import BatchRecognizer
+from pipeline_trace import TraceRecorder
 from face_recognition_module import FaceRecognizer
+from detectors import create_detector
+from sharding import ShardCoordinator
+from recognition_cache import RecognitionCache
 from train_model import FaceTrainer
-from utils.helpers import format_time, get_attendance_stats, ensure_directories
+from utils.helpers import format_time, get_attendance_stats, ensure_directories, is_late_arrival, load_attendance_records
+from utils.events import EventBroadcaster
+from utils.attendance_log import AttendanceLog
+from utils.attendance_archive import AttendanceArchive
+from utils.student_registry import StudentRegistry
+from utils.dataset_index import DatasetIndex
+from utils.startup import record_phase, startup_report, print_startup_report
 
 app = Flask(__name__)
 app.secret_key = 'facetrack_pro_secret_key_2024'
+# Deployment settings; any of them can be overridden in face-track-pro/config.json
+app.config.from_mapping(
+    BULK_IMPORT_ROOT='face-track-pro/imports',  # Server-side bulk import sources must be under here
+    MAX_CONTENT_LENGTH=512 * 1024 * 1024,  # Larger request bodies are rejected with 413
+    RECOGNITION_CACHE_TTL=2.0,  # Seconds a track's recognition result is reused
+    RECOGNITION_CACHE_MAX_ENTRIES=256,  # Tracks kept in the recognition cache, across all cameras
+    # Cameras by ID; 'low' priority cameras have their detection slowed first under overload,
+    # and a camera's own 'detector' entry overrides DETECTOR for it
+    CAMERAS=[{'id': 'default', 'source': 0, 'priority': PRIORITY_ATTENDANCE}],
+    DETECTOR={'backend': 'hog', 'scale': 0.25, 'upsample': 1},  # create_detector() backend and options
+    SHARDS=[],  # Gallery shard URLs (sharding.py serve); empty matches against the local gallery
+    SHARD_TIMEOUT=0.5,  # Seconds before a shard is skipped for a frame
+)
+app.config.from_file('config.json', load=json.load, silent=True)
 
 # Global variables
-video_camera = None
 face_recognizer = None
-attendance_logged_today = set()  # Track who's already logged today
+camera_streams = {}  # One recognition loop and IdentityVoter per camera, shared by its viewers
+camera_streams_lock = threading.Lock()
 is_camera_active = False
+event_broadcaster = EventBroadcaster()  # Push channel for the dashboard
+attendance_log = AttendanceLog(archive=AttendanceArchive())  # Closed days roll into the archive
+dataset_index = DatasetIndex()  # Image counts and encode status per student, reconciled in the background
+# One bulk enrolment at a time, run in the background
+bulk_importer = BulkImporter(dataset_index=dataset_index, import_root=app.config['BULK_IMPORT_ROOT'],
+                             calibrate='keep')
+bulk_import_thread = None
+# Sheds viewer overlay, preview FPS, then low-priority detection when the camera loops fall behind
+overload_controller = OverloadController(
+    on_change=lambda decision: event_broadcaster.publish('load_shedding', decision)
+)
+
+batch_recognizer = None  # Created on the first /recognize request
+trace_recorder = None  # Set while a pipeline trace is being recorded
+trace_lock = threading.Lock()
+TRACE_DIR = 'face-track-pro/traces'
 
 def initialize_system():
-    """Initialize the FaceTrack Pro system"""
+    """Initialize the FaceTrack Pro system without blocking the server start"""
     global face_recognizer
     ensure_directories()
-    face_recognizer = FaceRecognizer()
-    face_recognizer.load_model()
-
-def gen(camera):
-    """Video streaming generator function."""
-    global attendance_logged_today
+    dataset_index.start()
+    face_recognizer = FaceRecognizer(detector=create_detector(**app.config['DETECTOR']),
+                                     recognition_cache=RecognitionCache(
+        ttl=app.config['RECOGNITION_CACHE_TTL'], max_entries=app.config['RECOGNITION_CACHE_MAX_ENTRIES']))
+    if app.config['SHARDS']:
+        face_recognizer.shard_coordinator = ShardCoordinator(app.config['SHARDS'], timeout=app.config['SHARD_TIMEOUT'])
+    face_recognizer.unknown_faces.purge_crops()
     
-    while True:
-        if not is_camera_active:
-            time.sleep(0.1)
-            continue
-            
-        frame = camera.get_frame()
-        if frame is not None:
-            # Process frame for face recognition
-            processed_frame, detected_names = face_recognizer.process_frame(frame)
-            
-            # Log attendance for new faces detected
-            current_date = date.today().strftime("%Y-%m-%d")
-            for name in detected_names:
-                if name != "Unknown" and f"{name}_{current_date}" not in attendance_logged_today:
-                    log_attendance(name)
-                    attendance_logged_today.add(f"{name}_{current_date}")
-            
-            # Encode frame to JPEG
-            ret, jpeg = cv2.imencode('.jpg', processed_frame)
-            if ret:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n\r\n')
-
-def log_attendance(name):
-    """Log attendance for a student"""
+    # Load models and the gallery in the background so the server binds right away
+    warmup_thread = threading.Thread(target=warm_up_system, daemon=True)
+    warmup_thread.start()
+
+def warm_up_system():
+    """Warm the detector/encoder and load the gallery"""
     try:
-        current_time = datetime.now()
-        attendance_data = {
-            'Name': name,
-            'Date': current_time.strftime("%Y-%m-%d"),
-            'Time': current_time.strftime("%H:%M:%S"),
-            'Status': 'Present'
-        }
-        
-        attendance_file = 'face-track-pro/attendance/attendance.csv'
-        
-        # Check if file exists and has data
-        if os.path.exists(attendance_file) and os.path.getsize(attendance_file) > 0:
-            df = pd.read_csv(attendance_file)
-            # Check if already logged today
-            today_records = df[(df['Name'] == name) & (df['Date'] == attendance_data['Date'])]
-            if len(today_records) == 0:
-                df = pd.concat([df, pd.DataFrame([attendance_data])], ignore_index=True)
-                df.to_csv(attendance_file, index=False)
-                print(f"Attendance logged for {name} at {attendance_data['Time']}")
-        else:
-            # Create new file with headers
-            df = pd.DataFrame([attendance_data])
-            df.to_csv(attendance_file, index=False)
+        with record_phase('warm_up'):
+            face_recognizer.warm_up()
+        print_startup_report()
+    except Exception as e:
+        print(f"Error warming up recognizer: {e}")
+
+def camera_config(camera_id=None):
+    """Configured settings of a camera (the first one by default), or None"""
+    cameras = app.config['CAMERAS']
+    if camera_id is None:
+        return cameras[0] if cameras else None
+    return next((camera for camera in cameras if str(camera['id']) == camera_id), None)
+
+def camera_detector_config(config):
+    """create_detector() options of a camera's own detector, or None to use the recognizer's"""
+    if config.get('detector'):
+        return config['detector']
+    # An adaptive detector learns the face sizes of one view, so every camera gets its own
+    if app.config['DETECTOR'].get('backend') == 'adaptive':
+        return app.config['DETECTOR']
+    return None
+
+def get_camera_stream(camera_id=None):
+    """The recognition loop of a configured camera, started on first use and shared by all viewers"""
+    config = camera_config(camera_id)
+    if config is None:
+        return None
+    camera_id = str(config['id'])
+    with camera_streams_lock:
+        stream = camera_streams.get(camera_id)
+        if stream is None:
+            camera = VideoCamera(priority=config.get('priority', PRIORITY_ATTENDANCE), source=config.get('source', 0))
+            detector_config = camera_detector_config(config)
+            detector = create_detector(**detector_config) if detector_config else None
+            stream = CameraStream(camera, face_recognizer, camera_id=camera_id, detector=detector,
+                                  overload_controller=overload_controller,
+                                  is_active=lambda: is_camera_active,
+                                  on_commit=log_attendance,
+                                  on_identities=publish_recognition_event)
+            camera_streams[camera_id] = stream
+            stream.start()
+        return stream
+
+def publish_recognition_event(stream, detected_names, when):
+    """Push the names in view of a camera whenever that set changes"""
+    event_broadcaster.publish('recognition', {
+        'camera': stream.camera_id,
+        'names': detected_names,
+        'timestamp': when.strftime("%Y-%m-%d %H:%M:%S")
+    })
+
+def log_attendance(student_id, when=None):
+    """Log attendance for a student and push it to connected dashboards"""
+    try:
+        name = face_recognizer.student_name(student_id)
+        attendance_data = attendance_log.log(name, when=when, student_id=student_id)
+        if attendance_data is not None:
             print(f"Attendance logged for {name} at {attendance_data['Time']}")
+            publish_attendance_event(attendance_data)
             
     except Exception as e:
         print(f"Error logging attendance: {e}")
 
+def publish_attendance_event(attendance_data):
+    """Push an attendance record and the matching stats delta to the dashboard"""
+    event_broadcaster.publish('attendance', attendance_data)
+    event_broadcaster.publish('stats_delta', {
+        'present_today': 1,
+        'late_today': 1 if is_late_arrival(attendance_data['Time']) else 0,
+        'date': attendance_data['Date']
+    })
+
 @app.route('/')
 def index():
     """Main dashboard page"""
@@ -98,11 +169,11 @@ def admin():
 
 @app.route('/video_feed')
 def video_feed():
-    """Video streaming route"""
-    global video_camera
-    if video_camera is None:
-        video_camera = VideoCamera()
-    return Response(gen(video_camera),
+    """Video streaming route; every viewer watches the same recognition loop"""
+    stream = get_camera_stream(request.args.get('camera'))
+    if stream is None:
+        return jsonify({'error': 'Unknown camera'}), 404
+    return Response(stream.frames(),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/start_camera')
@@ -110,6 +181,9 @@ def start_camera():
     """Start the camera feed"""
     global is_camera_active
     is_camera_active = True
+    # Every configured camera takes attendance, whether or not anyone watches it
+    for config in app.config['CAMERAS']:
+        get_camera_stream(str(config['id']))
     return jsonify({'status': 'Camera started'})
 
 @app.route('/stop_camera')
@@ -122,9 +196,129 @@ def stop_camera():
 @app.route('/attendance_stats')
 def attendance_stats():
     """Get real-time attendance statistics"""
-    stats = get_attendance_stats()
+    stats = get_attendance_stats(dataset_index)
     return jsonify(stats)
 
+@app.route('/ready')
+def ready():
+    """Readiness probe with the startup timing report"""
+    is_ready = face_recognizer is not None and face_recognizer.is_ready
+    status = {
+        'ready': is_ready,
+        'known_faces': len(face_recognizer.known_face_labels) if face_recognizer else 0,
+        'startup': startup_report()
+    }
+    return jsonify(status), (200 if is_ready else 503)
+
+@app.route('/load_shedding')
+def load_shedding():
+    """Overload level, queue depth, stage latencies and recent shedding decisions"""
+    return jsonify(overload_controller.get_stats())
+
+@app.route('/recognize', methods=['POST'])
+def recognize():
+    """Recognize all faces in uploaded images (multipart 'images', zip archives or a raw zip body)"""
+    global batch_recognizer
+    if face_recognizer is None or not face_recognizer.is_ready:
+        return jsonify({'error': 'Recognizer is not ready'}), 503
+    if batch_recognizer is None:
+        batch_recognizer = BatchRecognizer(face_recognizer)
+    
+    try:
+        images = []
+        for file in request.files.getlist('images') + request.files.getlist('archive'):
+            if not file or file.filename == '':
+                continue
+            if file.filename.lower().endswith('.zip'):
+                images.extend(batch_recognizer.read_zip(file.stream))
+            else:
+                images.append((file.filename, file.read()))
+        if not request.files and request.mimetype in ('application/zip', 'application/x-zip-compressed'):
+            images = batch_recognizer.read_zip(request.get_data())
+    except zipfile.BadZipFile:
+        return jsonify({'error': 'Invalid zip archive'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 413
+    
+    if not images:
+        return jsonify({'error': 'No images uploaded'}), 400
+    if len(images) > batch_recognizer.max_images:
+        return jsonify({'error': f'At most {batch_recognizer.max_images} images per request'}), 413
+    return jsonify(batch_recognizer.recognize(images))
+
+@app.route('/trace/start', methods=['POST'])
+def start_trace():
+    """Start recording the live pipeline to a trace archive"""
+    global trace_recorder
+    if face_recognizer is None or not face_recognizer.is_ready:
+        return jsonify({'error': 'Recognizer is not ready'}), 503
+    with trace_lock:
+        if trace_recorder is not None:
+            return jsonify({'error': 'A trace is already being recorded', 'path': trace_recorder.path}), 409
+        # A trace follows one camera
+        stream = get_camera_stream(request.values.get('camera'))
+        if stream is None:
+            return jsonify({'error': 'Unknown camera'}), 404
+        # Only a file name is accepted; traces are always written under TRACE_DIR
+        name = request.values.get('name') or f"trace-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        if os.path.basename(name) != name or name.startswith('.'):
+            return jsonify({'error': 'Trace name must be a plain file name'}), 400
+        if not name.endswith('.zip'):
+            name += '.zip'
+        path = os.path.join(TRACE_DIR, name)
+        if os.path.exists(path):
+            return jsonify({'error': 'A trace with this name already exists', 'path': path}), 409
+        max_frames = request.values.get('max_frames', type=int)
+        image_format = '.jpg' if request.values.get('format') == 'jpg' else '.png'
+        # The camera loop snapshots its voter and the unknown-face cache into
+        # the header just before the first recorded frame
+        # Replay rebuilds the detectors from the same settings
+        trace_recorder = TraceRecorder(path, face_recognizer, image_format=image_format, max_frames=max_frames,
+                                       detector=app.config['DETECTOR'],
+                                       camera_detector=camera_detector_config(camera_config(stream.camera_id)))
+        stream.trace_recorder = trace_recorder
+    return jsonify({'status': 'Recording', 'path': path})
+
+@app.route('/trace/stop', methods=['POST'])
+def stop_trace():
+    """Stop recording and write the trace index"""
+    global trace_recorder
+    with trace_lock:
+        recorder, trace_recorder = trace_recorder, None
+        for stream in camera_streams.values():
+            if stream.trace_recorder is recorder:
+                stream.trace_recorder = None
+    if recorder is None:
+        return jsonify({'error': 'No trace is being recorded'}), 404
+    return jsonify(recorder.close())
+
+@app.route('/shards')
+def shards():
+    """Per-shard request counts, timeouts and latency of the distributed gallery"""
+    if face_recognizer is None or face_recognizer.shard_coordinator is None:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, 'shards': face_recognizer.shard_coordinator.get_stats()})
+
+@app.route('/recognition_cache')
+def recognition_cache():
+    """Hit rate of the per-track recognition result cache"""
+    if face_recognizer is None or face_recognizer.recognition_cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(face_recognizer.recognition_cache.get_stats(), enabled=True))
+
+@app.route('/events')
+def events():
+    """Server-Sent Events stream of attendance, recognition and stats events"""
+    if event_broadcaster.is_full():
+        return jsonify({'error': 'Too many event stream clients'}), 503
+    last_event_id = EventBroadcaster.parse_last_event_id(
+        request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    )
+    response = Response(event_broadcaster.subscribe(last_event_id), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
 @app.route('/register_student', methods=['POST'])
 def register_student():
     """Register a new student"""
@@ -146,22 +340,18 @@ def register_student():
             flash('No images selected', 'error')
             return redirect(url_for('admin'))
         
-        # Create student directory
-        student_dir = f'face-track-pro/dataset/{name.lower().replace(" ", "_")}'
-        os.makedirs(student_dir, exist_ok=True)
+        # Decode, downscale, quality-check and store the uploads in parallel
+        uploads = [(file.filename, file.read()) for file in files if file and file.filename != '']
+        results = RegistrationIngest(dataset_index=dataset_index).ingest(name, uploads, usn=usn)
+        saved_files = [result['path'] for result in results if result['status'] == 'accepted']
         
-        # Save uploaded images
-        saved_files = []
-        for i, file in enumerate(files):
-            if file and file.filename != '':
-                filename = f"{name.lower().replace(' ', '_')}_{i+1}.jpg"
-                filepath = os.path.join(student_dir, filename)
-                file.save(filepath)
-                saved_files.append(filepath)
+        for result in results:
+            if result['status'] == 'rejected':
+                flash(f"Skipped {result['filename']}: {result['reason']}", 'error')
         
         if saved_files:
             # Train the model with new student
-            trainer = FaceTrainer()
+            trainer = FaceTrainer(calibrate='keep', dataset_index=dataset_index)
             trainer.train_model()
             
             # Reload the face recognizer
@@ -176,11 +366,113 @@ def register_student():
     
     return redirect(url_for('admin'))
 
+@app.route('/bulk_import', methods=['POST'])
+def bulk_import():
+    """Start a bulk enrolment from an uploaded zip/CSV manifest or a server-side path"""
+    global bulk_import_thread
+    if bulk_import_thread is not None and bulk_import_thread.is_alive():
+        flash('A bulk import is already running', 'error')
+        return redirect(url_for('admin'))
+    
+    try:
+        source = request.form.get('source_path', '').strip()
+        if source and not bulk_importer.within_root(source):
+            flash(f"Server-side imports must be under {app.config['BULK_IMPORT_ROOT']}", 'error')
+            return redirect(url_for('admin'))
+        upload = request.files.get('archive')
+        if upload and upload.filename:
+            # Stream the upload to disk; it is read back one student at a time
+            upload_dir = 'face-track-pro/cache/uploads'
+            os.makedirs(upload_dir, exist_ok=True)
+            source = os.path.join(upload_dir, os.path.basename(upload.filename))
+            upload.save(source)
+        
+        if not source or not os.path.exists(source):
+            flash('Upload a zip or CSV manifest, or give a path on the server', 'error')
+            return redirect(url_for('admin'))
+        
+        bulk_import_thread = threading.Thread(target=run_bulk_import, args=(source,), daemon=True)
+        bulk_import_thread.start()
+        flash('Bulk import started; progress is available at /bulk_import_status', 'success')
+    except Exception as e:
+        flash(f'Error starting bulk import: {str(e)}', 'error')
+    
+    return redirect(url_for('admin'))
+
+def run_bulk_import(source):
+    """Run a bulk import, then reload the gallery it wrote"""
+    try:
+        report = bulk_importer.run(source)
+        if report.get('trained'):
+            face_recognizer.load_model()
+        event_broadcaster.publish('bulk_import', {key: value for key, value in report.items() if key != 'failures'})
+    except Exception as e:
+        with bulk_importer.lock:
+            bulk_importer.progress = {'state': 'failed', 'error': str(e)}
+        print(f"Error during bulk import: {e}")
+
+@app.route('/bulk_import_status')
+def bulk_import_status():
+    """Progress of the running bulk import, or the report of the last one"""
+    return jsonify(bulk_importer.get_progress())
+
+@app.route('/unknown_faces')
+def unknown_faces():
+    """Clusters of recently seen unrecognized faces, most frequent first"""
+    min_sightings = request.args.get('min_sightings', 1, type=int)
+    clusters = face_recognizer.unknown_faces.list_clusters(min_sightings)
+    for cluster in clusters:
+        cluster['crop_urls'] = [url_for('unknown_face_crop', cluster_id=cluster['id'], index=i)
+                                for i in range(cluster['crops'])]
+    return jsonify({'clusters': clusters, 'stats': face_recognizer.unknown_faces.get_stats()})
+
+@app.route('/unknown_faces/<int:cluster_id>/crops/<int:index>')
+def unknown_face_crop(cluster_id, index):
+    """One saved face crop of an unknown cluster"""
+    paths = face_recognizer.unknown_faces.crop_paths(cluster_id)
+    if index >= len(paths) or not os.path.exists(paths[index]):
+        return jsonify({'error': 'Crop not found'}), 404
+    return send_file(os.path.abspath(paths[index]), mimetype='image/jpeg')
+
+@app.route('/unknown_faces/<int:cluster_id>/enroll', methods=['POST'])
+def enroll_unknown_face(cluster_id):
+    """Register an unknown cluster as a student from its saved crops"""
+    name = request.form.get('student_name') or (request.get_json(silent=True) or {}).get('student_name')
+    usn = request.form.get('student_usn') or (request.get_json(silent=True) or {}).get('student_usn')
+    if not name or not usn:
+        return jsonify({'error': 'Name and USN are required'}), 400
+    
+    paths = face_recognizer.unknown_faces.crop_paths(cluster_id)
+    if not paths:
+        return jsonify({'error': 'Unknown cluster or no crops saved'}), 404
+    
+    uploads = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            uploads.append((os.path.basename(path), f.read()))
+    results = RegistrationIngest(dataset_index=dataset_index).ingest(name, uploads, usn=usn)
+    accepted = [result for result in results if result['status'] == 'accepted']
+    if accepted:
+        FaceTrainer(calibrate='keep', dataset_index=dataset_index).train_model()
+        face_recognizer.load_model()
+        face_recognizer.unknown_faces.dismiss(cluster_id)
+    
+    return jsonify({
+        'enrolled': bool(accepted),
+        'accepted': len(accepted),
+        'rejected': [{'filename': r['filename'], 'reason': r['reason']} for r in results if r['status'] == 'rejected']
+    }), (200 if accepted else 422)
+
+@app.route('/unknown_faces/<int:cluster_id>/dismiss', methods=['POST'])
+def dismiss_unknown_face(cluster_id):
+    """Drop an unknown cluster and its crops"""
+    return jsonify({'dismissed': face_recognizer.unknown_faces.dismiss(cluster_id)})
+
 @app.route('/retrain_model')
 def retrain_model():
     """Retrain the face recognition model"""
     try:
-        trainer = FaceTrainer()
+        trainer = FaceTrainer(calibrate='keep', dataset_index=dataset_index)
         trainer.train_model()
         face_recognizer.load_model()
         flash('Model retrained successfully', 'success')
@@ -191,11 +483,13 @@ def retrain_model():
 
 @app.route('/download_attendance')
 def download_attendance():
-    """Download attendance CSV file"""
+    """Download attendance CSV file (archived days plus today)"""
     try:
-        attendance_file = 'face-track-pro/attendance/attendance.csv'
-        if os.path.exists(attendance_file):
-            return send_file(attendance_file, as_attachment=True)
+        df = load_attendance_records()
+        if not df.empty:
+            csv_data = io.BytesIO(df.to_csv(index=False).encode('utf-8'))
+            return send_file(csv_data, mimetype='text/csv', as_attachment=True,
+                             download_name='attendance.csv')
         else:
             flash('No attendance data available', 'error')
             return redirect(url_for('admin'))
@@ -204,19 +498,20 @@ def download_attendance():
         return redirect(url_for('admin'))
 
 def get_registered_students():
-    """Get list of registered students"""
+    """Get list of registered students from the dataset index"""
     students = []
-    dataset_dir = 'face-track-pro/dataset'
-    if os.path.exists(dataset_dir):
-        for student_folder in os.listdir(dataset_dir):
-            student_path = os.path.join(dataset_dir, student_folder)
-            if os.path.isdir(student_path):
-                image_count = len([f for f in os.listdir(student_path) if f.endswith(('.jpg', '.jpeg', '.png'))])
-                students.append({
-                    'name': student_folder.replace('_', ' ').title(),
-                    'folder': student_folder,
-                    'images': image_count
-                })
+    registry = StudentRegistry.shared()
+    for student_folder, summary in dataset_index.list_folders():
+        student = registry.get(registry.id_for_folder(student_folder)) or {}
+        students.append({
+            'id': student.get('id'),
+            'usn': student.get('usn'),
+            'name': student.get('name') or student_folder.replace('_', ' ').title(),
+            'folder': student_folder,
+            'images': summary['images'],
+            'encoded': summary['statuses'].get('encoded', 0),
+            'pending': summary['statuses'].get('pending', 0)
+        })
     return students
 
 if __name__ == '__main__':
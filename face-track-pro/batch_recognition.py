@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+FaceTrack Pro - Batch Recognition
+Recognizes every face in a batch of still images, such as class group photos
+or snapshots sent by other systems, instead of the live stream. Images are
+decoded, detected and encoded in parallel, then all faces of the batch are
+matched against the gallery in one query. Nothing is logged as attendance.
+
+    python batch_recognition.py group1.jpg group2.jpg
+    python batch_recognition.py snapshots.zip --json
+    python batch_recognition.py photos/ --benchmark --min-images-per-second 5
+"""
+
+import io
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils.startup import lazy_import
+from utils.student_registry import UNKNOWN_ID
+
+
+class BatchRecognizer:
+    """Recognition of uploaded still images against a FaceRecognizer's gallery.
+
+    Uses its own full-resolution detector: the live recognizer's detector is
+    tuned for small, fast video frames. Large photos are downscaled to
+    max_image_side first, and boxes are reported in original image pixels.
+    Zip archives are checked against max_images, max_image_bytes and
+    max_total_bytes from their directory, before anything is decompressed.
+    """
+
+    supported_formats = ('.jpg', '.jpeg', '.png', '.bmp')
+
+    def __init__(self, recognizer, detector=None, max_workers=4, max_image_side=1600, max_images=500,
+                 max_image_bytes=25 * 1024 * 1024, max_total_bytes=512 * 1024 * 1024):
+        from detectors import create_detector
+        self.recognizer = recognizer
+        self.detector = detector or create_detector('hog', scale=1.0, upsample=1)
+        self.max_workers = max_workers
+        self.max_image_side = max_image_side
+        self.max_images = max_images
+        self.max_image_bytes = max_image_bytes
+        self.max_total_bytes = max_total_bytes
+
+    def read_zip(self, source):
+        """(filename, bytes) for each image in a zip archive (path, bytes or file object)"""
+        if isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        with zipfile.ZipFile(source) as archive:
+            members = [info for info in sorted(archive.infolist(), key=lambda info: info.filename)
+                       if not info.is_dir() and '__MACOSX' not in info.filename
+                       and not os.path.basename(info.filename).startswith('.')
+                       and info.filename.lower().endswith(self.supported_formats)]
+            # Checked before anything is decompressed; reads stop at the declared sizes
+            if len(members) > self.max_images:
+                raise ValueError(f"Too many images in one batch ({len(members)} > {self.max_images})")
+            for info in members:
+                if info.file_size > self.max_image_bytes:
+                    raise ValueError(f"Image too large: {info.filename} ({info.file_size} > {self.max_image_bytes} bytes)")
+            total_bytes = sum(info.file_size for info in members)
+            if total_bytes > self.max_total_bytes:
+                raise ValueError(f"Archive too large when extracted ({total_bytes} > {self.max_total_bytes} bytes)")
+            return [(info.filename, archive.read(info)) for info in members]
+
+    def read_paths(self, paths):
+        """(filename, bytes) for image files, directories (not recursive) and zip archives"""
+        images = []
+        for path in paths:
+            if os.path.isdir(path):
+                files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                               if f.lower().endswith(self.supported_formats))
+                images.extend(self.read_paths(files))
+            elif path.lower().endswith('.zip'):
+                images.extend(self.read_zip(path))
+            else:
+                with open(path, 'rb') as f:
+                    images.append((path, f.read()))
+        return images
+
+    def analyze(self, name, data):
+        """Decode, detect and encode one image"""
+        cv2 = lazy_import('cv2')
+        face_recognition = lazy_import('face_recognition')
+        result = {'image': name, 'locations': [], 'encodings': [], 'error': None}
+
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) if data else None
+        if image is None:
+            result['error'] = 'could not decode image'
+            return result
+        height, width = image.shape[:2]
+        result['width'], result['height'] = width, height
+
+        scale = min(1.0, self.max_image_side / float(max(height, width)))
+        if scale < 1.0:
+            image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+
+        face_locations = self.detector.detect(rgb_image)
+        result['encodings'] = face_recognition.face_encodings(rgb_image, face_locations)
+        # Boxes in the pixels of the uploaded image
+        result['locations'] = [tuple(int(round(v / scale)) for v in location) for location in face_locations]
+        return result
+
+    def recognize(self, images):
+        """Recognize all faces in (filename, bytes) images; returns per-image results and a summary"""
+        if len(images) > self.max_images:
+            raise ValueError(f"Too many images in one batch ({len(images)} > {self.max_images})")
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            analyzed = list(executor.map(lambda image: self.analyze(*image), images))
+        analyze_seconds = time.time() - start
+
+        # One gallery query for every face in the batch
+        match_start = time.time()
+        encodings = [encoding for result in analyzed for encoding in result['encodings']]
+        labels, distances, failed_shards = self.recognizer.match_gallery(encodings)
+        match_seconds = time.time() - match_start
+
+        registry = self.recognizer.registry
+        matches = iter(zip(labels, distances))
+        results = []
+        for result in analyzed:
+            faces = []
+            for top, right, bottom, left in result['locations']:
+                label, distance = next(matches)
+                student = registry.get(label) if label != UNKNOWN_ID else None
+                faces.append({
+                    'box': {'top': top, 'right': right, 'bottom': bottom, 'left': left},
+                    'student_id': label if label != UNKNOWN_ID else None,
+                    'usn': student.get('usn') if student else None,
+                    'name': self.recognizer.student_name(label),
+                    'distance': round(float(distance), 4),
+                    'confident': bool(self.recognizer.is_clear_match(label, distance))
+                })
+            entry = {'image': result['image'], 'faces': faces}
+            if result['error']:
+                entry['error'] = result['error']
+            else:
+                entry['width'], entry['height'] = result['width'], result['height']
+            results.append(entry)
+
+        total_seconds = time.time() - start
+        face_count = len(encodings)
+        return {
+            'images': results,
+            'summary': {
+                'images': len(images),
+                'failed_images': sum(1 for result in analyzed if result['error']),
+                'faces': face_count,
+                'recognized': sum(1 for label in labels if label != UNKNOWN_ID),
+                # Shards that did not answer; their students were not searched
+                'failed_shards': failed_shards,
+                'analyze_seconds': round(analyze_seconds, 3),
+                'match_seconds': round(match_seconds, 4),
+                'total_seconds': round(total_seconds, 3),
+                'images_per_second': round(len(images) / total_seconds, 2) if total_seconds > 0 else None
+            }
+        }
+
+    def recognize_zip(self, source):
+        return self.recognize(self.read_zip(source))
+
+    def recognize_paths(self, paths):
+        return self.recognize(self.read_paths(paths))
+
+
+def benchmark_batch(batch, images, repeat=3):
+    """Throughput of the batch path against one image at a time on a single thread.
+
+    The sequential baseline decodes, detects, encodes and matches each image
+    on its own, as calling get_face_encoding per file would.
+    """
+    sequential = BatchRecognizer(batch.recognizer, detector=batch.detector, max_workers=1,
+                                 max_image_side=batch.max_image_side, max_images=batch.max_images)
+    batch.recognize(images[:1])  # Load the detector and encoder models before timing
+
+    timings = {'sequential': [], 'batch': []}
+    for _ in range(repeat):
+        start = time.time()
+        sequential_faces = sum(sequential.recognize([image])['summary']['faces'] for image in images)
+        timings['sequential'].append(time.time() - start)
+
+        start = time.time()
+        batch_faces = batch.recognize(images)['summary']['faces']
+        timings['batch'].append(time.time() - start)
+
+    report = {'images': len(images), 'faces': batch_faces, 'workers': batch.max_workers}
+    for mode, seconds in timings.items():
+        best = min(seconds)
+        report[mode] = {'seconds': round(best, 3), 'images_per_second': round(len(images) / best, 2) if best else None}
+    report['speedup'] = round(min(timings['sequential']) / min(timings['batch']), 2) if min(timings['batch']) else None
+    report['same_faces'] = sequential_faces == batch_faces
+    return report
+
+
+def main():
+    """Main function for command-line usage"""
+    import argparse
+    import json
+    import sys
+    from face_recognition_module import FaceRecognizer
+
+    parser = argparse.ArgumentParser(description='FaceTrack Pro Batch Recognition')
+    parser.add_argument('sources', nargs='+', help='Image files, directories or zip archives')
+    parser.add_argument('--workers', type=int, default=4, help='Images decoded and detected in parallel')
+    parser.add_argument('--max-side', type=int, default=1600, help='Longest image side before detection')
+    parser.add_argument('--json', action='store_true', help='Print the full result as JSON')
+    parser.add_argument('--benchmark', action='store_true', help='Compare with one image at a time')
+    parser.add_argument('--repeat', type=int, default=3, help='Benchmark repetitions (best is reported)')
+    parser.add_argument('--min-images-per-second', type=float, help='Fail the benchmark below this throughput')
+    args = parser.parse_args()
+
+    recognizer = FaceRecognizer()
+    recognizer.load_model()
+    batch = BatchRecognizer(recognizer, max_workers=args.workers, max_image_side=args.max_side, max_images=100000,
+                            max_total_bytes=float('inf'))
+    images = batch.read_paths(args.sources)
+    if not images:
+        print("No images found")
+        sys.exit(1)
+
+    if args.benchmark:
+        report = benchmark_batch(batch, images, args.repeat)
+        print(f"Images: {report['images']}  faces: {report['faces']}  workers: {report['workers']}")
+        for mode in ('sequential', 'batch'):
+            print(f"{mode:<11} {report[mode]['seconds']:8.3f}s  {report[mode]['images_per_second']:8.2f} images/s")
+        print(f"Speedup: {report['speedup']}x  same faces: {report['same_faces']}")
+        if args.min_images_per_second and report['batch']['images_per_second'] < args.min_images_per_second:
+            print(f"FAIL: below the target of {args.min_images_per_second} images/s")
+            sys.exit(1)
+        return
+
+    result = batch.recognize(images)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for entry in result['images']:
+        if 'error' in entry:
+            print(f"{entry['image']}: {entry['error']}")
+            continue
+        names = ', '.join(f"{face['name']} ({face['distance']:.2f})" for face in entry['faces']) or 'no faces'
+        print(f"{entry['image']}: {names}")
+    summary = result['summary']
+    print(f"\n{summary['faces']} faces in {summary['images']} images, {summary['recognized']} recognized, "
+          f"{summary['images_per_second']} images/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+FaceTrack Pro - Bulk Enrolment Importer
+Registers a whole intake of students in one run from a zip archive, a
+directory tree (one folder per student) or a CSV manifest of name/USN/image
+paths. Images go through the same checks as /register_student, students are
+processed in parallel and the gallery is written once at the end. An
+interrupted import resumes from its journal.
+
+    python bulk_import.py FaceTrack-Pro-System.zip
+    python bulk_import.py students.csv --workers 8
+"""
+
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from registration import RegistrationIngest
+
+
+class BulkImporter:
+    """Parallel, resumable enrolment of many students.
+
+    Sources are scanned for file names only; image bytes are read just before
+    a student is handed to a worker, so at most max_pending students are held
+    in memory. Each finished student is appended to a journal, and a re-run
+    of the same, unchanged source after an interruption skips the students
+    already in it. Students that were in progress are ingested again; their
+    images already in the dataset are not stored twice.
+
+    Zip members larger than max_image_bytes are rejected, and an archive
+    whose images add up to more than max_total_bytes is refused before
+    anything is decompressed.
+
+    With an import_root, sources and manifest image paths must resolve
+    inside it; the server sets one so a form field cannot read arbitrary
+    files.
+    """
+
+    supported_formats = ('.jpg', '.jpeg', '.png', '.bmp')
+
+    def __init__(self, dataset_path='face-track-pro/dataset', journal_path='face-track-pro/cache/bulk_import.jsonl',
+                 max_workers=4, max_pending=None, detector=None, dataset_index=None, import_root=None,
+                 calibrate=True, max_image_bytes=25 * 1024 * 1024, max_total_bytes=512 * 1024 * 1024):
+        self.dataset_path = dataset_path
+        self.max_image_bytes = max_image_bytes
+        self.max_total_bytes = max_total_bytes
+        self.calibrate = calibrate  # Passed to FaceTrainer; the server keeps the stored thresholds
+        self.import_root = import_root
+        self.journal_path = journal_path
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max_workers * 2
+        self.detector = detector
+        # Parallelism is across students, so each ingest runs its files serially
+        self.ingest = RegistrationIngest(dataset_path, max_workers=1, detector=detector, dataset_index=dataset_index)
+        self.dataset_index = self.ingest.dataset_index
+        self.lock = threading.Lock()
+        self.progress = {'state': 'idle'}
+
+    def within_root(self, path):
+        """Whether path resolves (symlinks included) inside import_root; always true without one"""
+        if self.import_root is None:
+            return True
+        root = os.path.realpath(self.import_root)
+        return os.path.commonpath([root, os.path.realpath(path)]) == root
+
+    def scan(self, source):
+        """List students in a source as dicts with name, usn and image references"""
+        if os.path.isdir(source):
+            return self.scan_directory(source)
+        if zipfile.is_zipfile(source):
+            return self.scan_zip(source)
+        if source.lower().endswith('.csv'):
+            return self.scan_manifest(source)
+        raise ValueError(f"Unsupported import source: {source}")
+
+    def scan_directory(self, root):
+        """Students are the directories that directly contain images"""
+        groups = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            # Registration chips are derived data, not enrolment photos
+            dirnames[:] = [d for d in dirnames if d != 'chips' and not d.startswith('.')]
+            images = sorted(f for f in filenames if f.lower().endswith(self.supported_formats))
+            if images:
+                folder = os.path.basename(dirpath)
+                groups.setdefault(folder, []).extend(os.path.join(dirpath, f) for f in images)
+        return [self.student_from_folder(folder, [('file', path) for path in paths])
+                for folder, paths in sorted(groups.items())]
+
+    def scan_zip(self, path):
+        """Same layout as a directory tree, read from the archive's index"""
+        groups = {}
+        total_bytes = 0
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                member = info.filename
+                parts = member.split('/')
+                if member.endswith('/') or len(parts) < 2 or 'chips' in parts[:-1] or parts[-1].startswith('.'):
+                    continue
+                if member.lower().endswith(self.supported_formats):
+                    groups.setdefault(parts[-2], []).append(member)
+                    total_bytes += info.file_size
+        # Checked from the archive's directory, before anything is decompressed
+        if total_bytes > self.max_total_bytes:
+            raise ValueError(f"Archive too large when extracted ({total_bytes} > {self.max_total_bytes} bytes)")
+        return [self.student_from_folder(folder, [('zip', member) for member in sorted(members)])
+                for folder, members in sorted(groups.items())]
+
+    def scan_manifest(self, path):
+        """CSV with name, usn and image path columns; one row per image or ';'-separated paths"""
+        base_dir = os.path.dirname(os.path.abspath(path))
+        students = {}
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+                name = row.get('name') or row.get('student_name')
+                usn = row.get('usn') or row.get('student_usn') or None
+                paths = row.get('image') or row.get('image_path') or row.get('images') or row.get('path') or ''
+                if not name:
+                    continue
+                student = students.setdefault(usn or name.lower(), {'name': name, 'usn': usn, 'images': []})
+                for image_path in filter(None, (p.strip() for p in paths.split(';'))):
+                    image_path = os.path.join(base_dir, image_path)
+                    student['images'].append(('file' if self.within_root(image_path) else 'outside', image_path))
+        return list(students.values())
+
+    @staticmethod
+    def student_from_folder(folder, images):
+        # Same display name FaceTrainer derives from a dataset folder
+        return {'name': folder.replace('_', ' ').title(), 'usn': None, 'images': images}
+
+    @staticmethod
+    def student_key(student):
+        return student['usn'] or student['name'].lower()
+
+    @staticmethod
+    def source_fingerprint(source, students):
+        """Identity of a source, so a journal is only resumed against the same, unchanged one"""
+        fingerprint = {'source': os.path.realpath(source)}
+        if os.path.isdir(source):
+            # A directory's own mtime misses changes inside its student folders
+            fingerprint['listing'] = hashlib.sha1(json.dumps(students).encode()).hexdigest()
+        else:
+            stat = os.stat(source)
+            fingerprint.update(size=stat.st_size, mtime=stat.st_mtime)
+        return fingerprint
+
+    def load_journal(self, fingerprint):
+        """Keys of students completed by a previous, interrupted run of the same source.
+
+        Returns None when there is no journal or it belongs to another source
+        (or to a version of it that has changed since).
+        """
+        if not os.path.exists(self.journal_path):
+            return None
+        done = {}
+        with open(self.journal_path) as f:
+            try:
+                header = json.loads(f.readline())
+            except ValueError:
+                return None
+            if header.get('fingerprint') != fingerprint:
+                return None
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line from the interruption
+                done[entry['key']] = entry
+        return done
+
+    def read_uploads(self, student, archive):
+        """Read a student's image bytes as (filename, bytes) pairs"""
+        uploads = []
+        for kind, ref in student['images']:
+            try:
+                if kind == 'zip':
+                    size = archive.getinfo(ref).file_size
+                    if size > self.max_image_bytes:
+                        uploads.append((os.path.basename(ref), None,
+                                        f'image too large ({size} > {self.max_image_bytes} bytes)'))
+                        continue
+                    uploads.append((os.path.basename(ref), archive.read(ref)))
+                elif kind == 'outside':
+                    uploads.append((os.path.basename(ref), None, 'outside the import root'))
+                else:
+                    with open(ref, 'rb') as f:
+                        uploads.append((os.path.basename(ref), f.read()))
+            except (OSError, KeyError) as e:
+                uploads.append((os.path.basename(ref), None, str(e)))
+        return uploads
+
+    def import_student(self, student, uploads):
+        """Run one student through registration and return its journal entry"""
+        start = time.time()
+        readable = [upload for upload in uploads if len(upload) == 2]
+        unreadable = [{'filename': u[0], 'status': 'rejected', 'reason': f'could not read file ({u[2]})'}
+                      for u in uploads if len(u) == 3]
+        try:
+            results = self.ingest.ingest(student['name'], readable, usn=student['usn']) if readable else []
+            error = None
+        except Exception as e:
+            results, error = [], str(e)
+        results = unreadable + results
+
+        accepted = sum(1 for result in results if result['status'] == 'accepted')
+        entry = {
+            'key': self.student_key(student),
+            'name': student['name'],
+            'usn': student['usn'],
+            'images': len(uploads),
+            'accepted': accepted,
+            'rejected': [{'filename': r['filename'], 'reason': r['reason']} for r in results if r['status'] == 'rejected'],
+            'elapsed': round(time.time() - start, 3)
+        }
+        if error:
+            entry['error'] = error
+        elif not uploads:
+            entry['error'] = 'no images listed'
+        elif accepted == 0:
+            entry['error'] = 'no usable images'
+        return entry
+
+    def run(self, source, resume=True, train=True):
+        """Import every student in source and return a report"""
+        start = time.time()
+        students = self.scan(source)
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        fingerprint = self.source_fingerprint(source, students)
+        done = self.load_journal(fingerprint) if resume else None
+        if done is None:
+            # Nothing to resume for this source: start a new journal
+            done = {}
+            with open(self.journal_path, 'w') as journal:
+                journal.write(json.dumps({'fingerprint': fingerprint}) + '\n')
+
+        pending_students = [s for s in students if self.student_key(s) not in done]
+        with self.lock:
+            self.progress = {'state': 'importing', 'source': source, 'total_students': len(students),
+                             'resumed_students': len(students) - len(pending_students), 'done_students': 0,
+                             'images': 0, 'accepted_images': 0}
+        print(f"Bulk import: {len(students)} students in {source}, "
+              f"{len(students) - len(pending_students)} already done")
+
+        entries = []
+        archive = zipfile.ZipFile(source) if zipfile.is_zipfile(source) and not os.path.isdir(source) else None
+        try:
+            with open(self.journal_path, 'a') as journal, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                in_flight = set()
+                queue = iter(pending_students)
+                while True:
+                    # Keep a bounded number of students (and their bytes) in flight
+                    while len(in_flight) < self.max_pending:
+                        student = next(queue, None)
+                        if student is None:
+                            break
+                        uploads = self.read_uploads(student, archive)
+                        in_flight.add(executor.submit(self.import_student, student, uploads))
+                    if not in_flight:
+                        break
+                    finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        entry = future.result()
+                        journal.write(json.dumps(entry) + '\n')
+                        journal.flush()
+                        entries.append(entry)
+                        self.record_progress(entry)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        import_seconds = time.time() - start
+        report = self.build_report(list(done.values()) + entries, entries, import_seconds)
+
+        # The gallery is written once, from encodings the ingest already cached
+        if train and report['accepted_images'] > 0:
+            with self.lock:
+                self.progress['state'] = 'training'
+            from train_model import FaceTrainer
+            train_start = time.time()
+            report['trained'] = FaceTrainer(detector=self.detector, calibrate=self.calibrate,
+                                            dataset_index=self.dataset_index).train_model()
+            report['train_seconds'] = round(time.time() - train_start, 2)
+
+        # Finished: a later import of the same students starts fresh
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+        with self.lock:
+            self.progress = dict(report, state='finished')
+        self.print_report(report)
+        return report
+
+    def record_progress(self, entry):
+        with self.lock:
+            self.progress['done_students'] += 1
+            self.progress['images'] += entry['images']
+            self.progress['accepted_images'] += entry['accepted']
+
+    @staticmethod
+    def build_report(all_entries, new_entries, import_seconds):
+        """Totals, throughput of this run and per-student failures"""
+        new_images = sum(entry['images'] for entry in new_entries)
+        return {
+            'students': len(all_entries),
+            'imported_this_run': len(new_entries),
+            'images': sum(entry['images'] for entry in all_entries),
+            'accepted_images': sum(entry['accepted'] for entry in all_entries),
+            'rejected_images': sum(len(entry['rejected']) for entry in all_entries),
+            'import_seconds': round(import_seconds, 2),
+            'images_per_second': round(new_images / import_seconds, 2) if import_seconds > 0 else 0.0,
+            'students_per_second': round(len(new_entries) / import_seconds, 2) if import_seconds > 0 else 0.0,
+            'failures': [{'name': entry['name'], 'usn': entry['usn'], 'error': entry['error'],
+                          'rejected': entry['rejected']} for entry in all_entries if entry.get('error')]
+        }
+
+    @staticmethod
+    def print_report(report):
+        print(f"\nBulk import completed:")
+        print(f"Students: {report['students']} ({report['imported_this_run']} this run)")
+        print(f"Images: {report['accepted_images']} accepted, {report['rejected_images']} rejected")
+        print(f"Throughput: {report['images_per_second']} images/s, {report['students_per_second']} students/s")
+        if report['failures']:
+            print(f"\nFailed students: {len(report['failures'])}")
+            for failure in report['failures'][:20]:
+                reasons = '; '.join(f"{r['filename']}: {r['reason']}" for r in failure['rejected'][:3])
+                print(f"  {failure['name']} ({failure['usn'] or 'no USN'}): {failure['error']}"
+                      + (f" - {reasons}" if reasons else ''))
+            if len(report['failures']) > 20:
+                print(f"  ... and {len(report['failures']) - 20} more")
+
+    def get_progress(self):
+        with self.lock:
+            return dict(self.progress)
+
+
+def main():
+    """Main function for command-line usage"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='FaceTrack Pro Bulk Enrolment')
+    parser.add_argument('source', help='Zip archive, directory tree or CSV manifest (name, usn, image)')
+    parser.add_argument('--workers', type=int, default=4, help='Students processed in parallel')
+    parser.add_argument('--no-resume', action='store_true', help='Ignore the journal of an interrupted import')
+    parser.add_argument('--no-train', action='store_true', help='Skip writing the gallery at the end')
+    parser.add_argument('--detector', type=str, help='Detector backend (hog, cnn, haar, dnn, cascade)')
+    parser.add_argument('--detector-scale', type=float, default=1.0, help='Downscale applied before detection')
+    args = parser.parse_args()
+
+    detector = None
+    if args.detector:
+        from detectors import create_detector
+        detector = create_detector(args.detector, scale=args.detector_scale)
+
+    importer = BulkImporter(max_workers=args.workers, detector=detector)
+    importer.run(args.source, resume=not args.no_resume, train=not args.no_train)
+
+
+if __name__ == '__main__':
+    main()
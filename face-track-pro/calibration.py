@@ -0,0 +1,143 @@
+"""
+Per-identity match thresholds calibrated from the enrolled encodings.
+
+For every student the distances between their own encodings (genuine) and
+from their encodings to the closest other student (nearest impostor) are
+measured. Each student's threshold sits between the two distributions, so
+students with tight, well-separated encodings accept more readily and
+look-alikes are held to a stricter bound. A global ROC curve and the
+leave-one-out false accept / false reject rates are reported alongside.
+"""
+
+import numpy as np
+
+
+def pairwise_distances(queries, gallery, gallery_norms=None):
+    """Euclidean distances between two sets of encodings"""
+    if gallery_norms is None:
+        gallery_norms = np.einsum('ij,ij->i', gallery, gallery)
+    squared = np.einsum('ij,ij->i', queries, queries)[:, None] + gallery_norms[None, :] - 2 * queries @ gallery.T
+    return np.sqrt(np.maximum(squared, 0.0))
+
+
+def distance_distributions(encodings, labels, batch_size=512):
+    """Genuine distances per label and each row's nearest-impostor distance and label"""
+    encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+    labels = np.asarray(labels)
+
+    genuine = {}
+    for label in np.unique(labels):
+        rows = encodings[labels == label]
+        if len(rows) > 1:
+            distances = pairwise_distances(rows, rows)
+            genuine[int(label)] = distances[np.triu_indices(len(rows), k=1)]
+
+    norms = np.einsum('ij,ij->i', encodings, encodings)
+    impostor = np.full(len(encodings), np.inf)
+    impostor_label = np.full(len(encodings), -1)
+    for start in range(0, len(encodings), batch_size):
+        batch = slice(start, start + batch_size)
+        distances = pairwise_distances(encodings[batch], encodings, norms)
+        distances[labels[batch][:, None] == labels[None, :]] = np.inf
+        nearest = np.argmin(distances, axis=1)
+        impostor[batch] = distances[np.arange(len(nearest)), nearest]
+        impostor_label[batch] = labels[nearest]
+    return genuine, impostor, impostor_label
+
+
+def identity_thresholds(encodings, labels, default=0.5, min_threshold=0.3, max_threshold=0.6,
+                        genuine_quantile=95, impostor_quantile=1):
+    """Per-label thresholds placed between genuine and nearest-impostor distances.
+
+    If the genuine distances stay clear of the impostors, the threshold is
+    the midpoint of the gap; if they overlap, it is set at the impostor
+    floor so false accepts are preferred against. Labels with a single
+    encoding have no genuine distances and use the default.
+    """
+    labels = np.asarray(labels)
+    genuine, impostor, impostor_label = distance_distributions(encodings, labels)
+
+    thresholds = {}
+    for label in np.unique(labels):
+        label = int(label)
+        # Impostor distances in both directions: from this student and to this student
+        near = impostor[(labels == label) | (impostor_label == label)]
+        near = near[np.isfinite(near)]
+        if label not in genuine or len(near) == 0:
+            thresholds[label] = default
+            continue
+        genuine_ceiling = float(np.percentile(genuine[label], genuine_quantile))
+        impostor_floor = float(np.percentile(near, impostor_quantile))
+        if genuine_ceiling < impostor_floor:
+            threshold = (genuine_ceiling + impostor_floor) / 2
+        else:
+            threshold = impostor_floor
+        thresholds[label] = float(np.clip(threshold, min_threshold, max_threshold))
+    return thresholds, genuine, impostor
+
+
+def roc_curve(genuine, impostor, thresholds=None):
+    """FAR/FRR of a single global threshold over a range of values"""
+    genuine_all = np.concatenate(list(genuine.values())) if genuine else np.empty(0)
+    impostor = impostor[np.isfinite(impostor)]
+    thresholds = np.round(np.arange(0.20, 0.81, 0.01), 2) if thresholds is None else thresholds
+    curve = []
+    for threshold in thresholds:
+        curve.append({
+            'threshold': float(threshold),
+            'far': float(np.mean(impostor < threshold)) if len(impostor) else 0.0,
+            'frr': float(np.mean(genuine_all >= threshold)) if len(genuine_all) else 0.0
+        })
+    return curve
+
+
+def leave_one_out_rates(encodings, labels, threshold_for, max_queries=2000, seed=0):
+    """Expected false accept / false reject rates of the 1:N decision.
+
+    Each sampled encoding is matched against the rest of the gallery and
+    accepted if the nearest row is inside that row's label threshold. A
+    false accept is an accepted match with the wrong label; a false reject
+    is a rejected query whose student has other encodings enrolled.
+    """
+    encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+    labels = np.asarray(labels)
+    if len(encodings) < 2:
+        return None
+
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(len(encodings), min(max_queries, len(encodings)), replace=False)
+    norms = np.einsum('ij,ij->i', encodings, encodings)
+
+    false_accepts = false_rejects = genuine_queries = 0
+    for start in range(0, len(sample), 512):
+        batch = sample[start:start + 512]
+        distances = pairwise_distances(encodings[batch], encodings, norms)
+        distances[np.arange(len(batch)), batch] = np.inf
+        nearest = np.argmin(distances, axis=1)
+        for query, row, distance in zip(batch, nearest, distances[np.arange(len(batch)), nearest]):
+            accepted = distance < threshold_for(int(labels[row]))
+            has_genuine = counts[inverse[query]] > 1
+            genuine_queries += int(has_genuine)
+            if accepted and labels[row] != labels[query]:
+                false_accepts += 1
+            elif not accepted and has_genuine:
+                false_rejects += 1
+
+    return {
+        'queries': len(sample),
+        'far': false_accepts / len(sample),
+        'frr': false_rejects / genuine_queries if genuine_queries else 0.0
+    }
+
+
+def calibrate(encodings, labels, default=0.5, **options):
+    """Thresholds, ROC curve and expected error rates for a trained gallery"""
+    thresholds, genuine, impostor = identity_thresholds(encodings, labels, default=default, **options)
+    return {
+        'thresholds': thresholds,
+        'roc': roc_curve(genuine, impostor),
+        'global': leave_one_out_rates(encodings, labels, lambda label: default),
+        'per_identity': leave_one_out_rates(encodings, labels, lambda label: thresholds.get(label, default)),
+        'default_threshold': default
+    }
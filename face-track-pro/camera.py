@@ -1,17 +1,26 @@
-import cv2
 import threading
 import time
+import numpy as np
 from threading import Thread
+from utils.startup import lazy_import
 
 class VideoCamera:
-    def __init__(self):
-        self.video = cv2.VideoCapture(0)  # Use default camera
+    def __init__(self, frame_ring=None, priority='attendance', source=0):
+        cv2 = lazy_import('cv2')
+        self.video = cv2.VideoCapture(source)  # Device index or stream URL; 0 is the default camera
         self.video.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         self.video.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         self.video.set(cv2.CAP_PROP_FPS, 30)
         
+        # Optional SharedFrameRing that recognition processes read from
+        self.frame_ring = frame_ring
+        
+        # 'attendance' cameras keep their recognition rate under overload; 'low' ones are slowed first
+        self.priority = priority
+        
         # Threading variables
         self.frame = None
+        self.frames_captured = 0  # Lets the reader tell how many frames it missed
         self.thread = None
         self.stopped = False
         
@@ -32,12 +41,19 @@ class VideoCamera:
             ret, frame = self.video.read()
             if ret:
                 self.frame = frame
+                self.frames_captured += 1
+                if self.frame_ring is not None and frame.shape == self.frame_ring.shape:
+                    self.frame_ring.write(frame)
             time.sleep(0.03)  # ~30 FPS
     
-    def get_frame(self):
-        """Get the latest frame from camera"""
-        if self.frame is not None:
-            return self.frame.copy()
+    def get_frame(self, out=None):
+        """Get the latest frame from camera, copied into out when it fits"""
+        frame = self.frame
+        if frame is not None:
+            if out is not None and out.shape == frame.shape:
+                np.copyto(out, frame)
+                return out
+            return frame.copy()
         return None
     
     def stop(self):
@@ -54,9 +70,13 @@ class VideoCamera:
 
 class IPCamera:
     """For IP camera support (future enhancement)"""
-    def __init__(self, ip_url):
+    def __init__(self, ip_url, frame_ring=None, priority='attendance'):
+        cv2 = lazy_import('cv2')
         self.video = cv2.VideoCapture(ip_url)
+        self.frame_ring = frame_ring
+        self.priority = priority
         self.frame = None
+        self.frames_captured = 0
         self.thread = None
         self.stopped = False
         self.start()
@@ -75,12 +95,19 @@ class IPCamera:
             ret, frame = self.video.read()
             if ret:
                 self.frame = frame
+                self.frames_captured += 1
+                if self.frame_ring is not None and frame.shape == self.frame_ring.shape:
+                    self.frame_ring.write(frame)
             time.sleep(0.03)
     
-    def get_frame(self):
-        """Get the latest frame from IP camera"""
-        if self.frame is not None:
-            return self.frame.copy()
+    def get_frame(self, out=None):
+        """Get the latest frame from IP camera, copied into out when it fits"""
+        frame = self.frame
+        if frame is not None:
+            if out is not None and out.shape == frame.shape:
+                np.copyto(out, frame)
+                return out
+            return frame.copy()
         return None
     
     def stop(self):
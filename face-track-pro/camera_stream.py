@@ -0,0 +1,220 @@
+import io
+import threading
+import time
+import numpy as np
+from face_recognition_module import StreamState
+from load_shedding import PRIORITY_ATTENDANCE
+from tracking import IdentityVoter
+from utils.student_registry import UNKNOWN_ID
+from utils.startup import lazy_import
+
+MJPEG_PART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MJPEG_PART_TRAILER = b'\r\n\r\n'
+
+
+class PreviewEncoder:
+    """JPEG encoder that builds multipart chunks in reused buffers.
+
+    cv2.imencode returns a new array on every call, which then had to be
+    copied once more into the chunk. Here the BGR to RGB conversion writes into a
+    preallocated frame and Pillow encodes straight after the multipart header
+    in a BytesIO that keeps its capacity, so the chunk handed to the viewers
+    is the only allocation per preview.
+    """
+
+    def __init__(self, quality=95):
+        self.quality = quality  # Same as the cv2.imencode default
+        self.rgb = None
+        self.output = io.BytesIO()
+
+    def encode(self, frame):
+        """Multipart chunk holding frame (BGR) as a JPEG"""
+        cv2 = lazy_import('cv2')
+        Image = lazy_import('PIL.Image')
+        if self.rgb is None or self.rgb.shape != frame.shape:
+            self.rgb = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb)
+        height, width = frame.shape[:2]
+
+        # Overwrite in place and cut off the tail; truncating to zero would release the buffer
+        output = self.output
+        output.seek(0)
+        output.write(MJPEG_PART_HEADER)
+        Image.frombuffer('RGB', (width, height), self.rgb, 'raw', 'RGB', 0, 1).save(
+            output, format='JPEG', quality=self.quality)
+        output.write(MJPEG_PART_TRAILER)
+        output.truncate()
+        return output.getvalue()
+
+
+class CameraStream:
+    """One recognition loop per camera, shared by all of its viewers.
+
+    A background thread reads the camera, runs recognition and attendance
+    voting once per frame and, while anyone is watching, encodes the preview
+    once. Each viewer's generator only waits for the next encoded chunk, so N
+    viewers cost one pipeline pass per frame instead of N (and add no extra
+    attendance votes).
+    """
+
+    def __init__(self, camera, recognizer, camera_id='default', voter=None, overload_controller=None,
+                 is_active=None, on_commit=None, on_identities=None, frame_interval=1.0 / 30, detector=None):
+        self.camera = camera
+        self.recognizer = recognizer
+        self.camera_id = camera_id
+        self.state = StreamState(camera_id, detector)  # detector=None uses the recognizer's
+        self.voter = voter or IdentityVoter()  # Tracks are per camera; boxes of two cameras never match
+        self.overload_controller = overload_controller
+        self.is_active = is_active or (lambda: True)
+        self.on_commit = on_commit  # Called with (student_id, when) for each committed identity
+        self.on_identities = on_identities  # Called with (stream, detected_names, when) when they change
+        self.identities = frozenset()  # Students recognized in the last processed frame
+        self.frame_interval = frame_interval
+        self.trace_recorder = None  # Set while a pipeline trace records this camera
+
+        self.encoder = PreviewEncoder()  # Previews are encoded once per frame for all viewers
+        self.chunk = None  # Latest multipart chunk, shared by every viewer
+        self.chunk_seq = 0
+        self.viewers = 0
+        self.last_preview = 0.0
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @property
+    def priority(self):
+        return getattr(self.camera, 'priority', PRIORITY_ATTENDANCE)
+
+    def start(self):
+        """Start the recognition loop in a background thread"""
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        frame_buffer = None  # Reused for every frame of this camera
+        last_captured = None
+        while not self.stop_event.is_set():
+            started = time.perf_counter()
+            if self.is_active():
+                # Cameras that count their captures let the controller see how far this loop lags
+                captured = getattr(self.camera, 'frames_captured', None)
+                frame = self.camera.get_frame(out=frame_buffer)
+                if frame is not None:
+                    frame_buffer = frame
+                    if captured is not None and self.overload_controller is not None:
+                        missed = captured - last_captured - 1 if last_captured is not None else 0
+                        self.overload_controller.observe_backlog(self.camera_id, max(0, missed))
+                        last_captured = captured
+                    try:
+                        self.step(frame)
+                    except Exception as e:
+                        print(f"Error processing camera {self.camera_id}: {e}")
+            # Pace the loop to the camera instead of re-processing the same frame
+            remaining = self.frame_interval - (time.perf_counter() - started)
+            if remaining > 0:
+                self.stop_event.wait(remaining)
+
+    def step(self, frame):
+        """Run one frame through recognition and voting, and publish its preview"""
+        recognizer = self.recognizer
+        if not recognizer.is_ready:
+            # Stream the raw feed until the recognizer has warmed up
+            if self.viewers:
+                self.publish(self.encoder.encode(frame))
+            return
+
+        controller = self.overload_controller
+        with controller.track_frame():
+            # Under overload, frames between previews are still recognized but not drawn or encoded
+            now = time.time()
+            send_preview = self.viewers > 0 and now - self.last_preview >= controller.preview_interval()
+            overlay = send_preview and controller.show_overlay()
+            detection_stride = controller.detection_stride_for(self.priority)
+            state = self.state
+
+            # A frame with no preview and no detection due only advances the counter
+            if not send_preview and recognizer.skip_frame(state, detection_stride):
+                if state.detection_deferred:
+                    controller.defer_detection()
+                if self.viewers:
+                    controller.drop_preview()
+                return
+
+            # Capture the input before the overlay is drawn onto it
+            recorder = self.trace_recorder
+            if recorder is not None and not recorder.started:
+                recorder.begin(self.voter, recognizer)
+            trace_input = recorder.encode_input(frame) if recorder is not None else None
+            when = recognizer.clock()
+
+            processed_frame, detected_names = recognizer.process_frame(
+                frame, overlay=overlay, draw=send_preview, detection_stride=detection_stride, stream=state
+            )
+            stage_times = dict(state.last_stage_times)
+            if state.detection_deferred:
+                controller.defer_detection()
+
+            # Log attendance once a track's identity has enough agreeing votes
+            committed = []
+            if state.frame_processed:
+                # Only a change in who is in view is news; a steady scene publishes nothing
+                identities = frozenset(label for label in state.last_face_labels if label != UNKNOWN_ID)
+                if identities != self.identities:
+                    self.identities = identities
+                    if identities and self.on_identities is not None:
+                        self.on_identities(self, detected_names, when)
+                committed = self.voter.update(state.last_face_locations, state.last_face_labels,
+                                              today=when.date(), confident=state.last_face_confident,
+                                              fresh=state.fresh_faces())
+                if self.on_commit is not None:
+                    for student_id in committed:
+                        self.on_commit(student_id, when)
+
+            chunk = None
+            if send_preview:
+                encoding = time.perf_counter()
+                chunk = self.encoder.encode(processed_frame)
+                stage_times['jpeg'] = time.perf_counter() - encoding
+                self.last_preview = now
+            elif self.viewers:
+                controller.drop_preview()
+
+            for stage, seconds in stage_times.items():
+                controller.observe(stage, seconds)
+            if recorder is not None:
+                recorder.record(trace_input, when, state, committed, stage_times,
+                                overlay=overlay, draw=send_preview, detection_stride=detection_stride)
+
+        if chunk is not None:
+            self.publish(chunk)
+
+    def publish(self, chunk):
+        """Hand a new chunk to every waiting viewer"""
+        with self.condition:
+            self.chunk = chunk
+            self.chunk_seq += 1
+            self.condition.notify_all()
+
+    def frames(self):
+        """MJPEG chunks for one viewer; the generator ends when the client disconnects"""
+        with self.condition:
+            self.viewers += 1
+            seq = self.chunk_seq
+        try:
+            while not self.stop_event.is_set():
+                with self.condition:
+                    self.condition.wait_for(lambda: self.chunk_seq != seq or self.stop_event.is_set(), timeout=1.0)
+                    if self.chunk_seq == seq:
+                        continue
+                    chunk, seq = self.chunk, self.chunk_seq
+                yield chunk
+        finally:
+            with self.condition:
+                self.viewers -= 1
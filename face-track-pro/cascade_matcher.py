@@ -0,0 +1,154 @@
+"""
+Exact nearest-neighbour matching with early-exit partial distances.
+
+The gallery is rotated onto its principal components, which leaves every
+Euclidean distance unchanged but moves most of the variance into the
+leading dimensions. A squared distance summed over a prefix of dimensions
+is a lower bound of the full one, so rows whose partial distance already
+exceeds the best full distance found so far (or the acceptance bound) can
+be dropped; the remaining dimensions are only summed for the survivors.
+The winner's distance is recomputed on the original encodings, so results
+match a full face_distance scan.
+
+Check exactness and the work saved on a trained gallery:
+    python cascade_matcher.py --model face-track-pro/local.pkl
+"""
+
+import numpy as np
+
+
+class CascadeMatcher:
+    """PCA-rotated gallery scanned in dimension blocks with pruning"""
+
+    def __init__(self, encodings, prefix_dims=32, block_dims=32):
+        self.encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+        self.prefix_dims = prefix_dims
+        self.block_dims = block_dims
+
+        self.mean = self.encodings.mean(axis=0) if len(self.encodings) else np.zeros(128)
+        centered = self.encodings - self.mean
+        # Orthonormal rotation, components ordered by decreasing variance
+        _, eigenvectors = np.linalg.eigh(centered.T @ centered)
+        self.rotation = eigenvectors[:, ::-1].copy()
+        self.rotated = centered @ self.rotation
+        self.prefix = np.ascontiguousarray(self.rotated[:, :prefix_dims])
+
+        self.stats = {'queries': 0, 'dims_evaluated': 0, 'full_scan_dims': 0}
+
+    def nearest(self, face_encoding, max_distance=None):
+        """Index of the closest gallery row and its exact distance, as a full scan returns them.
+
+        max_distance only saves work: rows that cannot come within it are
+        pruned first, and only if none is left is the scan repeated against
+        the nearest-row bound, so unknown faces still get their true distance.
+        """
+        rows = len(self.encodings)
+        if rows == 0:
+            return -1, 1.0
+
+        query = np.asarray(face_encoding, dtype=np.float64)
+        rotated_query = (query - self.mean) @ self.rotation
+
+        diff = self.prefix - rotated_query[:self.prefix_dims]
+        prefix_partial = np.einsum('ij,ij->i', diff, diff)
+        dims = rows * self.prefix_dims
+
+        # The row with the smallest prefix distance gives the first upper bound
+        seed = int(np.argmin(prefix_partial))
+        seed_diff = self.rotated[seed] - rotated_query
+        bound = float(seed_diff @ seed_diff)
+
+        alive = []
+        if max_distance is not None and max_distance * max_distance < bound:
+            alive, partial, scanned = self.scan(prefix_partial, rotated_query, max_distance * max_distance)
+            dims += scanned
+        if len(alive) == 0:
+            alive, partial, scanned = self.scan(prefix_partial, rotated_query, bound)
+            dims += scanned
+
+        # Survivors hold full squared distances; rounding may drop the seed itself
+        best_index = int(alive[np.argmin(partial[alive])]) if len(alive) else seed
+
+        self.stats['queries'] += 1
+        self.stats['dims_evaluated'] += dims
+        self.stats['full_scan_dims'] += rows * 128
+        # Same reduction as face_distance, so the value is identical to a full scan
+        return best_index, float(np.linalg.norm(self.encodings[best_index:best_index + 1] - query, axis=1)[0])
+
+    def scan(self, prefix_partial, rotated_query, bound):
+        """Rows whose squared distance is within bound, their distances and the dimensions summed"""
+        partial = prefix_partial.copy()
+        alive = np.flatnonzero(partial <= bound)
+        dims = 0
+        for start in range(self.prefix_dims, 128, self.block_dims):
+            if len(alive) == 0:
+                break
+            end = min(start + self.block_dims, 128)
+            block = self.rotated[alive, start:end] - rotated_query[start:end]
+            partial[alive] += np.einsum('ij,ij->i', block, block)
+            dims += len(alive) * (end - start)
+            alive = alive[partial[alive] <= bound]
+        return alive, partial, dims
+
+    def get_stats(self):
+        """Fraction of the full-scan multiply-adds actually performed"""
+        full = self.stats['full_scan_dims']
+        return {
+            'queries': self.stats['queries'],
+            'rows': len(self.encodings),
+            'prefix_dims': self.prefix_dims,
+            'work_ratio': self.stats['dims_evaluated'] / full if full else 0.0
+        }
+
+
+def verify_exactness(encodings, queries, max_distance=None, prefix_dims=32):
+    """Compare the cascade with a full distance scan on the same queries.
+
+    Returns the number of queries whose nearest row or distance differ
+    (ignoring exact ties) and the work ratio.
+    """
+    encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+    matcher = CascadeMatcher(encodings, prefix_dims=prefix_dims)
+    mismatches = 0
+    for query in np.asarray(queries, dtype=np.float64).reshape(-1, 128):
+        distances = np.linalg.norm(encodings - query, axis=1)
+        expected = int(np.argmin(distances))
+        index, distance = matcher.nearest(query, max_distance)
+        same_row = index == expected or distances[index] == distances[expected]
+        if not same_row or distance != distances[expected]:
+            mismatches += 1
+    return mismatches, matcher.get_stats()
+
+
+def main():
+    """Main function for command-line usage"""
+    import argparse
+    import pickle
+
+    parser = argparse.ArgumentParser(description='FaceTrack Pro Cascaded Matcher Exactness Check')
+    parser.add_argument('--model', default='face-track-pro/local.pkl', help='Trained gallery')
+    parser.add_argument('--queries', type=int, default=500, help='Perturbed gallery rows used as queries')
+    parser.add_argument('--noise', type=float, default=0.02, help='Per-dimension noise added to queries')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='Acceptance bound used for pruning')
+    parser.add_argument('--prefix-dims', type=int, default=32, help='Leading PCA dimensions scanned for every row')
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        encodings = np.asarray(pickle.load(f)['encodings'], dtype=np.float64).reshape(-1, 128)
+    if len(encodings) == 0:
+        print("Gallery is empty")
+        return
+
+    rng = np.random.default_rng(0)
+    rows = rng.choice(len(encodings), min(args.queries, len(encodings)), replace=False)
+    queries = encodings[rows] + rng.normal(0, args.noise, (len(rows), 128))
+
+    for bound in (None, args.tolerance):
+        mismatches, stats = verify_exactness(encodings, queries, bound, args.prefix_dims)
+        label = 'nearest row' if bound is None else f'bound {bound}'
+        print(f"{label:<14} mismatches: {mismatches}/{len(queries)}  "
+              f"work: {stats['work_ratio']:.1%} of a full scan")
+
+
+if __name__ == '__main__':
+    main()
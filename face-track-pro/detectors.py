@@ -0,0 +1,426 @@
+"""
+Face detector backends with a common interface.
+
+Every detector takes an RGB image and returns face boxes as
+(top, right, bottom, left) tuples in that image's coordinates, the same
+format face_recognition uses. `scale` shrinks the image before detection
+(0.25 = quarter size) and `upsample` trades speed for smaller faces.
+
+Compare backends on the same frames:
+    python detectors.py --frames path/to/frames --backends hog haar cascade
+"""
+
+import os
+import threading
+import time
+from collections import deque
+import numpy as np
+from utils.startup import lazy_import
+
+
+class FaceDetector:
+    """Base class: handles scaling and maps boxes back to the input image"""
+    name = 'base'
+
+    def __init__(self, scale=1.0, upsample=1):
+        self.scale = scale
+        self.upsample = upsample
+
+    def detect(self, rgb_image):
+        """Detect faces and return boxes in rgb_image coordinates"""
+        if self.scale == 1.0:
+            return self.detect_faces(rgb_image)
+
+        cv2 = lazy_import('cv2')
+        small = cv2.resize(rgb_image, (0, 0), fx=self.scale, fy=self.scale)
+        return [self.rescale(box, 1.0 / self.scale, rgb_image.shape) for box in self.detect_faces(small)]
+
+    def detect_faces(self, rgb_image):
+        """Detect faces on an already scaled image"""
+        raise NotImplementedError
+
+    def cache_tag(self):
+        """Parameters that change detector output, used in cache keys (None: output is not cacheable)"""
+        return f"{self.name}:{self.scale}:{self.upsample}"
+
+    @staticmethod
+    def rescale(box, factor, shape=None):
+        """Scale a (top, right, bottom, left) box, clipping to the image if given"""
+        top, right, bottom, left = (int(round(v * factor)) for v in box)
+        if shape is not None:
+            height, width = shape[:2]
+            top, left = max(0, top), max(0, left)
+            bottom, right = min(height, bottom), min(width, right)
+        return top, right, bottom, left
+
+
+class HOGDetector(FaceDetector):
+    """dlib HOG detector via face_recognition (CPU, the original default)"""
+    name = 'hog'
+
+    def detect_faces(self, rgb_image):
+        face_recognition = lazy_import('face_recognition')
+        return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=self.upsample, model='hog')
+
+
+class CNNDetector(FaceDetector):
+    """dlib CNN detector via face_recognition (accurate, slow without a GPU)"""
+    name = 'cnn'
+
+    def detect_faces(self, rgb_image):
+        face_recognition = lazy_import('face_recognition')
+        return face_recognition.face_locations(rgb_image, number_of_times_to_upsample=self.upsample, model='cnn')
+
+
+class HaarDetector(FaceDetector):
+    """OpenCV Haar cascade (fastest on CPU, more false positives)"""
+    name = 'haar'
+
+    def __init__(self, scale=1.0, upsample=0, cascade_path=None, scale_factor=1.1, min_neighbors=5, min_size=20):
+        super().__init__(scale, upsample)
+        cv2 = lazy_import('cv2')
+        self.cascade_path = cascade_path or os.path.join(cv2.data.haarcascades, 'haarcascade_frontalface_default.xml')
+        self.classifier = cv2.CascadeClassifier(self.cascade_path)
+        if self.classifier.empty():
+            raise FileNotFoundError(f"Could not load Haar cascade: {self.cascade_path}")
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect_faces(self, rgb_image):
+        cv2 = lazy_import('cv2')
+        factor = 2 ** self.upsample
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        if factor != 1:
+            gray = cv2.resize(gray, (0, 0), fx=factor, fy=factor)
+        faces = self.classifier.detectMultiScale(gray, scaleFactor=self.scale_factor,
+                                                 minNeighbors=self.min_neighbors,
+                                                 minSize=(self.min_size, self.min_size))
+        boxes = [(y, x + w, y + h, x) for (x, y, w, h) in faces]
+        return [self.rescale(box, 1.0 / factor, rgb_image.shape) for box in boxes]
+
+
+class DNNDetector(FaceDetector):
+    """OpenCV DNN ResNet-10 SSD face detector (Caffe model files required)"""
+    name = 'dnn'
+
+    def __init__(self, scale=1.0, upsample=0, confidence=0.6,
+                 prototxt_path='face-track-pro/models/deploy.prototxt',
+                 model_path='face-track-pro/models/res10_300x300_ssd_iter_140000.caffemodel'):
+        super().__init__(scale, upsample)
+        cv2 = lazy_import('cv2')
+        for path in (prototxt_path, model_path):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"DNN face detector model file missing: {path}")
+        self.net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+        self.confidence = confidence
+        self.input_size = 300 * (2 ** upsample)
+
+    def detect_faces(self, rgb_image):
+        cv2 = lazy_import('cv2')
+        height, width = rgb_image.shape[:2]
+        bgr = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR)
+        blob = cv2.dnn.blobFromImage(bgr, 1.0, (self.input_size, self.input_size), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()
+
+        boxes = []
+        for i in range(detections.shape[2]):
+            if detections[0, 0, i, 2] < self.confidence:
+                continue
+            left, top, right, bottom = detections[0, 0, i, 3:7] * np.array([width, height, width, height])
+            box = self.rescale((top, right, bottom, left), 1.0, rgb_image.shape)
+            if box[2] > box[0] and box[1] > box[3]:
+                boxes.append(box)
+        return boxes
+
+    def cache_tag(self):
+        return f"{super().cache_tag()}:{self.confidence}"
+
+
+class CascadeDetector(FaceDetector):
+    """Fast-then-verify cascade.
+
+    A cheap detector proposes candidate boxes on the scaled frame; each
+    candidate region is then verified by a more accurate detector on a
+    full-resolution crop. Frames where the fast stage finds nothing cost only
+    the fast stage.
+    """
+    name = 'cascade'
+
+    def __init__(self, scale=0.5, upsample=1, fast=None, verifier=None, margin=0.3):
+        super().__init__(scale, upsample)
+        self.fast = fast or HaarDetector(scale=1.0, upsample=0, min_neighbors=3)
+        self.verifier = verifier or HOGDetector(scale=1.0, upsample=upsample)
+        self.margin = margin
+
+    def detect(self, rgb_image):
+        candidates = FaceDetector.detect(self, rgb_image)
+        height, width = rgb_image.shape[:2]
+
+        verified = []
+        for top, right, bottom, left in candidates:
+            pad_y = int((bottom - top) * self.margin)
+            pad_x = int((right - left) * self.margin)
+            y0, y1 = max(0, top - pad_y), min(height, bottom + pad_y)
+            x0, x1 = max(0, left - pad_x), min(width, right + pad_x)
+            for v_top, v_right, v_bottom, v_left in self.verifier.detect(rgb_image[y0:y1, x0:x1]):
+                box = (v_top + y0, v_right + x0, v_bottom + y0, v_left + x0)
+                if not any(iou(box, other) > 0.5 for other in verified):
+                    verified.append(box)
+        return verified
+
+    def detect_faces(self, rgb_image):
+        return self.fast.detect(rgb_image)
+
+    def cache_tag(self):
+        tags = [self.fast.cache_tag(), self.verifier.cache_tag()]
+        if None in tags:
+            return None
+        return f"{super().cache_tag()}:{tags[0]}:{tags[1]}"
+
+
+class AdaptiveScaleDetector(FaceDetector):
+    """Detection-scale pyramid driven by the face sizes a camera actually sees.
+
+    Recent face heights are recorded per tile of a grid over the frame. From
+    them the detector picks the coarsest full-frame scale that still finds the
+    faces in most of the frame, and runs a finer pass only on the tiles where
+    small faces are expected. Every explore_every calls (and until enough
+    faces have been seen) a full-frame pass at the finest scale discovers
+    faces that the coarse scale would miss.
+    """
+    name = 'adaptive'
+
+    def __init__(self, scale=0.25, upsample=1, base=None, scales=(0.125, 0.25, 0.5, 1.0), grid=(2, 3),
+                 history=50, min_samples=10, explore_every=30, min_face_px=80, safety=1.25):
+        # scale is only the starting scale used until enough faces have been seen
+        base = base or HOGDetector(scale=1.0, upsample=upsample)
+        super().__init__(scale=scale, upsample=base.upsample)
+        self.base = base
+        self.scales = sorted(scales)
+        self.grid = grid
+        self.min_samples = min_samples
+        self.explore_every = explore_every
+        # Smallest face (in detector input pixels) the base detector finds reliably
+        self.min_face_px = min_face_px / float(2 ** base.upsample) * safety
+
+        self.tile_sizes = {(row, col): deque(maxlen=history)
+                           for row in range(grid[0]) for col in range(grid[1])}
+        self.calls = 0
+        self.last_plan = {'coarse_scale': scale, 'fine_tiles': {}, 'area_fraction': scale ** 2}
+        # Guards calls, tile_sizes and last_plan; detection itself runs unlocked
+        self.lock = threading.Lock()
+
+    def detect(self, rgb_image):
+        with self.lock:
+            self.calls += 1
+            samples = sum(len(sizes) for sizes in self.tile_sizes.values())
+            explore = self.calls % self.explore_every == 1
+            if explore or samples < self.min_samples:
+                coarse_scale, fine_tiles = (self.scales[-1] if explore else self.scale), {}
+            else:
+                coarse_scale, fine_tiles = self.plan()
+
+        boxes, area = self.detect_planned(rgb_image, coarse_scale, fine_tiles)
+
+        with self.lock:
+            self.last_plan = {'coarse_scale': coarse_scale, 'fine_tiles': fine_tiles, 'area_fraction': area}
+            self.record(boxes, rgb_image.shape)
+        return boxes
+
+    def detect_at(self, rgb_image, scale, offset=(0, 0), clip_shape=None):
+        """Run the base detector at one scale and map boxes to frame coordinates"""
+        cv2 = lazy_import('cv2')
+        image = rgb_image if scale == 1.0 else cv2.resize(rgb_image, (0, 0), fx=scale, fy=scale,
+                                                          interpolation=cv2.INTER_AREA)
+        boxes = []
+        for box in self.base.detect_faces(image):
+            top, right, bottom, left = self.rescale(box, 1.0 / scale, rgb_image.shape)
+            boxes.append((top + offset[0], right + offset[1], bottom + offset[0], left + offset[1]))
+        return boxes
+
+    def detect_planned(self, rgb_image, coarse_scale, fine_tiles):
+        """Coarse full-frame pass plus fine passes on tiles with small faces; returns (boxes, area scanned)"""
+        height, width = rgb_image.shape[:2]
+        boxes = self.detect_at(rgb_image, coarse_scale)
+
+        tile_h, tile_w = height / float(self.grid[0]), width / float(self.grid[1])
+        area = coarse_scale ** 2
+        for (row, col), scale in fine_tiles.items():
+            # Overlap neighbouring tiles so faces on a border are not cut in half
+            margin_y, margin_x = int(tile_h * 0.25), int(tile_w * 0.25)
+            y0, y1 = max(0, int(row * tile_h) - margin_y), min(height, int((row + 1) * tile_h) + margin_y)
+            x0, x1 = max(0, int(col * tile_w) - margin_x), min(width, int((col + 1) * tile_w) + margin_x)
+            for box in self.detect_at(rgb_image[y0:y1, x0:x1], scale, offset=(y0, x0)):
+                if not any(iou(box, other) > 0.3 for other in boxes):
+                    boxes.append(box)
+            area += ((y1 - y0) * (x1 - x0)) / float(height * width) * scale ** 2
+
+        return boxes, area
+
+    def plan(self):
+        """Choose the coarse scale and per-tile fine scales with the least pixels scanned (caller holds the lock)"""
+        tile_fraction = 1.0 / (self.grid[0] * self.grid[1])
+        needed = {}
+        for tile, sizes in self.tile_sizes.items():
+            if sizes:
+                # Plan for the small end of the sizes seen in this tile
+                needed[tile] = self.required_scale(np.percentile(sizes, 10))
+
+        best = None
+        for coarse in self.scales:
+            fine = {tile: scale for tile, scale in needed.items() if scale > coarse}
+            cost = coarse ** 2 + sum(tile_fraction * 2.25 * scale ** 2 for scale in fine.values())
+            if best is None or cost < best[0]:
+                best = (cost, coarse, fine)
+        return best[1], best[2]
+
+    def required_scale(self, face_px):
+        """Coarsest available scale at which a face of face_px is still detectable"""
+        for scale in self.scales:
+            if face_px * scale >= self.min_face_px:
+                return scale
+        return self.scales[-1]
+
+    def record(self, boxes, shape):
+        """Add detected face heights to the tile they were found in (caller holds the lock)"""
+        height, width = shape[:2]
+        for top, right, bottom, left in boxes:
+            row = min(self.grid[0] - 1, int((top + bottom) / 2.0 / height * self.grid[0]))
+            col = min(self.grid[1] - 1, int((left + right) / 2.0 / width * self.grid[1]))
+            self.tile_sizes[(row, col)].append(bottom - top)
+
+    def get_stats(self):
+        """Get the current scale plan and the share of full-resolution pixels scanned"""
+        with self.lock:
+            return {
+                'calls': self.calls,
+                'samples': sum(len(sizes) for sizes in self.tile_sizes.values()),
+                'coarse_scale': self.last_plan['coarse_scale'],
+                'fine_tiles': {f"{row},{col}": scale for (row, col), scale in self.last_plan['fine_tiles'].items()},
+                'area_fraction': round(self.last_plan['area_fraction'], 4)
+            }
+
+    def cache_tag(self):
+        # Output depends on learned state, so results from this detector are never cached
+        return None
+
+
+DETECTOR_BACKENDS = {
+    'hog': HOGDetector,
+    'cnn': CNNDetector,
+    'haar': HaarDetector,
+    'dnn': DNNDetector,
+    'cascade': CascadeDetector,
+    'adaptive': AdaptiveScaleDetector,
+}
+
+
+def create_detector(backend='hog', **options):
+    """Create a detector by backend name with backend-specific options"""
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}'. Choose from: {', '.join(DETECTOR_BACKENDS)}")
+    return DETECTOR_BACKENDS[backend](**options)
+
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, right = max(a[0], b[0]), min(a[1], b[1])
+    bottom, left = min(a[2], b[2]), max(a[3], b[3])
+    if right <= left or bottom <= top:
+        return 0.0
+    intersection = (right - left) * (bottom - top)
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def benchmark_detectors(frames, detectors, reference, iou_threshold=0.4):
+    """Compare detectors on the same RGB frames.
+
+    Recall and precision are measured against the boxes found by the
+    reference detector; latency is wall-clock time per frame.
+    """
+    truth = [reference.detect(frame) for frame in frames]
+    results = {}
+    for label, detector in detectors.items():
+        latencies = []
+        found = matched = expected = 0
+        for frame, truth_boxes in zip(frames, truth):
+            start = time.perf_counter()
+            boxes = detector.detect(frame)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            found += len(boxes)
+            expected += len(truth_boxes)
+            matched += sum(1 for t in truth_boxes if any(iou(t, b) >= iou_threshold for b in boxes))
+
+        results[label] = {
+            'recall': matched / expected if expected else 1.0,
+            'precision': min(1.0, matched / found) if found else 1.0,
+            'mean_ms': float(np.mean(latencies)) if latencies else 0.0,
+            'p95_ms': float(np.percentile(latencies, 95)) if latencies else 0.0,
+            'faces': found
+        }
+    return results
+
+
+def load_frames(path, limit=200):
+    """Load RGB frames from a directory of images or a video file"""
+    cv2 = lazy_import('cv2')
+    frames = []
+    if os.path.isdir(path):
+        for filename in sorted(os.listdir(path)):
+            image = cv2.imread(os.path.join(path, filename))
+            if image is not None:
+                frames.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+            if len(frames) >= limit:
+                break
+    else:
+        video = cv2.VideoCapture(path)
+        while len(frames) < limit:
+            ret, frame = video.read()
+            if not ret:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        video.release()
+    return frames
+
+
+def main():
+    """Main function for command-line usage"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='FaceTrack Pro Detector Benchmark')
+    parser.add_argument('--frames', required=True, help='Directory of images or a video file')
+    parser.add_argument('--backends', nargs='+', default=['hog', 'haar', 'cascade'], help='Backends to compare')
+    parser.add_argument('--scale', type=float, default=0.25, help='Downscale applied before detection')
+    parser.add_argument('--upsample', type=int, default=1, help='Upsampling passes for dlib backends')
+    parser.add_argument('--reference', default='hog', help='Backend used as ground truth at full resolution')
+    parser.add_argument('--limit', type=int, default=200, help='Maximum number of frames')
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames, args.limit)
+    if not frames:
+        print(f"No frames could be loaded from {args.frames}")
+        return
+
+    reference = create_detector(args.reference, scale=1.0, upsample=max(args.upsample, 1))
+    detectors = {}
+    for backend in args.backends:
+        try:
+            detectors[backend] = create_detector(backend, scale=args.scale, upsample=args.upsample)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"Skipping {backend}: {e}")
+
+    results = benchmark_detectors(frames, detectors, reference)
+    print(f"\n{len(frames)} frames, reference: {args.reference} at full resolution")
+    print(f"{'Backend':<10} {'Recall':>7} {'Prec.':>7} {'Mean ms':>9} {'P95 ms':>9}")
+    for backend, result in results.items():
+        print(f"{backend:<10} {result['recall']:>7.2f} {result['precision']:>7.2f} "
+              f"{result['mean_ms']:>9.1f} {result['p95_ms']:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
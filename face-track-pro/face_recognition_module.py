@@ -1,91 +1,446 @@
-import cv2
-import face_recognition
 import pickle
 import numpy as np
 import os
+import tempfile
+import threading
+import time
 from datetime import datetime
+from utils.startup import lazy_import, record_phase
+from detectors import create_detector
+from utils.student_registry import UNKNOWN_ID, StudentRegistry, gallery_labels
+from unknown_faces import UnknownFaceCache
+from cascade_matcher import CascadeMatcher
+from calibration import pairwise_distances
+from recognition_cache import RecognitionCache, face_hash
+
+class StreamState:
+    """Pipeline state of one video stream: detection cadence and the last results.
+
+    Kept apart from FaceRecognizer so several cameras can share one recognizer
+    (and its gallery) without mixing up their frame counters and faces.
+    """
+    def __init__(self, camera_id='default', detector=None):
+        self.camera_id = camera_id
+        self.detector = detector  # Overrides the recognizer's detector for this camera
+        self.frame_count = 0
+        self.frame_processed = False  # Whether the last frame ran detection
+        self.detection_deferred = False  # Whether detection was due but deferred by detection_stride
+        self.last_stage_times = {}  # Seconds spent per stage on the last frame
+        
+        # Last known face locations for interpolation
+        self.last_face_locations = []
+        self.last_face_labels = []
+        self.last_face_names = []
+        self.last_face_confident = []
+        self.last_face_cached = []  # Result reused from the recognition cache, not a new observation
+        self.last_face_partial = []  # Matched while a gallery shard failed; the face may be someone else
+    
+    def fresh_faces(self):
+        """Which faces of the last processed frame count as a new, complete observation"""
+        return [not (cached or partial) for cached, partial in zip(self.last_face_cached, self.last_face_partial)]
+
+class Gallery:
+    """One loaded model: the encodings and everything derived from them.
+
+    FaceRecognizer replaces the whole object on reload, so a match never
+    combines rows of one model with the labels, index or thresholds of another.
+    """
+    def __init__(self, encodings=None, labels=None, student_names=None, index=None, cascade_matcher=None,
+                 thresholds=None, calibration=None):
+        self.encodings = encodings if encodings is not None else np.empty((0, 128))
+        self.labels = labels if labels is not None else np.empty(0, dtype=np.int32)  # Student ID per row
+        self.student_names = student_names if student_names is not None else {}  # Student ID -> display name
+        self.index = index  # QuantizedGallery, or None
+        self.cascade_matcher = cascade_matcher
+        self.thresholds = thresholds if thresholds is not None else {}
+        self.calibration = calibration
 
 class FaceRecognizer:
-    def __init__(self):
-        self.known_face_encodings = []
-        self.known_face_names = []
+    def __init__(self, detector=None, quantization=None, recognition_cache=None):
+        self.gallery = Gallery()  # Swapped in one assignment by load_model()
+        self.reload_lock = threading.Lock()  # One load_model() at a time
+        self.registry = StudentRegistry.shared()
         self.model_path = 'face-track-pro/local.pkl'
         
+        # Compressed gallery for the first matching pass, re-ranked exactly.
+        # Loaded from the trained model, or built at load time if a method is given.
+        self.quantization = quantization
+        
+        # Exact matcher that prunes rows on partial (PCA-prefix) distances;
+        # only worth building for larger galleries
+        self.cascade_min_rows = 256
+        
         # Face detection optimization
         self.face_detection_confidence = 0.6
-        self.face_recognition_tolerance = 0.5
+        self.face_recognition_tolerance = 0.5  # Used for students without a calibrated threshold
+        
+        # Per-student thresholds from FaceTrainer calibration (gallery.thresholds).
+        # A match well inside its student's threshold is reported as confident,
+        # so attendance can commit it without waiting for more votes.
+        self.clear_match_ratio = 0.8
+        self.batch_match_min = 8  # From this many faces, the gallery is matched as one matrix product
         self.process_every_n_frames = 3  # Process every 3rd frame for speed
-        self.frame_count = 0
+        self.frame_count_limit = 1000000  # Wraps the counter; kept a multiple of process_every_n_frames
         
-        # Last known face locations for interpolation
-        self.last_face_locations = []
-        self.last_face_names = []
+        # Wall clock for timestamps and cache ages; trace replay injects the recorded time
+        self.clock = datetime.now
+        
+        # Face detector backend; see detectors.py for HOG/CNN/Haar/DNN/cascade options
+        self.detector = detector or create_detector('hog', scale=0.25, upsample=1)
+        
+        # Preallocated black panel for the info overlay
+        self.overlay_black = None
+        
+        # Stream used when process_frame() is not given one (single-stream tools)
+        self.stream = StreamState()
+        
+        # Optional sharding.ShardCoordinator for galleries split across nodes
+        self.shard_coordinator = None
+        
+        # Clusters of recent unrecognized faces; repeats skip the gallery scan
+        self.unknown_faces = UnknownFaceCache()
+        
+        # Per-track results reused while the face crop stays the same (dHash)
+        self.recognition_cache = recognition_cache or RecognitionCache()
+        
+        # Set once the detector/encoder models and the gallery are loaded
+        self.is_ready = False
+    
+    def warm_up(self):
+        """Import the detector/encoder, load their models and the gallery"""
+        face_recognition = lazy_import('face_recognition')
+        lazy_import('cv2')
+        
+        with record_phase('load_gallery'):
+            self.load_model()
+        
+        # Run one tiny detection and encoding so dlib loads its model files now
+        blank = np.zeros((32, 32, 3), dtype=np.uint8)
+        self.detector.detect(blank)
+        face_recognition.face_encodings(blank, [(0, 31, 31, 0)])
+        
+        self.is_ready = True
+    
+    # Read-only views of the current gallery
+    known_face_encodings = property(lambda self: self.gallery.encodings)
+    known_face_labels = property(lambda self: self.gallery.labels)
+    student_names = property(lambda self: self.gallery.student_names)
+    gallery_index = property(lambda self: self.gallery.index)
+    cascade_matcher = property(lambda self: self.gallery.cascade_matcher)
+    identity_thresholds = property(lambda self: self.gallery.thresholds)
+    calibration = property(lambda self: self.gallery.calibration)
     
     def load_model(self):
-        """Load the trained face recognition model from pickle file"""
+        """Load the trained face recognition model from pickle file.
+
+        The new gallery is built completely (index fit, memory map, cascade)
+        before it replaces the old one in a single assignment; until then
+        matching keeps using the previous gallery as a whole.
+        """
+        with self.reload_lock:
+            try:
+                if os.path.exists(self.model_path):
+                    self.registry.refresh()
+                    with open(self.model_path, 'rb') as f:
+                        data = pickle.load(f)
+                    self.gallery = self.build_gallery(data)
+                    # Someone cached as unknown may have just been enrolled; other
+                    # clusters (pending enrolments) are kept
+                    self.unknown_faces.prune(self.prune_labels)
+                    if self.recognition_cache is not None:
+                        self.recognition_cache.clear()
+                    print(f"Loaded {len(self.known_face_labels)} known faces from model")
+                else:
+                    print("No existing model found. Please train the model first.")
+                    self.clear_model()
+            except Exception as e:
+                print(f"Error loading model: {e}")
+                self.clear_model()
+    
+    def prune_labels(self, centroids):
+        """Labels for UnknownFaceCache.prune(); a partial shard answer keeps every cluster"""
+        labels, _, failed_shards = self.match_gallery(list(centroids))
+        return [UNKNOWN_ID] * len(labels) if failed_shards else labels
+    
+    def build_gallery(self, data):
+        """Gallery for a loaded model file"""
+        encodings = np.asarray(data['encodings'], dtype=np.float64).reshape(-1, 128)
+        labels, student_names = gallery_labels(data, self.registry)
+        index = self.build_gallery_index(data, encodings, labels)
+        cascade_matcher = None
+        if index is not None:
+            # Only re-ranked rows are read, so the float64 matrix can stay on disk
+            encodings = index.encodings = self.map_encodings(encodings)
+        elif len(encodings) >= self.cascade_min_rows:
+            cascade_matcher = CascadeMatcher(encodings)
+        return Gallery(encodings, labels, student_names, index, cascade_matcher,
+                       data.get('thresholds', {}), data.get('calibration'))
+    
+    def build_gallery_index(self, data, encodings, labels):
+        """Quantized gallery from the model file, or fitted now if requested"""
+        if len(labels) == 0:
+            return None
+        from quantization import QuantizedGallery, create_quantizer
+        state = data.get('quantization')
+        if state is not None and (self.quantization is None or state['method'] == self.quantization):
+            return QuantizedGallery.from_state(encodings, state)
+        if self.quantization:
+            quantizer = create_quantizer(self.quantization).fit(encodings)
+            return QuantizedGallery(encodings, quantizer)
+        return None
+    
+    def map_encodings(self, encodings):
+        """Read-only memory map of the gallery, written next to the model file"""
+        path = f"{os.path.splitext(self.model_path)[0]}_encodings.npy"
         try:
-            if os.path.exists(self.model_path):
-                with open(self.model_path, 'rb') as f:
-                    data = pickle.load(f)
-                    self.known_face_encodings = data['encodings']
-                    self.known_face_names = data['names']
-                print(f"Loaded {len(self.known_face_names)} known faces from model")
-            else:
-                print("No existing model found. Please train the model first.")
-                self.known_face_encodings = []
-                self.known_face_names = []
-        except Exception as e:
-            print(f"Error loading model: {e}")
-            self.known_face_encodings = []
-            self.known_face_names = []
+            # A temporary file of its own, so overlapping writers never share one
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.npy.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    np.save(f, encodings)
+                # A new file, so maps still held by other readers keep the old rows
+                os.replace(tmp_path, path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+            return np.load(path, mmap_mode='r')
+        except OSError as e:
+            print(f"Keeping the gallery in memory: {e}")
+            return encodings
     
-    def process_frame(self, frame):
-        """Process a frame for face recognition"""
-        self.frame_count += 1
-        
-        # Resize frame for faster processing
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-        rgb_small_frame = small_frame[:, :, ::-1]  # Convert BGR to RGB
+    def clear_model(self):
+        """Forget the loaded gallery"""
+        self.gallery = Gallery()
+        if self.recognition_cache is not None:
+            self.recognition_cache.clear()
+    
+    def threshold_for(self, student_id, gallery=None):
+        """Match threshold of a student"""
+        return (gallery or self.gallery).thresholds.get(student_id, self.face_recognition_tolerance)
+    
+    def is_clear_match(self, student_id, distance):
+        """Whether a distance is well inside the student's threshold"""
+        return student_id != UNKNOWN_ID and distance < self.clear_match_ratio * self.threshold_for(student_id)
+    
+    def student_name(self, student_id):
+        """Display name of a student ID"""
+        student_names = self.gallery.student_names
+        name = student_names.get(student_id)
+        if name is None and student_id != UNKNOWN_ID:
+            # Matches from gallery shards may not be in the local gallery
+            name = self.registry.name_of(student_id)
+            student_names[student_id] = name
+        return name or "Unknown"
+    
+    def next_frame_count(self, stream):
+        """Counter value of the stream's next frame"""
+        frame_count = stream.frame_count + 1
+        return 0 if frame_count >= self.frame_count_limit * self.process_every_n_frames else frame_count
+    
+    def advance(self, stream, frame_count, detection_stride=1):
+        """Move the stream to frame_count and decide whether that frame runs detection"""
+        stream.frame_count = frame_count
+        # Only process every N frames for speed optimization
+        eligible = frame_count % self.process_every_n_frames == 0
+        stream.frame_processed = eligible and frame_count % (self.process_every_n_frames * detection_stride) == 0
+        stream.detection_deferred = eligible and not stream.frame_processed
+        stream.last_stage_times = {}
+    
+    def skip_frame(self, stream=None, detection_stride=1):
+        """Count a frame nobody will see without touching it, unless detection is due on it.
+
+        Returns True if the frame was skipped; otherwise the stream is left
+        unchanged and the frame must go through process_frame().
+        """
+        stream = stream or self.stream
+        frame_count = self.next_frame_count(stream)
+        if frame_count % (self.process_every_n_frames * detection_stride) == 0:
+            return False
+        self.advance(stream, frame_count, detection_stride)
+        return True
+    
+    def process_frame(self, frame, overlay=True, draw=True, detection_stride=1, stream=None):
+        """Process a frame for face recognition.
+
+        The overload controller can turn off the info overlay, skip drawing for
+        frames no viewer will receive, and stretch the detection interval of
+        low-priority cameras by detection_stride. Cadence and results are kept
+        in stream (a StreamState per camera), self.stream by default.
+        """
+        cv2 = lazy_import('cv2')
+        face_recognition = lazy_import('face_recognition')
+        stream = stream or self.stream
+        self.advance(stream, self.next_frame_count(stream), detection_stride)
         
         detected_names = []
-        
-        # Only process every N frames for speed optimization
-        if self.frame_count % self.process_every_n_frames == 0:
-            # Find faces in the current frame
-            face_locations = face_recognition.face_locations(rgb_small_frame, model='hog')
-            face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        started = time.perf_counter()
+        now = self.clock().timestamp()
+        if stream.frame_processed:
+            # Find faces in the current frame; the detector handles its own downscaling
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            face_locations = (stream.detector or self.detector).detect(rgb_frame)
+            detected = time.perf_counter()
+            stream.last_stage_times['detect'] = detected - started
+            face_labels = [UNKNOWN_ID] * len(face_locations)
+            face_confident = [False] * len(face_locations)
+            face_cached = [False] * len(face_locations)
+            face_partial = [False] * len(face_locations)
             
-            face_names = []
-            for face_encoding in face_encodings:
-                # Check if face matches any known faces
-                matches = face_recognition.compare_faces(
-                    self.known_face_encodings, 
-                    face_encoding,
-                    tolerance=self.face_recognition_tolerance
-                )
-                name = "Unknown"
-                
-                # Use the known face with the smallest distance
-                face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-                if len(face_distances) > 0:
-                    best_match_index = np.argmin(face_distances)
-                    if matches[best_match_index] and face_distances[best_match_index] < self.face_recognition_tolerance:
-                        name = self.known_face_names[best_match_index]
-                        detected_names.append(name)
-                
-                face_names.append(name)
+            # A face whose crop has not changed since its track was last recognized
+            # reuses that result and skips both encoding and gallery matching
+            if self.recognition_cache is not None:
+                face_hashes = [face_hash(rgb_frame, location) for location in face_locations]
+                cache_results = self.recognition_cache.lookup(face_locations, face_hashes, now, stream.camera_id)
+                for i, (track_id, entry) in enumerate(cache_results):
+                    if entry is not None:
+                        face_labels[i] = entry.label
+                        face_confident[i] = entry.confident
+                        face_cached[i] = True
+            to_encode = [i for i, cached in enumerate(face_cached) if not cached]
+            face_encodings = face_recognition.face_encodings(rgb_frame, [face_locations[i] for i in to_encode])
+            encoded = time.perf_counter()
+            stream.last_stage_times['encode'] = encoded - detected
+            
+            # Repeats of a recent unknown visitor are answered by the small cluster cache
+            distances = {}
+            pending = []
+            for i, face_encoding in zip(to_encode, face_encodings):
+                if self.unknown_faces is None or self.unknown_faces.lookup(face_encoding, now) is None:
+                    pending.append((i, face_encoding))
+                else:
+                    distances[i] = 1.0
+            
+            matched_labels, matched_distances, failed_shards = self.match_gallery(
+                [face_encoding for _, face_encoding in pending])
+            for (i, face_encoding), label, distance in zip(pending, matched_labels, matched_distances):
+                face_labels[i] = label
+                face_confident[i] = self.is_clear_match(label, distance) and not failed_shards
+                distances[i] = distance
+                if failed_shards:
+                    # A shard that did not answer may hold a closer student: show the
+                    # result, but do not cluster, cache or vote on it
+                    face_partial[i] = True
+                elif self.unknown_faces is not None:
+                    if label == UNKNOWN_ID:
+                        self.unknown_faces.add(face_encoding, frame, face_locations[i], now)
+                    else:
+                        self.unknown_faces.forget(face_encoding)
+            
+            if self.recognition_cache is not None:
+                for i in to_encode:
+                    if face_partial[i]:
+                        continue
+                    self.recognition_cache.store(cache_results[i][0], face_locations[i], face_hashes[i],
+                                                 face_labels[i], distances[i], face_confident[i], now,
+                                                 stream.camera_id)
             
-            # Scale back up face locations since the frame we detected in was scaled to 1/4 size
-            self.last_face_locations = [(top*4, right*4, bottom*4, left*4) for (top, right, bottom, left) in face_locations]
-            self.last_face_names = face_names
+            stream.last_stage_times['match'] = time.perf_counter() - encoded
+            
+            # Names are resolved only for display
+            face_names = [self.student_name(label) for label in face_labels]
+            detected_names = [name for label, name in zip(face_labels, face_names) if label != UNKNOWN_ID]
+            
+            stream.last_face_locations = face_locations
+            stream.last_face_labels = face_labels
+            stream.last_face_names = face_names
+            stream.last_face_confident = face_confident
+            stream.last_face_cached = face_cached
+            stream.last_face_partial = face_partial
         
         # Draw the results on the frame
-        processed_frame = self.draw_results(frame, self.last_face_locations, self.last_face_names)
+        if draw:
+            drawing = time.perf_counter()
+            processed_frame = self.draw_results(frame, stream.last_face_locations, stream.last_face_names, overlay,
+                                               stream.frame_count)
+            stream.last_stage_times['draw'] = time.perf_counter() - drawing
+        else:
+            processed_frame = frame
         
         return processed_frame, detected_names
     
-    def draw_results(self, frame, face_locations, face_names):
+    def match_gallery(self, face_encodings):
+        """Match encodings against the gallery.
+
+        Returns a student ID (or UNKNOWN_ID) and the match distance per encoding,
+        and the gallery shards that failed to answer (empty without sharding).
+        A match is accepted inside the matched student's own threshold.
+        """
+        if len(face_encodings) == 0:
+            return [], [], []
+        
+        # One gallery for the whole call, even if a reload swaps it meanwhile
+        gallery = self.gallery
+        failed_shards = []
+        if self.shard_coordinator is not None:
+            # Scatter all encodings of this frame to the gallery shards at once
+            loosest = max(gallery.thresholds.values(), default=self.face_recognition_tolerance)
+            matches, failed_shards = self.shard_coordinator.recognize(
+                face_encodings, max(loosest, self.face_recognition_tolerance))
+            candidates = [(label, distance) for label, distance in matches]
+        elif gallery.index is not None:
+            # Approximate pass over the compressed gallery, exact re-rank of the shortlist
+            indices, distances = gallery.index.search(face_encodings)
+            candidates = [(int(gallery.labels[i]), distance) for i, distance in zip(indices, distances)]
+        elif len(face_encodings) >= self.batch_match_min:
+            indices, distances = self.nearest_known_faces(face_encodings, gallery=gallery)
+            candidates = [(int(gallery.labels[i]) if i >= 0 else UNKNOWN_ID, distance)
+                          for i, distance in zip(indices, distances)]
+        else:
+            # Rows farther than the loosest threshold can never be accepted
+            loosest = max(gallery.thresholds.values(), default=self.face_recognition_tolerance)
+            max_distance = max(loosest, self.face_recognition_tolerance)
+            candidates = []
+            for face_encoding in face_encodings:
+                best_match_index, best_distance = self.nearest_known_face(face_encoding, max_distance, gallery)
+                label = int(gallery.labels[best_match_index]) if best_match_index >= 0 else UNKNOWN_ID
+                candidates.append((label, best_distance))
+        
+        face_labels, face_distances = [], []
+        for label, distance in candidates:
+            accepted = label != UNKNOWN_ID and distance < self.threshold_for(label, gallery)
+            face_labels.append(label if accepted else UNKNOWN_ID)
+            face_distances.append(float(distance))
+        return face_labels, face_distances, failed_shards
+    
+    def nearest_known_face(self, face_encoding, max_distance=None, gallery=None):
+        """Closest gallery row and its distance, or (-1, 1.0) for an empty gallery.
+
+        Large galleries use the cascaded matcher, which returns the same row and
+        distance as a full scan; max_distance only lets it prune rows earlier.
+        """
+        face_recognition = lazy_import('face_recognition')
+        gallery = gallery or self.gallery
+        if len(gallery.encodings) == 0:
+            return -1, 1.0
+        
+        if gallery.cascade_matcher is not None:
+            return gallery.cascade_matcher.nearest(face_encoding, max_distance)
+        
+        face_distances = face_recognition.face_distance(gallery.encodings, face_encoding)
+        best_match_index = int(np.argmin(face_distances))
+        return best_match_index, face_distances[best_match_index]
+    
+    def nearest_known_faces(self, face_encodings, batch_rows=256, gallery=None):
+        """Closest gallery row and distance for many encodings at once.
+
+        Candidates come from one matrix product per batch of queries; the
+        winners' distances are then recomputed like face_distance.
+        """
+        queries = np.asarray(face_encodings, dtype=np.float64).reshape(-1, 128)
+        gallery = (gallery or self.gallery).encodings
+        if len(gallery) == 0:
+            return np.full(len(queries), -1), np.ones(len(queries))
+        
+        gallery_norms = np.einsum('ij,ij->i', gallery, gallery)
+        indices = np.empty(len(queries), dtype=np.int64)
+        for start in range(0, len(queries), batch_rows):
+            distances = pairwise_distances(queries[start:start + batch_rows], gallery, gallery_norms)
+            indices[start:start + batch_rows] = np.argmin(distances, axis=1)
+        return indices, np.linalg.norm(gallery[indices] - queries, axis=1)
+    
+    def draw_results(self, frame, face_locations, face_names, overlay=True, frame_count=None):
         """Draw bounding boxes and names on the frame"""
+        cv2 = lazy_import('cv2')
         for (top, right, bottom, left), name in zip(face_locations, face_names):
             # Choose color based on recognition status
             if name == "Unknown":
@@ -105,46 +460,54 @@ class FaceRecognizer:
             
             # Add timestamp for known faces
             if name != "Unknown":
-                timestamp = datetime.now().strftime("%H:%M:%S")
+                timestamp = self.clock().strftime("%H:%M:%S")
                 cv2.putText(frame, timestamp, (left + 6, top - 10), font, 0.4, color, 1)
         
         # Add system info overlay
-        self.add_info_overlay(frame)
+        if overlay:
+            self.add_info_overlay(frame, self.stream.frame_count if frame_count is None else frame_count)
         
         return frame
     
-    def add_info_overlay(self, frame):
+    def add_info_overlay(self, frame, frame_count=0):
         """Add system information overlay to the frame"""
+        cv2 = lazy_import('cv2')
         height, width = frame.shape[:2]
         
-        # Add background for text
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, 10), (400, 100), (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
+        # Darken only the text panel in place instead of blending a full-frame copy
+        panel = frame[10:min(101, height), 10:min(401, width)]
+        if self.overlay_black is None or self.overlay_black.shape != panel.shape:
+            self.overlay_black = np.zeros_like(panel)
+        cv2.addWeighted(self.overlay_black, 0.7, panel, 0.3, 0, panel)
         
         # Add text information
         font = cv2.FONT_HERSHEY_SIMPLEX
         cv2.putText(frame, "FaceTrack Pro - Live Detection", (20, 35), font, 0.6, (0, 255, 255), 2)
-        cv2.putText(frame, f"Known Faces: {len(self.known_face_names)}", (20, 55), font, 0.4, (255, 255, 255), 1)
-        cv2.putText(frame, f"Frame: {self.frame_count}", (20, 75), font, 0.4, (255, 255, 255), 1)
-        cv2.putText(frame, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), (20, 95), font, 0.4, (255, 255, 255), 1)
+        cv2.putText(frame, f"Known Faces: {len(self.known_face_labels)}", (20, 55), font, 0.4, (255, 255, 255), 1)
+        cv2.putText(frame, f"Frame: {frame_count}", (20, 75), font, 0.4, (255, 255, 255), 1)
+        cv2.putText(frame, self.clock().strftime("%Y-%m-%d %H:%M:%S"), (20, 95), font, 0.4, (255, 255, 255), 1)
     
     def recognize_face(self, face_encoding):
         """Recognize a single face encoding"""
-        if len(self.known_face_encodings) == 0:
+        gallery = self.gallery
+        if len(gallery.encodings) == 0:
             return "Unknown", 1.0
         
-        # Calculate distances to all known faces
-        face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
-        best_match_index = np.argmin(face_distances)
+        if gallery.index is not None:
+            indices, distances = gallery.index.search([face_encoding])
+            best_match_index, best_distance = indices[0], distances[0]
+        else:
+            best_match_index, best_distance = self.nearest_known_face(face_encoding, gallery=gallery)
         
-        if face_distances[best_match_index] < self.face_recognition_tolerance:
-            return self.known_face_names[best_match_index], face_distances[best_match_index]
+        student_id = int(gallery.labels[best_match_index])
+        if best_distance < self.threshold_for(student_id, gallery):
+            return self.student_name(student_id), best_distance
         else:
-            return "Unknown", face_distances[best_match_index]
+            return "Unknown", best_distance
     
     def get_face_encoding(self, image_path):
         """Get face encoding from an image file"""
+        face_recognition = lazy_import('face_recognition')
         try:
             image = face_recognition.load_image_file(image_path)
             face_encodings = face_recognition.face_encodings(image)
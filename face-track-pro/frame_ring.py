@@ -0,0 +1,208 @@
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+import numpy as np
+
+# Header words before the per-slot arrays: write sequence, then the shared counters
+HEADER_COUNTERS = 4
+FRAMES_WRITTEN, FRAMES_DROPPED, PINS_RECLAIMED = range(3)
+
+
+class SharedFrameRing:
+    """Ring of fixed-size frame slots in shared memory.
+
+    Capture threads write frames into slots; recognition processes read them
+    as zero-copy NumPy views by slot index and sequence number. A slot that a
+    reader still holds is never overwritten: the writer uses the oldest free
+    slot instead, and only when every slot is pinned does it drop the new
+    frame or wait, depending on the backpressure policy. A pin older than
+    lease seconds is treated as left behind by a crashed reader and reclaimed.
+    Reclaiming bumps the slot's generation, so a late release() of such a pin
+    no longer counts against the readers that pinned the slot after it.
+
+    Any number of writers and readers may share the ring: sequence numbers
+    are reserved under the lock, and the counters live in the shared header.
+
+    The ring can be passed to multiprocessing.Process as an argument; the
+    child re-attaches to the same shared memory block.
+    """
+
+    def __init__(self, slots=8, shape=(480, 640, 3), dtype=np.uint8, name=None,
+                 backpressure='drop', lease=5.0, context=None, lock=None, condition=None, create=True):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.backpressure = backpressure
+        self.lease = lease
+        self.frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+        # Header: write sequence and counters, then per-slot sequence numbers,
+        # reader counts, pin times and pin generations
+        self.header_bytes = 8 * (HEADER_COUNTERS + 4 * slots)
+        self.owner = create
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, name=name,
+                                                  size=self.header_bytes + slots * self.frame_bytes)
+            # Locks must come from the same start-method context as the readers
+            context = context or multiprocessing
+            self.lock = context.Lock()
+            self.condition = context.Condition(self.lock)
+        else:
+            self.shm = self.attach(name)
+            self.lock = lock
+            self.condition = condition
+
+        self.map_views()
+        if create:
+            self.header[:] = 0
+
+    @staticmethod
+    def attach(name):
+        """Attach to an existing block without taking over its cleanup"""
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Python < 3.13 has no track argument
+            return shared_memory.SharedMemory(name=name)
+
+    def map_views(self):
+        """Create NumPy views over the header and the frame slots"""
+        self.header = np.ndarray((HEADER_COUNTERS + 4 * self.slots,), dtype=np.int64, buffer=self.shm.buf)
+        self.write_seq = self.header[0:1]
+        # frames_written, frames_dropped, pins_reclaimed; shared so every process sees the totals
+        self.counters = self.header[1:HEADER_COUNTERS]
+        slots_start = HEADER_COUNTERS
+        self.slot_seq = self.header[slots_start:slots_start + self.slots]
+        self.slot_readers = self.header[slots_start + self.slots:slots_start + 2 * self.slots]
+        # time.monotonic_ns() of the latest acquire; the monotonic clock is shared by all processes
+        self.slot_pinned_at = self.header[slots_start + 2 * self.slots:slots_start + 3 * self.slots]
+        # Bumped when a slot's pins are reclaimed; pins taken before that are void
+        self.slot_generation = self.header[slots_start + 3 * self.slots:slots_start + 4 * self.slots]
+        self.frames = np.ndarray((self.slots,) + self.shape, dtype=self.dtype,
+                                 buffer=self.shm.buf, offset=self.header_bytes)
+
+    def __getstate__(self):
+        return {
+            'slots': self.slots, 'shape': self.shape, 'dtype': self.dtype.str,
+            'name': self.shm.name, 'backpressure': self.backpressure, 'lease': self.lease,
+            'lock': self.lock, 'condition': self.condition
+        }
+
+    def __setstate__(self, state):
+        self.__init__(state['slots'], state['shape'], state['dtype'], name=state['name'],
+                      backpressure=state['backpressure'], lease=state['lease'], lock=state['lock'],
+                      condition=state['condition'], create=False)
+
+    def free_slot(self):
+        """Unpinned slot holding the oldest frame, or None (caller holds the lock)"""
+        stale_before = time.monotonic_ns() - int(self.lease * 1e9)
+        for slot in np.flatnonzero(self.slot_readers > 0):
+            if self.slot_pinned_at[slot] < stale_before:
+                # The reader holding it stopped without releasing it
+                self.slot_readers[slot] = 0
+                self.slot_generation[slot] += 1
+                self.counters[PINS_RECLAIMED] += 1
+        free = [(int(self.slot_seq[slot]), slot) for slot in np.flatnonzero(self.slot_readers == 0)
+                if self.slot_seq[slot] >= 0]
+        return int(min(free)[1]) if free else None
+
+    def write(self, frame, timeout=0.1):
+        """Copy a frame into the oldest free slot and return its sequence number.
+
+        Returns None when every slot is held by a reader and the frame was
+        dropped (or the wait timed out under the 'block' policy).
+        """
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match ring shape {self.shape}")
+
+        with self.condition:
+            slot = self.free_slot()
+            if slot is None:
+                if self.backpressure != 'block':
+                    self.counters[FRAMES_DROPPED] += 1
+                    return None
+                deadline = time.monotonic() + timeout
+                while slot is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters[FRAMES_DROPPED] += 1
+                        return None
+                    self.condition.wait(remaining)
+                    slot = self.free_slot()
+            # Reserve the sequence number with the slot, so concurrent writers never share one
+            seq = int(self.write_seq[0]) + 1
+            self.write_seq[0] = seq
+            # Mark the slot as being written so readers and other writers skip it
+            self.slot_seq[slot] = -1
+
+        np.copyto(self.frames[slot], frame)
+
+        with self.condition:
+            self.slot_seq[slot] = seq
+            self.counters[FRAMES_WRITTEN] += 1
+            self.condition.notify_all()
+        return seq
+
+    def acquire(self, after_seq=0, timeout=1.0, latest=True):
+        """Wait for a frame newer than after_seq and pin its slot.
+
+        Returns (pin, seq, view) or None on timeout. With latest=True the
+        newest frame is returned and lagging readers skip ahead; otherwise the
+        oldest frame still in the ring is returned. The view is only valid until
+        release(pin) is called, which must happen within the ring's lease.
+        pin is a (slot, generation) pair.
+        """
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while True:
+                candidates = [(int(seq), slot) for slot, seq in enumerate(self.slot_seq) if seq > after_seq]
+                if candidates:
+                    seq, slot = max(candidates) if latest else min(candidates)
+                    self.slot_readers[slot] += 1
+                    self.slot_pinned_at[slot] = time.monotonic_ns()
+                    return (slot, int(self.slot_generation[slot])), seq, self.frames[slot]
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def release(self, pin):
+        """Unpin a slot acquired by a reader; a pin reclaimed in the meantime is ignored"""
+        slot, generation = pin
+        with self.condition:
+            if self.slot_generation[slot] == generation and self.slot_readers[slot] > 0:
+                self.slot_readers[slot] -= 1
+            self.condition.notify_all()
+
+    @property
+    def frames_written(self):
+        return int(self.counters[FRAMES_WRITTEN])
+
+    @property
+    def frames_dropped(self):
+        return int(self.counters[FRAMES_DROPPED])
+
+    @property
+    def pins_reclaimed(self):
+        return int(self.counters[PINS_RECLAIMED])
+
+    def get_stats(self):
+        """Get ring occupancy and backpressure counters"""
+        with self.condition:
+            return {
+                'slots': self.slots,
+                'last_seq': int(self.write_seq[0]),
+                'pinned_slots': int(np.count_nonzero(self.slot_readers)),
+                'frames_written': self.frames_written,
+                'frames_dropped': self.frames_dropped,
+                'pins_reclaimed': self.pins_reclaimed
+            }
+
+    def close(self):
+        """Detach from the shared memory, unlinking it if this ring created it"""
+        # Drop the views first, otherwise the buffer cannot be released
+        self.header = self.write_seq = self.counters = self.frames = None
+        self.slot_seq = self.slot_readers = self.slot_pinned_at = self.slot_generation = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,164 @@
+"""
+Admission control for the streaming pipeline.
+
+Every camera loop reports its backlog (the frames its camera captured that
+the loop never picked up because it was still busy) and how long each
+pipeline stage took. When the backlog of any camera or the per-frame
+latency stays above its budget, the controller steps up one shedding level;
+when both have been comfortably inside budget for a while, it steps back
+down. Levels shed in a fixed order:
+
+    1. no_overlay         the system info panel is not drawn
+    2. reduced_preview    each viewer is sent at most preview_fps frames/second
+    3. reduced_detection  low-priority cameras detect every detection_stride-th
+                          eligible frame; attendance cameras keep their rate
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LEVELS = ('normal', 'no_overlay', 'reduced_preview', 'reduced_detection')
+PRIORITY_ATTENDANCE = 'attendance'
+PRIORITY_LOW = 'low'
+
+
+class OverloadController:
+    """Shedding level driven by camera backlog and stage latency, with hysteresis"""
+
+    def __init__(self, max_backlog=2, latency_budget=0.1, escalate_after=1.0, relax_after=5.0,
+                 relax_ratio=0.6, preview_fps=5.0, detection_stride=4, smoothing=0.2,
+                 evaluate_interval=0.25, history_size=50, on_change=None):
+        self.max_backlog = max_backlog  # Frames skipped per frame read, smoothed, on the worst camera
+        self.latency_budget = latency_budget  # Seconds per frame, all stages together
+        self.escalate_after = escalate_after
+        self.relax_after = relax_after
+        self.relax_ratio = relax_ratio
+        self.preview_fps = preview_fps
+        self.detection_stride = detection_stride
+        self.smoothing = smoothing
+        self.evaluate_interval = evaluate_interval
+        self.on_change = on_change  # Called with each level change decision
+
+        self.level = 0
+        self.camera_backlog = {}  # Camera ID -> exponentially smoothed frames skipped per read
+        self.stage_latency = {}  # Stage -> exponentially smoothed seconds
+        self.frame_latency = 0.0
+        self.overloaded_since = None
+        self.healthy_since = None
+        self.last_evaluated = 0.0
+        self.decisions = deque(maxlen=history_size)
+        self.counters = {'frames': 0, 'overlays_skipped': 0, 'previews_dropped': 0, 'detections_deferred': 0}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def track_frame(self):
+        """Time one frame's pipeline pass"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.counters['frames'] += 1
+                self.frame_latency += self.smoothing * (elapsed - self.frame_latency)
+            self.evaluate()
+
+    def observe_backlog(self, camera_id, skipped):
+        """Record how many captured frames a camera loop missed before its latest read"""
+        with self.lock:
+            previous = self.camera_backlog.get(camera_id, skipped)
+            self.camera_backlog[camera_id] = previous + self.smoothing * (skipped - previous)
+
+    @property
+    def backlog(self):
+        """Smoothed backlog of the camera furthest behind (caller holds the lock)"""
+        return max(self.camera_backlog.values(), default=0.0)
+
+    def observe(self, stage, seconds):
+        """Record how long one pipeline stage took"""
+        with self.lock:
+            previous = self.stage_latency.get(stage, seconds)
+            self.stage_latency[stage] = previous + self.smoothing * (seconds - previous)
+
+    def evaluate(self, now=None):
+        """Step the shedding level up or down; returns the decision if it changed"""
+        now = now or time.time()
+        with self.lock:
+            if now - self.last_evaluated < self.evaluate_interval:
+                return None
+            self.last_evaluated = now
+
+            backlog = self.backlog
+            overloaded = backlog > self.max_backlog or self.frame_latency > self.latency_budget
+            healthy = backlog <= self.max_backlog and self.frame_latency < self.latency_budget * self.relax_ratio
+            self.overloaded_since = (self.overloaded_since or now) if overloaded else None
+            self.healthy_since = (self.healthy_since or now) if healthy else None
+
+            level = self.level
+            if overloaded and now - self.overloaded_since >= self.escalate_after and level < len(LEVELS) - 1:
+                level += 1
+                self.overloaded_since = now  # Give the new level time to take effect
+            elif healthy and now - self.healthy_since >= self.relax_after and level > 0:
+                level -= 1
+                self.healthy_since = now
+            if level == self.level:
+                return None
+
+            decision = {
+                'time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
+                'from': LEVELS[self.level],
+                'to': LEVELS[level],
+                'backlog_frames': round(backlog, 2),
+                'frame_latency_ms': round(self.frame_latency * 1000, 1)
+            }
+            self.level = level
+            self.decisions.append(decision)
+
+        if self.on_change is not None:
+            self.on_change(decision)
+        return decision
+
+    def show_overlay(self):
+        """Whether viewers get the system info panel"""
+        if self.level >= 1:
+            with self.lock:
+                self.counters['overlays_skipped'] += 1
+            return False
+        return True
+
+    def preview_interval(self):
+        """Minimum seconds between preview frames sent to one viewer"""
+        return 1.0 / self.preview_fps if self.level >= 2 else 0.0
+
+    def drop_preview(self):
+        """Count a preview frame that was not encoded or sent"""
+        with self.lock:
+            self.counters['previews_dropped'] += 1
+
+    def detection_stride_for(self, priority):
+        """Multiplier on a camera's detection interval; attendance cameras are never slowed"""
+        if self.level >= 3 and priority != PRIORITY_ATTENDANCE:
+            return self.detection_stride
+        return 1
+
+    def defer_detection(self):
+        """Count a detection a low-priority camera skipped"""
+        with self.lock:
+            self.counters['detections_deferred'] += 1
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'level': LEVELS[self.level],
+                'backlog_frames': round(self.backlog, 2),
+                'camera_backlog_frames': {camera_id: round(frames, 2)
+                                          for camera_id, frames in self.camera_backlog.items()},
+                'frame_latency_ms': round(self.frame_latency * 1000, 1),
+                'stage_latency_ms': {stage: round(seconds * 1000, 1) for stage, seconds in self.stage_latency.items()},
+                'budget': {'max_backlog_frames': self.max_backlog,
+                           'latency_budget_ms': round(self.latency_budget * 1000, 1)},
+                'counters': dict(self.counters),
+                'decisions': list(self.decisions)
+            }
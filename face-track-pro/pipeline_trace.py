@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+FaceTrack Pro - Pipeline Trace Recording and Replay
+A trace captures what a live camera stream saw and did: every input frame
+(PNG by default, so replayed detection sees the same pixels), the detector
+output, identities and attendance commits, and the time spent in each
+pipeline stage. Replay feeds the frames through the current code with the
+recorded wall-clock time injected, so cache ages, overlays and attendance
+dates behave as they did live, then reports the per-stage latency change
+and whether any identity output differs.
+
+Record from the running server:
+    curl -X POST http://localhost:5000/trace/start
+    curl -X POST http://localhost:5000/trace/stop
+
+Replay against the current code and gallery:
+    python pipeline_trace.py face-track-pro/traces/trace-20240101-090000.zip
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+import numpy as np
+from utils.startup import lazy_import
+
+TRACE_VERSION = 3
+
+
+class TraceRecorder:
+    """Writes one trace archive from the recognition loop of one camera"""
+
+    def __init__(self, path, recognizer, image_format='.png', max_frames=None, detector=None, camera_detector=None):
+        self.path = path
+        self.image_format = image_format
+        self.max_frames = max_frames
+        self.records = []
+        self.started = False  # Set by begin() at the first recorded frame
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # Exclusive creation: a trace never overwrites an existing file
+        self.archive = zipfile.ZipFile(path, 'x', compression=zipfile.ZIP_STORED)
+        self.header = {
+            'version': TRACE_VERSION,
+            'started': datetime.now().isoformat(),
+            'image_format': image_format,
+            'process_every_n_frames': recognizer.process_every_n_frames,
+            'model_path': recognizer.model_path,
+            'gallery_rows': len(recognizer.known_face_labels),
+            # Settings replay rebuilds the pipeline from: create_detector() options
+            # of the recognizer and of the camera (None: the recognizer's), the
+            # recognition cache and the gallery shards
+            'detector': detector,
+            'camera_detector': camera_detector,
+            'recognition_cache': recognition_cache_settings(recognizer.recognition_cache),
+            'shards': shard_settings(recognizer.shard_coordinator),
+            # State the first frame met; filled in by begin()
+            'voter': None,
+            'unknown_faces': None
+        }
+
+    def begin(self, voter, recognizer):
+        """Capture the state the first recorded frame starts from.
+
+        Called by the camera loop before that frame, so no frame can slip in
+        between the snapshot and the recording. Replay restores the voter's
+        open tracks and commits and the unknown-face clusters, and the
+        recognition cache starts cold on both sides.
+        """
+        self.header['voter'] = voter.snapshot()
+        if recognizer.unknown_faces is not None:
+            self.header['unknown_faces'] = recognizer.unknown_faces.snapshot()
+        if recognizer.recognition_cache is not None:
+            recognizer.recognition_cache.clear()
+        self.started = True
+
+    def is_full(self):
+        return self.max_frames is not None and len(self.records) >= self.max_frames
+
+    def encode_input(self, frame):
+        """Compress a frame before the pipeline draws on it"""
+        cv2 = lazy_import('cv2')
+        params = [cv2.IMWRITE_PNG_COMPRESSION, 1] if self.image_format == '.png' else []
+        ret, data = cv2.imencode(self.image_format, frame, params)
+        return data.tobytes() if ret else None
+
+    def record(self, image, when, stream, committed, stage_times, overlay=True, draw=True, detection_stride=1):
+        """Append one frame with the StreamState it produced"""
+        if image is None:
+            return
+        record = {
+            'time': when.isoformat(),
+            'frame_count': stream.frame_count,
+            'detection_stride': detection_stride,
+            'overlay': overlay,
+            'draw': draw,
+            'processed': stream.frame_processed,
+            'stage_ms': {stage: seconds * 1000 for stage, seconds in stage_times.items()},
+            'committed': [int(student_id) for student_id in committed]
+        }
+        if stream.frame_processed:
+            record['locations'] = [list(map(int, location)) for location in stream.last_face_locations]
+            record['labels'] = [int(label) for label in stream.last_face_labels]
+
+        with self.lock:
+            if self.archive is None or self.is_full():
+                return
+            record['seq'] = len(self.records)
+            self.archive.writestr(f"frames/{record['seq']:06d}{self.image_format}", image)
+            self.records.append(record)
+
+    def close(self):
+        """Write the frame index and return a short summary"""
+        with self.lock:
+            if self.archive is None:
+                return None
+            self.header['stopped'] = datetime.now().isoformat()
+            self.archive.writestr('header.json', json.dumps(self.header, indent=2))
+            self.archive.writestr('frames.jsonl', ''.join(json.dumps(r) + '\n' for r in self.records))
+            self.archive.close()
+            self.archive = None
+            return {'path': self.path, 'frames': len(self.records),
+                    'processed_frames': sum(1 for r in self.records if r['processed'])}
+
+
+def recognition_cache_settings(cache):
+    """RecognitionCache arguments that reproduce cache"""
+    if cache is None:
+        return None
+    return {'ttl': cache.ttl, 'max_entries': cache.max_entries,
+            'max_hamming': cache.max_hamming, 'iou_threshold': cache.iou_threshold}
+
+
+def shard_settings(coordinator):
+    """ShardCoordinator arguments that reproduce coordinator, or None without sharding"""
+    if coordinator is None:
+        return None
+    return {'shard_urls': coordinator.shard_urls, 'timeout': coordinator.timeout, 'k': coordinator.k,
+            'max_in_flight': coordinator.max_in_flight}
+
+
+def build_recognizer(header, model_path=None):
+    """FaceRecognizer with the detector, recognition cache and shards a trace was recorded with"""
+    from detectors import create_detector
+    from face_recognition_module import FaceRecognizer
+    from recognition_cache import RecognitionCache
+    from sharding import ShardCoordinator
+
+    # Traces from before settings were recorded get the defaults
+    detector = create_detector(**header['detector']) if header.get('detector') else None
+    cache = RecognitionCache(**header['recognition_cache']) if header.get('recognition_cache') else None
+    recognizer = FaceRecognizer(detector=detector, recognition_cache=cache)
+    if 'recognition_cache' in header and header['recognition_cache'] is None:
+        recognizer.recognition_cache = None
+    if header.get('shards'):
+        recognizer.shard_coordinator = ShardCoordinator(**header['shards'])
+    recognizer.model_path = model_path or header['model_path']
+    recognizer.warm_up()
+    return recognizer
+
+
+class TraceClock:
+    """Clock returning the recorded time of the frame being replayed"""
+    def __init__(self):
+        self.now = datetime.now()
+
+    def set(self, when):
+        self.now = when
+
+    def __call__(self):
+        return self.now
+
+
+def load_trace(path):
+    """Return (header, frame records, open archive)"""
+    archive = zipfile.ZipFile(path)
+    header = json.loads(archive.read('header.json'))
+    records = [json.loads(line) for line in archive.read('frames.jsonl').decode().splitlines() if line]
+    return header, records, archive
+
+
+def stage_summary(samples):
+    """Mean and p95 in milliseconds per stage"""
+    return {stage: {'mean_ms': float(np.mean(values)), 'p95_ms': float(np.percentile(values, 95)), 'count': len(values)}
+            for stage, values in samples.items() if values}
+
+
+def replay_trace(path, recognizer=None, model_path=None):
+    """Run a recorded trace through the current pipeline and compare the outputs.
+
+    Without a recognizer, one is built from the trace's settings, matching
+    against model_path instead of the recorded gallery if given.
+    """
+    from detectors import create_detector
+    from face_recognition_module import StreamState
+    from camera_stream import PreviewEncoder
+    from tracking import IdentityVoter
+    from unknown_faces import UnknownFaceCache
+
+    cv2 = lazy_import('cv2')
+    header, records, archive = load_trace(path)
+
+    crops_dir = tempfile.mkdtemp(prefix='facetrack-replay-')
+    if recognizer is None:
+        recognizer = build_recognizer(header, model_path)
+    # Keep the live server's unknown-face crops out of the replay
+    recognizer.unknown_faces = UnknownFaceCache(crops_dir=crops_dir)
+    if header.get('unknown_faces'):
+        recognizer.unknown_faces.restore(header['unknown_faces'])
+    if recognizer.recognition_cache is not None:
+        recognizer.recognition_cache.clear()
+    recognizer.process_every_n_frames = header['process_every_n_frames']
+    clock = TraceClock()
+    recognizer.clock = clock
+    voter = IdentityVoter()
+    if header.get('voter'):
+        voter.restore(header['voter'])
+    else:
+        # Traces from before voter snapshots only list the day's commits
+        voter.current_date = datetime.fromisoformat(header['started']).date()
+        voter.committed_today = set(header.get('committed_today', []))
+
+    # The camera's own detector, if it had one, replaces the recognizer's as it did live
+    camera_detector = header.get('camera_detector')
+    stream = StreamState(detector=create_detector(**camera_detector) if camera_detector else None)
+    encoder = PreviewEncoder()
+    recorded_stages, replayed_stages = {}, {}
+    mismatches = {'detections': 0, 'identities': 0, 'commits': 0}
+    examples = []
+    try:
+        for record in records:
+            image = archive.read(f"frames/{record['seq']:06d}{header['image_format']}")
+            frame = cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+            when = datetime.fromisoformat(record['time'])
+            clock.set(when)
+
+            # Same detection cadence as the live session
+            stream.frame_count = record['frame_count'] - 1
+            processed_frame, _ = recognizer.process_frame(frame, overlay=record['overlay'], draw=record['draw'],
+                                                          detection_stride=record['detection_stride'], stream=stream)
+            stage_times = dict(stream.last_stage_times)
+            committed = []
+            if stream.frame_processed:
+                committed = voter.update(stream.last_face_locations, stream.last_face_labels,
+                                         today=when.date(), confident=stream.last_face_confident,
+                                         fresh=stream.fresh_faces())
+            if 'jpeg' in record['stage_ms']:
+                encoding = time.perf_counter()
+                encoder.encode(processed_frame)
+                stage_times['jpeg'] = time.perf_counter() - encoding
+
+            for stage, ms in record['stage_ms'].items():
+                recorded_stages.setdefault(stage, []).append(ms)
+            for stage, seconds in stage_times.items():
+                replayed_stages.setdefault(stage, []).append(seconds * 1000)
+
+            if record['processed']:
+                locations = [list(map(int, location)) for location in stream.last_face_locations]
+                labels = [int(label) for label in stream.last_face_labels]
+                if locations != record['locations']:
+                    mismatches['detections'] += 1
+                if labels != record['labels']:
+                    mismatches['identities'] += 1
+                    if len(examples) < 10:
+                        examples.append({'seq': record['seq'], 'recorded': record['labels'], 'replayed': labels})
+            if [int(student_id) for student_id in committed] != record['committed']:
+                mismatches['commits'] += 1
+    finally:
+        archive.close()
+        shutil.rmtree(crops_dir, ignore_errors=True)
+
+    recorded = stage_summary(recorded_stages)
+    replayed = stage_summary(replayed_stages)
+    latency_diff = {}
+    for stage in sorted(set(recorded) | set(replayed)):
+        before = recorded.get(stage, {}).get('mean_ms')
+        after = replayed.get(stage, {}).get('mean_ms')
+        latency_diff[stage] = {
+            'recorded': recorded.get(stage),
+            'replayed': replayed.get(stage),
+            'diff_ms': after - before if before is not None and after is not None else None,
+            'diff_pct': (after - before) / before * 100 if before and after is not None else None
+        }
+
+    return {
+        'trace': path,
+        'frames': len(records),
+        'processed_frames': sum(1 for r in records if r['processed']),
+        'gallery_rows': {'recorded': header['gallery_rows'], 'replayed': len(recognizer.known_face_labels)},
+        'latency': latency_diff,
+        'mismatches': mismatches,
+        'examples': examples,
+        'identities_unchanged': mismatches['identities'] == 0 and mismatches['commits'] == 0
+    }
+
+
+def print_report(report):
+    """Print a replay report"""
+    print(f"Trace: {report['trace']}")
+    print(f"Frames: {report['frames']} ({report['processed_frames']} with detection)")
+    gallery = report['gallery_rows']
+    if gallery['recorded'] != gallery['replayed']:
+        print(f"Note: gallery has {gallery['replayed']} rows, trace was recorded with {gallery['recorded']}")
+
+    print(f"\n{'Stage':<10} {'Recorded ms':>12} {'Replayed ms':>12} {'Diff':>10}")
+    for stage, diff in report['latency'].items():
+        before = f"{diff['recorded']['mean_ms']:.2f}" if diff['recorded'] else '-'
+        after = f"{diff['replayed']['mean_ms']:.2f}" if diff['replayed'] else '-'
+        change = f"{diff['diff_pct']:+.1f}%" if diff['diff_pct'] is not None else '-'
+        print(f"{stage:<10} {before:>12} {after:>12} {change:>10}")
+
+    mismatches = report['mismatches']
+    print(f"\nDetection mismatches: {mismatches['detections']}")
+    print(f"Identity mismatches: {mismatches['identities']}")
+    print(f"Attendance commit mismatches: {mismatches['commits']}")
+    for example in report['examples']:
+        print(f"  frame {example['seq']}: recorded {example['recorded']}, replayed {example['replayed']}")
+    print("PASS: identity output unchanged" if report['identities_unchanged'] else "FAIL: identity output changed")
+
+
+def main():
+    """Main function for command-line usage"""
+    parser = argparse.ArgumentParser(description='FaceTrack Pro Pipeline Trace Replay')
+    parser.add_argument('trace', help='Trace archive recorded from /trace/start')
+    parser.add_argument('--model', help='Gallery to replay against (default: the one used when recording)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    report = replay_trace(args.trace, model_path=args.model)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(0 if report['identities_unchanged'] else 1)
+
+
+if __name__ == '__main__':
+    main()
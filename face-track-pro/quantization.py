@@ -0,0 +1,343 @@
+"""
+Compressed gallery representations for a cheaper first matching pass.
+
+A quantizer stores the 128-d encodings in fewer bytes and computes
+approximate distances from them; QuantizedGallery takes the closest
+candidates from that pass and re-ranks them with exact float64 distances,
+so the final match is computed at full precision.
+
+    float16  - half precision, 4x smaller than float64
+    int8     - per-dimension scalar quantization, 8x smaller
+    pq       - product quantization with asymmetric distance tables,
+               m bytes per encoding (64x smaller with m=16)
+
+Compare them on a trained gallery:
+    python quantization.py --methods float16 int8 pq
+"""
+
+import time
+import numpy as np
+
+
+class GalleryQuantizer:
+    """Base class: fit on the gallery, then score queries against the codes"""
+    name = 'base'
+    chunk_rows = 8192  # Codes are widened for the dot product a chunk at a time
+
+    def fit(self, encodings):
+        raise NotImplementedError
+
+    def approximate_distances(self, queries):
+        """Approximate squared L2 distances, shape (queries, gallery)"""
+        raise NotImplementedError
+
+    @property
+    def nbytes(self):
+        """Memory used by the compressed representation"""
+        raise NotImplementedError
+
+    def state(self):
+        """Picklable arrays that rebuild this quantizer without refitting"""
+        raise NotImplementedError
+
+    def load_state(self, state):
+        raise NotImplementedError
+
+
+class Float16Quantizer(GalleryQuantizer):
+    """Half-precision copy of the gallery"""
+    name = 'float16'
+
+    def fit(self, encodings):
+        self.codes = np.asarray(encodings, dtype=np.float16)
+        self.norms = np.einsum('ij,ij->i', self.codes.astype(np.float32), self.codes.astype(np.float32))
+        return self
+
+    def approximate_distances(self, queries):
+        queries = np.asarray(queries, dtype=np.float32)
+        dots = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), self.chunk_rows):
+            chunk = self.codes[start:start + self.chunk_rows]
+            dots[:, start:start + len(chunk)] = queries @ chunk.T.astype(np.float32)
+        return self.norms[None, :] - 2 * dots + np.einsum('ij,ij->i', queries, queries)[:, None]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.norms.nbytes
+
+    def state(self):
+        return {'codes': self.codes, 'norms': self.norms}
+
+    def load_state(self, state):
+        self.codes, self.norms = state['codes'], state['norms']
+        return self
+
+
+class Int8Quantizer(GalleryQuantizer):
+    """Symmetric per-dimension int8 scalar quantization"""
+    name = 'int8'
+
+    def fit(self, encodings):
+        encodings = np.asarray(encodings, dtype=np.float64)
+        self.scale = (np.abs(encodings).max(axis=0) / 127.0).astype(np.float32)
+        self.scale[self.scale == 0] = 1.0
+        self.codes = np.clip(np.round(encodings / self.scale), -127, 127).astype(np.int8)
+        decoded = self.codes * self.scale
+        self.norms = np.einsum('ij,ij->i', decoded, decoded).astype(np.float32)
+        return self
+
+    def approximate_distances(self, queries):
+        queries = np.asarray(queries, dtype=np.float32)
+        # q . (codes * scale) == (q * scale) . codes, so the codes are never decoded
+        scaled = queries * self.scale
+        dots = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        for start in range(0, len(self.codes), self.chunk_rows):
+            chunk = self.codes[start:start + self.chunk_rows]
+            dots[:, start:start + len(chunk)] = scaled @ chunk.T.astype(np.float32)
+        return self.norms[None, :] - 2 * dots + np.einsum('ij,ij->i', queries, queries)[:, None]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.norms.nbytes + self.scale.nbytes
+
+    def state(self):
+        return {'codes': self.codes, 'norms': self.norms, 'scale': self.scale}
+
+    def load_state(self, state):
+        self.codes, self.norms, self.scale = state['codes'], state['norms'], state['scale']
+        return self
+
+
+class ProductQuantizer(GalleryQuantizer):
+    """Product quantization scored with asymmetric distance tables.
+
+    The 128 dimensions are split into m sub-vectors, each replaced by the
+    index of its nearest k-means centroid (one byte). A query is compared
+    to every centroid once, giving an (m, k) table; the distance to a
+    gallery row is then m table lookups.
+    """
+    name = 'pq'
+
+    def __init__(self, m=16, k=256, iterations=20, seed=0):
+        self.m = m
+        self.k = k
+        self.iterations = iterations
+        self.seed = seed
+
+    def fit(self, encodings):
+        encodings = np.asarray(encodings, dtype=np.float32)
+        dim = encodings.shape[1]
+        if dim % self.m:
+            raise ValueError(f"Encoding size {dim} is not divisible by m={self.m}")
+        self.sub_dim = dim // self.m
+        k = max(1, min(self.k, len(encodings)))
+        rng = np.random.default_rng(self.seed)
+
+        self.centroids = np.zeros((self.m, k, self.sub_dim), dtype=np.float32)
+        # Stored subspace-major so each table lookup reads one contiguous row
+        self.codes = np.zeros((self.m, len(encodings)), dtype=np.uint8)
+        for j in range(self.m):
+            sub = encodings[:, j * self.sub_dim:(j + 1) * self.sub_dim]
+            centroids = sub[rng.choice(len(sub), k, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self.nearest(sub, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sub)
+                counts = np.bincount(assignment, minlength=k)
+                filled = counts > 0  # Empty clusters keep their previous centroid
+                centroids[filled] = sums[filled] / counts[filled, None]
+            self.centroids[j] = centroids
+            self.codes[j] = self.nearest(sub, centroids)
+        return self
+
+    @staticmethod
+    def nearest(vectors, centroids):
+        distances = (np.einsum('ij,ij->i', vectors, vectors)[:, None] - 2 * vectors @ centroids.T
+                     + np.einsum('ij,ij->i', centroids, centroids)[None, :])
+        return np.argmin(distances, axis=1)
+
+    def approximate_distances(self, queries):
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(queries), self.m, self.sub_dim)
+        # tables[q, j, c] = |query sub-vector j - centroid c of subspace j|^2
+        tables = ((queries[:, :, None, :] - self.centroids[None, :, :, :]) ** 2).sum(axis=3)
+        distances = np.zeros((len(queries), self.codes.shape[1]), dtype=np.float32)
+        for q, table in enumerate(tables):
+            for j in range(self.m):
+                distances[q] += table[j].take(self.codes[j])
+        return distances
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.centroids.nbytes
+
+    def state(self):
+        return {'codes': self.codes, 'centroids': self.centroids, 'm': self.m}
+
+    def load_state(self, state):
+        self.codes, self.centroids, self.m = state['codes'], state['centroids'], state['m']
+        self.sub_dim = self.centroids.shape[2]
+        self.k = self.centroids.shape[1]
+        return self
+
+
+QUANTIZERS = {
+    'float16': Float16Quantizer,
+    'int8': Int8Quantizer,
+    'pq': ProductQuantizer
+}
+
+
+def create_quantizer(method='int8', **options):
+    """Create a quantizer by name with method-specific options"""
+    if method not in QUANTIZERS:
+        raise ValueError(f"Unknown quantization '{method}'. Choose from: {', '.join(QUANTIZERS)}")
+    return QUANTIZERS[method](**options)
+
+
+class QuantizedGallery:
+    """Two-pass nearest neighbour search over a quantized gallery.
+
+    The first pass scores every row from the compressed codes; the rerank
+    closest candidates are then scored with exact distances against the
+    original encodings, which are only touched for those rows.
+    """
+
+    def __init__(self, encodings, quantizer, rerank=16):
+        self.encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+        self.quantizer = quantizer
+        self.rerank = rerank
+        self.stats = {'queries': 0, 'reranked': 0}
+
+    @classmethod
+    def from_state(cls, encodings, state, rerank=16):
+        """Rebuild from the 'quantization' entry of a trained gallery"""
+        quantizer = QUANTIZERS[state['method']]().load_state(state)
+        return cls(encodings, quantizer, state.get('rerank', rerank))
+
+    def state(self):
+        return dict(self.quantizer.state(), method=self.quantizer.name, rerank=self.rerank)
+
+    def search(self, queries):
+        """Return (index, exact distance) of the nearest gallery row per query"""
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 128)
+        if len(queries) == 0 or len(self.encodings) == 0:
+            return np.zeros(len(queries), dtype=np.int64), np.ones(len(queries))
+
+        approximate = self.quantizer.approximate_distances(queries)
+        top = min(self.rerank, approximate.shape[1])
+        candidates = np.argpartition(approximate, top - 1, axis=1)[:, :top]
+
+        # Exact distances for the shortlisted rows only
+        exact = np.linalg.norm(self.encodings[candidates] - queries[:, None, :], axis=2)
+        best = np.argmin(exact, axis=1)
+        rows = np.arange(len(queries))
+        self.stats['queries'] += len(queries)
+        self.stats['reranked'] += candidates.size
+        return candidates[rows, best], exact[rows, best]
+
+    def get_stats(self):
+        """Memory of the scanned representation against the float64 gallery"""
+        full_bytes = len(self.encodings) * 128 * 8
+        return {
+            'method': self.quantizer.name,
+            'rows': len(self.encodings),
+            'scan_bytes': int(self.quantizer.nbytes),
+            'float64_bytes': full_bytes,
+            'compression': round(full_bytes / self.quantizer.nbytes, 1) if self.quantizer.nbytes else 0.0,
+            'rerank': self.rerank,
+            'queries': self.stats['queries']
+        }
+
+
+def evaluate_quantization(encodings, labels, gallery, max_queries=2000, seed=0):
+    """Leave-one-out nearest-neighbour accuracy of exact vs quantized search.
+
+    Each sampled encoding is matched against the rest of the gallery; top-1
+    accuracy counts matches with the same label. Also reports how often the
+    quantized search returns the same row as the exact one.
+    """
+    encodings = np.asarray(encodings, dtype=np.float64).reshape(-1, 128)
+    labels = np.asarray(labels)
+    if len(encodings) < 2:
+        return None
+
+    # Only students with another encoding can be matched correctly
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    eligible = np.flatnonzero(counts[inverse] > 1)
+    if len(eligible) == 0:
+        return None
+
+    norms = np.einsum('ij,ij->i', encodings, encodings)
+    rng = np.random.default_rng(seed)
+    sample = rng.choice(eligible, min(max_queries, len(eligible)), replace=False)
+
+    exact_hits = approx_hits = agree = 0
+    exact_seconds = approx_seconds = 0.0
+    for start in range(0, len(sample), 256):
+        batch = sample[start:start + 256]
+        queries = encodings[batch]
+
+        t0 = time.perf_counter()
+        exact = norms[None, :] - 2 * queries @ encodings.T  # Squared distance up to a per-query constant
+        exact[np.arange(len(batch)), batch] = np.inf
+        exact_best = np.argmin(exact, axis=1)
+        exact_seconds += time.perf_counter() - t0
+
+        # Exclude the query itself from the quantized pass as well
+        t0 = time.perf_counter()
+        approximate = gallery.quantizer.approximate_distances(queries)
+        approximate[np.arange(len(batch)), batch] = np.inf
+        top = min(gallery.rerank + 1, approximate.shape[1])
+        candidates = np.argpartition(approximate, top - 1, axis=1)[:, :top]
+        reranked = np.linalg.norm(encodings[candidates] - queries[:, None, :], axis=2)
+        reranked[candidates == batch[:, None]] = np.inf
+        approx_best = candidates[np.arange(len(batch)), np.argmin(reranked, axis=1)]
+        approx_seconds += time.perf_counter() - t0
+
+        exact_hits += int(np.sum(labels[exact_best] == labels[batch]))
+        approx_hits += int(np.sum(labels[approx_best] == labels[batch]))
+        agree += int(np.sum(exact_best == approx_best))
+
+    n = len(sample)
+    return {
+        'queries': n,
+        'exact_accuracy': exact_hits / n,
+        'quantized_accuracy': approx_hits / n,
+        'accuracy_change': (approx_hits - exact_hits) / n,
+        'same_match_rate': agree / n,
+        'exact_ms_per_query': exact_seconds * 1000 / n,
+        'quantized_ms_per_query': approx_seconds * 1000 / n
+    }
+
+
+def main():
+    """Main function for command-line usage"""
+    import argparse
+    import pickle
+    from utils.student_registry import gallery_labels
+
+    parser = argparse.ArgumentParser(description='FaceTrack Pro Gallery Quantization Benchmark')
+    parser.add_argument('--model', default='face-track-pro/local.pkl', help='Trained gallery')
+    parser.add_argument('--methods', nargs='+', default=list(QUANTIZERS), help='Quantizers to compare')
+    parser.add_argument('--rerank', type=int, default=16, help='Candidates re-ranked exactly')
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        data = pickle.load(f)
+    labels, _ = gallery_labels(data)
+
+    print(f"{'method':<10}{'MB':>10}{'ratio':>8}{'exact acc':>11}{'quant acc':>11}{'same':>8}{'ms/query':>10}")
+    for method in args.methods:
+        gallery = QuantizedGallery(data['encodings'], create_quantizer(method).fit(data['encodings']), args.rerank)
+        stats = gallery.get_stats()
+        report = evaluate_quantization(data['encodings'], labels, gallery)
+        if report is None:
+            print("Need a student with at least two encodings to evaluate")
+            return
+        print(f"{method:<10}{stats['scan_bytes'] / 1e6:>10.2f}{stats['compression']:>8.1f}"
+              f"{report['exact_accuracy']:>11.3f}{report['quantized_accuracy']:>11.3f}"
+              f"{report['same_match_rate']:>8.3f}{report['quantized_ms_per_query']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
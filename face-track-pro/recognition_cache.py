@@ -0,0 +1,138 @@
+"""
+Short-lived cache of recognition results for faces that have not changed.
+
+Detections are associated with cached tracks by box overlap. A cached result
+is reused when its track was recognized less than ttl seconds ago and a
+difference hash of the face crop is within max_hamming bits of the hash taken
+at that recognition, which skips both face_encodings and the gallery match.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from utils.startup import lazy_import
+from detectors import iou
+
+
+def difference_hash(rgb_crop, hash_size=8):
+    """64-bit dHash: sign of horizontal gradients on a tiny grayscale thumbnail"""
+    cv2 = lazy_import('cv2')
+    thumbnail = cv2.resize(rgb_crop, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    gray = thumbnail.astype(np.int16).sum(axis=2)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+def face_hash(rgb_frame, location):
+    """dHash of a detected face, or None if the box lies outside the frame"""
+    top, right, bottom, left = location
+    height, width = rgb_frame.shape[:2]
+    crop = rgb_frame[max(0, top):min(height, bottom), max(0, left):min(width, right)]
+    if crop.size == 0:
+        return None
+    return difference_hash(crop)
+
+
+class CachedRecognition:
+    """Result of the last full recognition on one track"""
+    def __init__(self, track_id, location, face_hash, label, distance, confident, now, camera_id=None):
+        self.track_id = track_id
+        self.camera_id = camera_id
+        self.location = location
+        self.face_hash = face_hash
+        self.label = label
+        self.distance = distance
+        self.confident = confident
+        self.recognized_at = now
+        self.last_seen = now
+
+
+class RecognitionCache:
+    """Per-track recognition results validated by a perceptual hash.
+
+    Entries expire ttl seconds after their full recognition, so identities are
+    re-checked regularly even for a face that never moves. At most
+    max_entries tracks are kept, least recently seen first out. Tracks belong
+    to the camera that saw them: a box is only matched against tracks of the
+    same camera_id, since coordinates of two cameras are unrelated.
+    """
+
+    def __init__(self, ttl=2.0, max_entries=256, max_hamming=6, iou_threshold=0.5):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_hamming = max_hamming
+        self.iou_threshold = iou_threshold
+
+        self.entries = OrderedDict()
+        self.next_track_id = 1
+        self.stats = {'lookups': 0, 'hits': 0, 'new_tracks': 0, 'expired': 0, 'changed': 0}
+        self.lock = threading.Lock()
+
+    def lookup(self, face_locations, face_hashes, now=None, camera_id=None):
+        """Return a (track_id, cached entry or None) pair per detection of one frame"""
+        now = now or time.time()
+        results = []
+        with self.lock:
+            matched = self.associate(face_locations, camera_id)
+            for location, face_hash, entry in zip(face_locations, face_hashes, matched):
+                self.stats['lookups'] += 1
+                if entry is None:
+                    self.stats['new_tracks'] += 1
+                    results.append((self.next_track_id, None))
+                    self.next_track_id += 1
+                    continue
+
+                entry.location = location
+                entry.last_seen = now
+                self.entries.move_to_end(entry.track_id)
+                if now - entry.recognized_at > self.ttl:
+                    self.stats['expired'] += 1
+                    results.append((entry.track_id, None))
+                elif face_hash is None or bin(entry.face_hash ^ face_hash).count('1') > self.max_hamming:
+                    self.stats['changed'] += 1
+                    results.append((entry.track_id, None))
+                else:
+                    self.stats['hits'] += 1
+                    results.append((entry.track_id, entry))
+        return results
+
+    def associate(self, face_locations, camera_id=None):
+        """Greedily match each detection to the cached track of the camera it overlaps most"""
+        matched = [None] * len(face_locations)
+        candidates = []
+        entries = [entry for entry in self.entries.values() if entry.camera_id == camera_id]
+        for i, location in enumerate(face_locations):
+            for entry in entries:
+                overlap = iou(location, entry.location)
+                if overlap >= self.iou_threshold:
+                    candidates.append((overlap, i, entry))
+
+        used = set()
+        for overlap, i, entry in sorted(candidates, key=lambda c: c[0], reverse=True):
+            if matched[i] is None and entry.track_id not in used:
+                matched[i] = entry
+                used.add(entry.track_id)
+        return matched
+
+    def store(self, track_id, location, face_hash, label, distance, confident, now=None, camera_id=None):
+        """Record a full recognition for a track"""
+        if face_hash is None:
+            return
+        now = now or time.time()
+        with self.lock:
+            self.entries[track_id] = CachedRecognition(track_id, location, face_hash, label, distance, confident,
+                                                       now, camera_id)
+            self.entries.move_to_end(track_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats, entries=len(self.entries))
+        stats['hit_rate'] = stats['hits'] / stats['lookups'] if stats['lookups'] else 0.0
+        return stats
@@ -0,0 +1,203 @@
+import hashlib
+import io
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from utils.startup import lazy_import
+from utils.encoding_cache import EncodingCache
+from utils.student_registry import StudentRegistry
+from utils.dataset_index import DatasetIndex
+
+_folder_locks = {}
+_folder_locks_lock = threading.Lock()
+
+
+def folder_lock(path):
+    """Process-wide lock serializing the ingests that write into one dataset folder"""
+    path = os.path.abspath(path)
+    with _folder_locks_lock:
+        return _folder_locks.setdefault(path, threading.Lock())
+
+
+class RegistrationIngest:
+    """Registration pipeline for uploaded student photos.
+
+    Each upload is decoded once, downscaled to a detector-friendly size and
+    re-encoded as a real JPEG. Images with no face, a blurry face or a
+    duplicate of another upload are rejected with a reason. An image whose
+    stored JPEG is already in the student's folder is accepted without being
+    written again, so a re-run of an interrupted ingest adds no copies. Accepted images
+    are stored with an aligned face chip and their encoding, and the encoding
+    is seeded into the EncodingCache so the following training run skips
+    detection entirely.
+    """
+
+    def __init__(self, dataset_path='face-track-pro/dataset', max_image_side=1024,
+                 chip_size=150, blur_threshold=60.0, duplicate_distance=0.06, max_workers=4, detector=None,
+                 registry=None, dataset_index=None):
+        self.dataset_path = dataset_path
+        self.max_image_side = max_image_side
+        self.chip_size = chip_size
+        self.blur_threshold = blur_threshold
+        self.duplicate_distance = duplicate_distance
+        self.max_workers = max_workers
+        self.encoding_cache = EncodingCache.shared(detector=detector)
+        self.registry = registry or StudentRegistry.shared()
+        self.dataset_index = dataset_index or DatasetIndex(dataset_path)
+
+    def ingest(self, person_name, uploads, usn=None):
+        """Process (filename, bytes) uploads for a student and return per-file results"""
+        person_folder = self.registry.register(person_name, usn)['folder']
+        person_path = os.path.join(self.dataset_path, person_folder)
+        chips_path = os.path.join(person_path, 'chips')
+        os.makedirs(chips_path, exist_ok=True)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            prepared = list(executor.map(lambda upload: self.prepare_upload(*upload), uploads))
+
+        # Two ingests for one folder (e.g. namesakes in a bulk import) must not
+        # interleave, or they would pick the same file names
+        with folder_lock(person_path):
+            # Duplicate checks and saving run in upload order so results are deterministic
+            results = []
+            seen_hashes = set()
+            accepted_encodings = []
+            indexed = {}
+            image_number = 0
+            # Pick up files an interrupted ingest saved but never indexed
+            self.dataset_index.sync_folder(person_folder)
+            stored = self.dataset_index.folder_hashes(person_folder)
+            for item in prepared:
+                result = {'filename': item['filename'], 'status': 'rejected', 'reason': item.get('reason')}
+                if item.get('reason') is None:
+                    if item['content_hash'] in seen_hashes:
+                        result['reason'] = 'duplicate image'
+                    elif accepted_encodings and np.min(np.linalg.norm(
+                            np.asarray(accepted_encodings) - item['encoding'], axis=1)) < self.duplicate_distance:
+                        result['reason'] = 'near-duplicate of another uploaded image'
+                    elif item['jpeg_sha1'] in stored:
+                        result['path'] = os.path.join(person_path, stored[item['jpeg_sha1']])
+                        result['status'] = 'accepted'
+                        result['existing'] = True
+                        accepted_encodings.append(item['encoding'])
+                    else:
+                        image_number = self.free_image_number(person_path, person_folder, image_number + 1)
+                        base_name = f"{person_folder}_{image_number}"
+                        result['path'] = self.save(item, person_path, chips_path, base_name)
+                        result['status'] = 'accepted'
+                        accepted_encodings.append(item['encoding'])
+                        indexed[os.path.basename(result['path'])] = {
+                            'status': 'encoded', 'faces': 1, 'sha1': item['jpeg_sha1']
+                        }
+                    seen_hashes.add(item['content_hash'])
+                results.append(result)
+
+            if indexed:
+                self.dataset_index.sync_folder(person_folder, indexed)
+                self.dataset_index.save()
+        return results
+
+    @staticmethod
+    def free_image_number(person_path, person_folder, number):
+        """First image number from number on whose file does not exist yet"""
+        while os.path.exists(os.path.join(person_path, f"{person_folder}_{number}.jpg")):
+            number += 1
+        return number
+
+    def prepare_upload(self, filename, data):
+        """prepare() for one upload; an unexpected error rejects only that upload"""
+        try:
+            return self.prepare(filename, data)
+        except Exception as e:
+            return {'filename': filename, 'reason': f'could not process image ({e})'}
+
+    def prepare(self, filename, data):
+        """Decode, downscale, quality-check and encode a single upload"""
+        cv2 = lazy_import('cv2')
+        face_recognition = lazy_import('face_recognition')
+        item = {'filename': filename, 'content_hash': hashlib.sha1(data).hexdigest()}
+
+        try:
+            image = face_recognition.load_image_file(io.BytesIO(data))
+        except Exception:
+            item['reason'] = 'could not decode image'
+            return item
+
+        # Downscale large phone photos once, before any detection runs
+        height, width = image.shape[:2]
+        scale = self.max_image_side / float(max(height, width))
+        if scale < 1.0:
+            image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+        ret, jpeg = cv2.imencode('.jpg', cv2.cvtColor(image, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, 92])
+        if not ret:
+            item['reason'] = 'could not encode image'
+            return item
+        item['jpeg'] = jpeg.tobytes()
+        item['jpeg_sha1'] = hashlib.sha1(item['jpeg']).hexdigest()  # As DatasetIndex hashes the stored file
+
+        # Detect on the stored JPEG so the cache entry matches what training would compute
+        image = face_recognition.load_image_file(io.BytesIO(item['jpeg']))
+        cache = self.encoding_cache
+        face_locations = cache.detect(image)
+        if len(face_locations) == 0:
+            item['reason'] = 'no face detected'
+            return item
+
+        face_encodings = face_recognition.face_encodings(image, face_locations, num_jitters=cache.num_jitters)
+        item['cache_entry'] = (face_locations, face_encodings)
+
+        # Training uses the first face, so quality checks apply to that one too
+        location = face_locations[0]
+        chip = self.aligned_chip(image, location)
+        sharpness = cv2.Laplacian(cv2.cvtColor(chip, cv2.COLOR_RGB2GRAY), cv2.CV_64F).var()
+        if sharpness < self.blur_threshold:
+            item['reason'] = f'face too blurry (sharpness {sharpness:.0f} < {self.blur_threshold:.0f})'
+            return item
+
+        item['chip'] = chip
+        item['encoding'] = face_encodings[0]
+        return item
+
+    def aligned_chip(self, image, location):
+        """Crop the face rotated so the eyes are level, resized to chip_size"""
+        cv2 = lazy_import('cv2')
+        face_recognition = lazy_import('face_recognition')
+        top, right, bottom, left = location
+        center = ((left + right) / 2.0, (top + bottom) / 2.0)
+        angle = 0.0
+
+        landmarks = face_recognition.face_landmarks(image, [location], model='small')
+        if landmarks:
+            left_eye = np.mean(landmarks[0]['left_eye'], axis=0)
+            right_eye = np.mean(landmarks[0]['right_eye'], axis=0)
+            angle = math.degrees(math.atan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0]))
+            center = tuple((left_eye + right_eye) / 2.0)
+
+        # Rotate about the eye midpoint, then crop a square with some margin
+        rotation = cv2.getRotationMatrix2D((float(center[0]), float(center[1])), angle, 1.0)
+        rotated = cv2.warpAffine(image, rotation, (image.shape[1], image.shape[0]), flags=cv2.INTER_LINEAR)
+        half = int(max(right - left, bottom - top) * 0.65)
+        cx, cy = int((left + right) / 2), int((top + bottom) / 2)
+        y0, y1 = max(0, cy - half), min(rotated.shape[0], cy + half)
+        x0, x1 = max(0, cx - half), min(rotated.shape[1], cx + half)
+        crop = rotated[y0:y1, x0:x1]
+        if crop.size == 0:
+            crop = image[top:bottom, left:right]
+        return cv2.resize(crop, (self.chip_size, self.chip_size), interpolation=cv2.INTER_AREA)
+
+    def save(self, item, person_path, chips_path, base_name):
+        """Write the image, chip and encoding, and seed the encoding cache"""
+        cv2 = lazy_import('cv2')
+        image_path = os.path.join(person_path, f"{base_name}.jpg")
+        with open(image_path, 'wb') as f:
+            f.write(item['jpeg'])
+
+        cv2.imwrite(os.path.join(chips_path, f"{base_name}.jpg"), cv2.cvtColor(item['chip'], cv2.COLOR_RGB2BGR))
+        np.save(os.path.join(chips_path, f"{base_name}.npy"), item['encoding'])
+
+        key = self.encoding_cache.bytes_key(item['jpeg'])
+        self.encoding_cache.put(key, *item['cache_entry'])
+        return image_path
@@ -0,0 +1,282 @@
+"""
+Distributed recognition: gallery shards served over HTTP and a coordinator
+that scatters face encodings to every shard and merges the top-k matches.
+
+Split the trained gallery and start one server per shard:
+    python sharding.py split --shards 2
+    python sharding.py serve --shard face-track-pro/shards/shard_0.pkl --port 5101
+    python sharding.py serve --shard face-track-pro/shards/shard_1.pkl --port 5102
+"""
+
+import json
+import os
+import pickle
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from utils.student_registry import UNKNOWN_ID, gallery_labels
+
+
+def shard_for_label(label, num_shards):
+    """Stable shard assignment so all encodings of a student live on one shard"""
+    return zlib.crc32(int(label).to_bytes(4, 'little', signed=True)) % num_shards
+
+
+def split_gallery(model_path='face-track-pro/local.pkl', output_dir='face-track-pro/shards', num_shards=2):
+    """Partition a trained gallery into shard files with the same format as local.pkl"""
+    with open(model_path, 'rb') as f:
+        data = pickle.load(f)
+
+    labels, student_names = gallery_labels(data)
+    shards = [{'encodings': [], 'labels': [], 'students': {}} for _ in range(num_shards)]
+    for encoding, label in zip(data['encodings'], labels):
+        shard = shards[shard_for_label(label, num_shards)]
+        shard['encodings'].append(encoding)
+        shard['labels'].append(int(label))
+        shard['students'][int(label)] = student_names.get(int(label), "Unknown")
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i, shard in enumerate(shards):
+        path = os.path.join(output_dir, f"shard_{i}.pkl")
+        with open(path, 'wb') as f:
+            pickle.dump(shard, f)
+        paths.append(path)
+        print(f"Shard {i}: {len(shard['labels'])} encodings, {len(shard['students'])} persons -> {path}")
+    return paths
+
+
+class GalleryShard:
+    """One partition of the gallery with a top-k nearest neighbour search"""
+    def __init__(self, shard_path, shard_id=None):
+        with open(shard_path, 'rb') as f:
+            data = pickle.load(f)
+        self.encodings = np.asarray(data['encodings'], dtype=np.float64).reshape(-1, 128)
+        self.labels, _ = gallery_labels(data)
+        self.shard_id = shard_id if shard_id is not None else os.path.basename(shard_path)
+
+    def search(self, face_encodings, k=5):
+        """Return the k closest gallery entries for each query encoding"""
+        results = []
+        if len(self.labels) == 0:
+            return [[] for _ in face_encodings]
+
+        queries = np.asarray(face_encodings, dtype=np.float64).reshape(-1, 128)
+        for query in queries:
+            distances = np.linalg.norm(self.encodings - query, axis=1)
+            top = min(k, len(distances))
+            nearest = np.argpartition(distances, top - 1)[:top]
+            nearest = nearest[np.argsort(distances[nearest])]
+            results.append([{'label': int(self.labels[i]), 'distance': float(distances[i])} for i in nearest])
+        return results
+
+
+class ShardRequestHandler(BaseHTTPRequestHandler):
+    """HTTP interface of a shard server: GET /health and POST /search"""
+
+    def do_GET(self):
+        if self.path == '/health':
+            shard = self.server.shard
+            self.send_json({'shard': shard.shard_id, 'encodings': len(shard.labels)})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path != '/search':
+            self.send_error(404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            start = time.perf_counter()
+            results = self.server.shard.search(request['encodings'], request.get('k', 5))
+            self.send_json({
+                'shard': self.server.shard.shard_id,
+                'results': results,
+                'elapsed_ms': (time.perf_counter() - start) * 1000
+            })
+        except (ValueError, KeyError) as e:
+            self.send_error(400, str(e))
+
+    def send_json(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging would dominate the cost of small searches
+        pass
+
+
+def serve_shard(shard_path, host='127.0.0.1', port=5101):
+    """Serve one gallery shard until interrupted"""
+    server = ThreadingHTTPServer((host, port), ShardRequestHandler)
+    server.shard = GalleryShard(shard_path)
+    print(f"Serving shard {server.shard.shard_id} ({len(server.shard.labels)} encodings) on {host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+class ShardCoordinator:
+    """Scatter encodings to every shard and merge their top-k results.
+
+    A shard that does not answer within timeout is skipped for that request
+    and counted in its stats; results are then computed from the shards that
+    did answer, and the failed shards are returned so callers can treat the
+    answer as partial. Each shard has its own pool of max_in_flight workers:
+    a shard whose calls are all still pending (e.g. hung) is skipped at once
+    instead of queueing requests behind it or delaying the other shards.
+    """
+
+    def __init__(self, shard_urls, timeout=0.5, k=5, max_in_flight=1):
+        self.shard_urls = [url.rstrip('/') for url in shard_urls]
+        self.timeout = timeout
+        self.k = k
+        self.max_in_flight = max_in_flight
+        self.executors = {url: ThreadPoolExecutor(max_workers=max_in_flight) for url in self.shard_urls}
+        self.in_flight = {url: 0 for url in self.shard_urls}
+        self.stats = {url: {'requests': 0, 'answered': 0, 'timeouts': 0, 'errors': 0, 'busy': 0,
+                            'last_ms': 0.0, 'total_ms': 0.0} for url in self.shard_urls}
+        self.lock = threading.Lock()
+
+    def query_shard(self, url, payload):
+        """POST one search request to a shard"""
+        request = urllib.request.Request(f"{url}/search", data=payload,
+                                         headers={'Content-Type': 'application/json'})
+        start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            result = json.loads(response.read())
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            stats = self.stats[url]
+            stats['answered'] += 1
+            stats['last_ms'] = elapsed_ms
+            stats['total_ms'] += elapsed_ms
+        return result
+
+    def search(self, face_encodings):
+        """Return merged top-k matches per encoding and the shards that failed"""
+        if len(face_encodings) == 0:
+            return [], []
+
+        payload = json.dumps({
+            'encodings': np.asarray(face_encodings, dtype=np.float64).reshape(-1, 128).tolist(),
+            'k': self.k
+        }).encode('utf-8')
+        failed = []
+        futures = {}
+        with self.lock:
+            for url in self.shard_urls:
+                self.stats[url]['requests'] += 1
+                if self.in_flight[url] >= self.max_in_flight:
+                    # Earlier calls have not returned yet; do not queue behind them
+                    self.stats[url]['busy'] += 1
+                    failed.append(url)
+                    continue
+                self.in_flight[url] += 1
+                future = self.executors[url].submit(self.query_shard, url, payload)
+                future.add_done_callback(lambda _, url=url: self.finish_call(url))
+                futures[future] = url
+        done, not_done = wait(futures, timeout=self.timeout) if futures else (set(), set())
+
+        merged = [[] for _ in face_encodings]
+        for future, url in futures.items():
+            if future in not_done:
+                failed.append(url)
+                self.record_failure(url, 'timeouts')
+                continue
+            try:
+                result = future.result()
+            except (urllib.error.URLError, TimeoutError, OSError, ValueError) as e:
+                failed.append(url)
+                is_timeout = isinstance(e, TimeoutError) or 'timed out' in str(e)
+                self.record_failure(url, 'timeouts' if is_timeout else 'errors')
+                continue
+            for matches, shard_matches in zip(merged, result['results']):
+                matches.extend(shard_matches)
+
+        for i, matches in enumerate(merged):
+            merged[i] = sorted(matches, key=lambda m: m['distance'])[:self.k]
+        return merged, failed
+
+    def recognize(self, face_encodings, tolerance=0.5):
+        """Return (student ID, distance) per encoding and the shards that failed.
+
+        UNKNOWN_ID means nothing close enough was found on the shards that
+        answered; with failed shards, the face may still be enrolled.
+        """
+        merged, failed = self.search(face_encodings)
+        results = []
+        for matches in merged:
+            if matches and matches[0]['distance'] < tolerance:
+                results.append((matches[0]['label'], matches[0]['distance']))
+            else:
+                results.append((UNKNOWN_ID, matches[0]['distance'] if matches else 1.0))
+        return results, failed
+
+    def finish_call(self, url):
+        with self.lock:
+            self.in_flight[url] -= 1
+
+    def record_failure(self, url, kind):
+        with self.lock:
+            self.stats[url][kind] += 1
+
+    def get_stats(self):
+        """Get per-shard request counts, timeouts and latency"""
+        with self.lock:
+            report = {}
+            for url, stats in self.stats.items():
+                answered = stats['answered']
+                report[url] = {
+                    'requests': stats['requests'],
+                    'timeouts': stats['timeouts'],
+                    'errors': stats['errors'],
+                    'busy': stats['busy'],
+                    'last_ms': round(stats['last_ms'], 2),
+                    'avg_ms': round(stats['total_ms'] / answered, 2) if answered else 0.0
+                }
+            return report
+
+
+def main():
+    """Main function for command-line usage"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='FaceTrack Pro Gallery Sharding')
+    subparsers = parser.add_subparsers(dest='command')
+
+    split_parser = subparsers.add_parser('split', help='Split local.pkl into gallery shards')
+    split_parser.add_argument('--shards', type=int, default=2, help='Number of shards')
+    split_parser.add_argument('--model', default='face-track-pro/local.pkl', help='Trained model path')
+    split_parser.add_argument('--output', default='face-track-pro/shards', help='Output directory')
+
+    serve_parser = subparsers.add_parser('serve', help='Serve one gallery shard')
+    serve_parser.add_argument('--shard', required=True, help='Shard file to serve')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=5101)
+
+    args = parser.parse_args()
+
+    if args.command == 'split':
+        split_gallery(args.model, args.output, args.shards)
+    elif args.command == 'serve':
+        serve_shard(args.shard, args.host, args.port)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+FaceTrack Pro - Memory Soak Test
+Replays synthetic frames through the live pipeline (a CameraStream with one
+viewer: recognition, vote smoothing, overlay and preview encoding) for a long
+period and checks that the resident set size stays flat once the process has
+warmed up. tests/test_soak.py runs a short soak with every test run.
+
+    python soak_test.py --hours 4
+    python soak_test.py --minutes 10 --max-growth-mb 20
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import numpy as np
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        # Not Linux: fall back to the peak RSS, which still catches steady growth
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class SyntheticCamera:
+    """Camera stand-in that yields moving synthetic frames"""
+    def __init__(self, width=640, height=480, seed=0):
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        self.frame = self.background.copy()
+        self.tick = 0
+
+    def get_frame(self, out=None):
+        self.tick += 1
+        np.copyto(self.frame, self.background)
+        # A bright block drifting across the frame so detection output changes
+        x = (self.tick * 4) % (self.frame.shape[1] - 120)
+        self.frame[150:270, x:x + 120] = 230
+        if out is not None and out.shape == self.frame.shape:
+            np.copyto(out, self.frame)
+            return out
+        return self.frame.copy()
+
+
+def run_soak(duration_s, sample_every_s=30.0, warmup_s=60.0, max_growth_mb=25.0):
+    """Run the pipeline for duration_s and return (passed, samples)"""
+    from camera_stream import CameraStream
+    from face_recognition_module import FaceRecognizer
+    from load_shedding import OverloadController
+    from unknown_faces import UnknownFaceCache
+
+    recognizer = FaceRecognizer()
+    # Crops of synthetic faces must not land next to the live server's
+    crops_dir = tempfile.mkdtemp(prefix='facetrack-soak-')
+    recognizer.unknown_faces = UnknownFaceCache(crops_dir=crops_dir)
+    recognizer.warm_up()
+    camera = SyntheticCamera()
+    # Driven frame by frame instead of from its thread; one viewer keeps previews encoded
+    stream = CameraStream(camera, recognizer, overload_controller=OverloadController())
+    stream.viewers = 1
+    voter = stream.voter
+
+    start = time.time()
+    next_sample = start
+    samples = []
+    frame_buffer = None
+    frames = 0
+
+    while time.time() - start < duration_s:
+        frame = camera.get_frame(out=frame_buffer)
+        frame_buffer = frame
+        stream.step(frame)
+        frames += 1
+
+        now = time.time()
+        if now >= next_sample:
+            rss = current_rss_mb()
+            samples.append((now - start, rss))
+            print(f"[{now - start:8.0f}s] frames={frames} rss={rss:.1f} MB tracks={len(voter.tracks)}")
+            next_sample = now + sample_every_s
+
+    shutil.rmtree(crops_dir, ignore_errors=True)
+    samples.append((time.time() - start, current_rss_mb()))
+    steady = [rss for elapsed, rss in samples if elapsed >= warmup_s]
+    if len(steady) < 2:
+        print("Run too short to judge growth after warm-up")
+        return True, samples
+
+    growth = steady[-1] - min(steady)
+    print(f"\nRSS after warm-up: {min(steady):.1f} MB -> {steady[-1]:.1f} MB (growth {growth:.1f} MB)")
+    passed = growth <= max_growth_mb
+    print("PASS: memory is flat" if passed else f"FAIL: RSS grew more than {max_growth_mb} MB")
+    return passed, samples
+
+
+def main():
+    """Main function for command-line usage"""
+    parser = argparse.ArgumentParser(description='FaceTrack Pro Memory Soak Test')
+    parser.add_argument('--hours', type=float, default=0.0, help='Duration in hours')
+    parser.add_argument('--minutes', type=float, default=0.0, help='Duration in minutes')
+    parser.add_argument('--sample-every', type=float, default=30.0, help='Seconds between RSS samples')
+    parser.add_argument('--warmup', type=float, default=60.0, help='Seconds ignored before judging growth')
+    parser.add_argument('--max-growth-mb', type=float, default=25.0, help='Allowed RSS growth after warm-up')
+    args = parser.parse_args()
+
+    duration_s = args.hours * 3600 + args.minutes * 60 or 600
+    passed, _ = run_soak(duration_s, args.sample_every, args.warmup, args.max_growth_mb)
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == '__main__':
+    main()
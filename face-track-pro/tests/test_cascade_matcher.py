@@ -0,0 +1,73 @@
+import unittest
+import numpy as np
+from cascade_matcher import CascadeMatcher
+
+
+def brute_force(encodings, query):
+    """face_distance over the whole gallery, as face_recognition computes it"""
+    distances = np.linalg.norm(encodings - query, axis=1)
+    return distances, int(np.argmin(distances))
+
+
+class CascadeMatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        # 40 identities with 15 encodings each, spread like real embeddings
+        rng = np.random.default_rng(7)
+        centers = rng.normal(0, 0.08, (40, 128))
+        self.encodings = np.repeat(centers, 15, axis=0) + rng.normal(0, 0.02, (600, 128))
+        self.matcher = CascadeMatcher(self.encodings)
+        self.near_queries = self.encodings[rng.choice(600, 100, replace=False)] + rng.normal(0, 0.01, (100, 128))
+        self.far_queries = rng.normal(0, 0.08, (100, 128))
+        self.rng = rng
+
+    def assert_matches_brute_force(self, matcher, encodings, query, max_distance=None):
+        distances, expected = brute_force(encodings, query)
+        index, distance = matcher.nearest(query, max_distance)
+        # Equal distances are ties: either row is a correct answer
+        self.assertEqual(distances[index], distances[expected])
+        self.assertEqual(distance, distances[expected])
+
+    def test_nearest_row_and_distance(self):
+        for query in np.vstack([self.near_queries, self.far_queries]):
+            self.assert_matches_brute_force(self.matcher, self.encodings, query)
+
+    def test_max_distance_keeps_exact_results(self):
+        for max_distance in (0.05, 0.3, 0.6, 10.0):
+            for query in np.vstack([self.near_queries, self.far_queries]):
+                self.assert_matches_brute_force(self.matcher, self.encodings, query, max_distance)
+
+    def test_unknown_face_reports_true_distance(self):
+        # Nothing within max_distance: the distance is still the true nearest one
+        query = self.far_queries[0]
+        distances, _ = brute_force(self.encodings, query)
+        self.assertGreater(distances.min(), 0.3)
+        _, distance = self.matcher.nearest(query, max_distance=0.3)
+        self.assertEqual(distance, distances.min())
+
+    def test_ties(self):
+        # Duplicated rows and a query exactly on one of them
+        encodings = np.vstack([self.encodings[:50], self.encodings[10:20], self.encodings[10:20]])
+        matcher = CascadeMatcher(encodings)
+        for row in range(10, 20):
+            for max_distance in (None, 0.5):
+                index, distance = matcher.nearest(encodings[row], max_distance)
+                self.assertEqual(distance, 0.0)
+                self.assertTrue(np.array_equal(encodings[index], encodings[row]))
+        # Query equidistant from two rows
+        a, b = self.encodings[0], self.encodings[300]
+        self.assert_matches_brute_force(matcher, encodings, (a + b) / 2.0)
+        self.assert_matches_brute_force(matcher, encodings, (a + b) / 2.0, 0.01)
+
+    def test_prunes_work(self):
+        matcher = CascadeMatcher(self.encodings)
+        for query in self.near_queries:
+            matcher.nearest(query, max_distance=0.5)
+        self.assertLess(matcher.get_stats()['work_ratio'], 1.0)
+
+    def test_empty_gallery(self):
+        self.assertEqual(CascadeMatcher(np.empty((0, 128))).nearest(np.zeros(128)), (-1, 1.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
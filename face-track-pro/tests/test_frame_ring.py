@@ -0,0 +1,129 @@
+import multiprocessing
+import threading
+import time
+import unittest
+import numpy as np
+from frame_ring import SharedFrameRing
+
+SHAPE = (4, 6, 3)
+
+
+def frame_for(value):
+    return np.full(SHAPE, value % 256, dtype=np.uint8)
+
+
+def read_frames(ring, last_seq, results):
+    """Reader process: acquire frames in order up to last_seq and report (seq, first pixel) for each"""
+    seen = []
+    after_seq = 0
+    while after_seq < last_seq:
+        acquired = ring.acquire(after_seq=after_seq, timeout=5.0, latest=False)
+        if acquired is None:
+            break
+        pin, seq, frame = acquired
+        try:
+            seen.append((seq, int(frame[0, 0, 0])))
+        finally:
+            ring.release(pin)
+        after_seq = seq
+    results.put(seen)
+
+
+def write_frames(ring, values):
+    """Writer process: write one frame per value"""
+    for value in values:
+        ring.write(frame_for(value), timeout=5.0)
+
+
+class SharedFrameRingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.context = multiprocessing.get_context('spawn')
+        self.rings = []
+
+    def tearDown(self):
+        for ring in self.rings:
+            ring.close()
+
+    def make_ring(self, **kwargs):
+        ring = SharedFrameRing(shape=SHAPE, context=self.context, **kwargs)
+        self.rings.append(ring)
+        return ring
+
+    def test_concurrent_writers_get_distinct_increasing_seqs(self):
+        ring = self.make_ring(slots=4, backpressure='block')
+        per_writer, writers = 200, 4
+        seqs = [[] for _ in range(writers)]
+
+        def write(index):
+            for value in range(per_writer):
+                seqs[index].append(ring.write(frame_for(value), timeout=5.0))
+
+        threads = [threading.Thread(target=write, args=(index,)) for index in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        written = [seq for writer_seqs in seqs for seq in writer_seqs]
+        self.assertNotIn(None, written)
+        self.assertEqual(sorted(written), list(range(1, per_writer * writers + 1)))
+        for writer_seqs in seqs:
+            # Each writer's own frames are numbered in the order it wrote them
+            self.assertEqual(writer_seqs, sorted(writer_seqs))
+        stats = ring.get_stats()
+        self.assertEqual(stats['last_seq'], per_writer * writers)
+        self.assertEqual(stats['frames_written'], per_writer * writers)
+        self.assertEqual(stats['frames_dropped'], 0)
+
+    def test_late_release_of_reclaimed_pin_keeps_newer_pin(self):
+        ring = self.make_ring(slots=1, lease=0.05)
+        ring.write(frame_for(1))
+        stale_pin, seq, _ = ring.acquire()
+        time.sleep(0.1)
+
+        # The next write reclaims the stale pin and reuses the slot
+        self.assertEqual(ring.write(frame_for(2)), seq + 1)
+        pin, _, _ = ring.acquire(after_seq=seq)
+        ring.release(stale_pin)
+        self.assertEqual(ring.get_stats()['pinned_slots'], 1)
+        self.assertIsNone(ring.write(frame_for(3)))
+
+        ring.release(pin)
+        self.assertEqual(ring.get_stats()['pinned_slots'], 0)
+        self.assertEqual(ring.get_stats()['pins_reclaimed'], 1)
+
+    def test_reader_process_sees_frames_in_order(self):
+        ring = self.make_ring(slots=4, backpressure='block')
+        results = self.context.Queue()
+        reader = self.context.Process(target=read_frames, args=(ring, 20, results))
+        reader.start()
+        try:
+            for value in range(1, 21):
+                self.assertEqual(ring.write(frame_for(value), timeout=5.0), value)
+            seen = results.get(timeout=30)
+        finally:
+            reader.join(timeout=30)
+        # Every frame is the one written under its seq; a reader that falls behind may skip some
+        self.assertEqual(seen[-1], (20, 20))
+        self.assertEqual([seq for seq, _ in seen], sorted(seq for seq, _ in seen))
+        for seq, value in seen:
+            self.assertEqual(value, seq % 256)
+
+    def test_counters_are_shared_across_processes(self):
+        ring = self.make_ring(slots=4, backpressure='block')
+        writers = [self.context.Process(target=write_frames, args=(ring, range(25))) for _ in range(2)]
+        for writer in writers:
+            writer.start()
+        write_frames(ring, range(25))
+        for writer in writers:
+            writer.join(timeout=30)
+            self.assertEqual(writer.exitcode, 0)
+
+        stats = ring.get_stats()
+        self.assertEqual(stats['frames_written'], 75)
+        self.assertEqual(stats['last_seq'], 75)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+
+def installed(*modules):
+    return all(importlib.util.find_spec(module) is not None for module in modules)
+
+
+@unittest.skipUnless(installed('cv2', 'face_recognition', 'PIL'), 'needs the recognition dependencies')
+class SoakTest(unittest.TestCase):
+    """A short soak of the live pipeline; soak_test.py runs the long version"""
+
+    def setUp(self):
+        # Without a trained model the gallery is empty, so every face takes the unknown path
+        self.previous_dir = os.getcwd()
+        self.work_dir = tempfile.TemporaryDirectory()
+        os.chdir(self.work_dir.name)
+
+    def tearDown(self):
+        os.chdir(self.previous_dir)
+        self.work_dir.cleanup()
+
+    def test_memory_stays_flat(self):
+        from soak_test import run_soak
+        passed, samples = run_soak(duration_s=8.0, sample_every_s=0.5, warmup_s=3.0, max_growth_mb=15.0)
+        self.assertTrue(passed)
+        self.assertGreaterEqual(len([elapsed for elapsed, _ in samples if elapsed >= 3.0]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
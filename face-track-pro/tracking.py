@@ -0,0 +1,145 @@
+import threading
+from collections import Counter, deque
+from datetime import date
+from detectors import iou
+from utils.student_registry import UNKNOWN_ID
+
+
+class FaceTrack:
+    """A face followed across processed frames"""
+    def __init__(self, track_id, location, vote_window):
+        self.track_id = track_id
+        self.location = location
+        self.votes = deque(maxlen=vote_window)
+        self.missed = 0
+        self.committed_id = None
+
+
+class IdentityVoter:
+    """Per-track temporal voting between FaceRecognizer and attendance logging.
+
+    Faces are associated across processed frames by bounding-box overlap. An
+    identity is committed only once it wins votes_required of the last
+    vote_window recognitions on its track, and each track commits at most once.
+    A recognition flagged as confident (well inside the student's calibrated
+    threshold) commits on its own. Results reused from the recognition cache
+    (fresh=False) keep their track alive but add no vote, since they are not a
+    new observation. Votes are integer student IDs. The set of students
+    committed today is cleared at day rollover.
+    """
+
+    def __init__(self, votes_required=3, vote_window=5, iou_threshold=0.3, max_missed=5, max_tracks=200):
+        self.votes_required = votes_required
+        self.vote_window = vote_window
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_tracks = max_tracks
+
+        self.tracks = []
+        self.next_track_id = 1
+        self.current_date = date.today()
+        self.committed_today = set()
+        self.lock = threading.Lock()
+
+    def update(self, face_locations, face_labels, today=None, confident=None, fresh=None):
+        """Add one processed frame of detections and return newly committed student IDs"""
+        today = today or date.today()
+        committed = []
+        confident = confident or [False] * len(face_labels)
+        fresh = fresh or [True] * len(face_labels)
+
+        with self.lock:
+            if today != self.current_date:
+                self.reset_day(today)
+
+            matched_tracks = self.associate(face_locations)
+            for location, label, is_confident, is_fresh, track in zip(face_locations, face_labels, confident,
+                                                                      fresh, matched_tracks):
+                if track is None:
+                    track = FaceTrack(self.next_track_id, location, self.vote_window)
+                    self.next_track_id += 1
+                    self.tracks.append(track)
+                track.location = location
+                track.missed = 0
+                if not is_fresh:
+                    continue
+                track.votes.append(label)
+
+                if track.committed_id is None:
+                    student_id = label if is_confident and label != UNKNOWN_ID else self.winning_identity(track)
+                    if student_id is not None:
+                        track.committed_id = student_id
+                        if student_id not in self.committed_today:
+                            self.committed_today.add(student_id)
+                            committed.append(student_id)
+
+            # Age out tracks that were not seen in this frame
+            seen = {id(track) for track in matched_tracks if track is not None}
+            for track in self.tracks:
+                if id(track) not in seen:
+                    track.missed += 1
+            self.tracks = [track for track in self.tracks if track.missed <= self.max_missed]
+            if len(self.tracks) > self.max_tracks:
+                # Keep the most recently seen tracks
+                self.tracks = sorted(self.tracks, key=lambda track: track.missed)[:self.max_tracks]
+
+        return committed
+
+    def associate(self, face_locations):
+        """Greedily match each detection to the existing track it overlaps most"""
+        matched = [None] * len(face_locations)
+        candidates = []
+        for i, location in enumerate(face_locations):
+            for track in self.tracks:
+                overlap = iou(location, track.location)
+                if overlap >= self.iou_threshold:
+                    candidates.append((overlap, i, track))
+
+        used_tracks = set()
+        for overlap, i, track in sorted(candidates, key=lambda c: c[0], reverse=True):
+            if matched[i] is None and id(track) not in used_tracks:
+                matched[i] = track
+                used_tracks.add(id(track))
+        return matched
+
+    def winning_identity(self, track):
+        """Return the identity holding enough votes on a track, if any"""
+        counts = Counter(label for label in track.votes if label != UNKNOWN_ID)
+        if not counts:
+            return None
+        student_id, count = counts.most_common(1)[0]
+        return student_id if count >= self.votes_required else None
+
+    def snapshot(self):
+        """JSON-serializable copy of the tracks and the day's commits"""
+        with self.lock:
+            return {
+                'current_date': self.current_date.isoformat(),
+                'committed_today': sorted(int(student_id) for student_id in self.committed_today),
+                'next_track_id': self.next_track_id,
+                'tracks': [{'track_id': track.track_id, 'location': [int(v) for v in track.location],
+                            'votes': [int(label) for label in track.votes], 'missed': track.missed,
+                            'committed_id': None if track.committed_id is None else int(track.committed_id)}
+                           for track in self.tracks]
+            }
+
+    def restore(self, snapshot):
+        """Continue from a snapshot() taken by another voter"""
+        with self.lock:
+            self.current_date = date.fromisoformat(snapshot['current_date'])
+            self.committed_today = set(snapshot['committed_today'])
+            self.next_track_id = snapshot['next_track_id']
+            self.tracks = []
+            for saved in snapshot['tracks']:
+                track = FaceTrack(saved['track_id'], tuple(saved['location']), self.vote_window)
+                track.votes.extend(saved['votes'])
+                track.missed = saved['missed']
+                track.committed_id = saved['committed_id']
+                self.tracks.append(track)
+
+    def reset_day(self, today):
+        """Start a new attendance day"""
+        self.current_date = today
+        self.committed_today = set()
+        for track in self.tracks:
+            track.committed_id = None
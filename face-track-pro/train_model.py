@@ -1,27 +1,53 @@
 import os
-import cv2
-import face_recognition
+import shutil
 import pickle
 import numpy as np
 from pathlib import Path
+from utils.startup import lazy_import
+from utils.encoding_cache import EncodingCache
+from utils.student_registry import StudentRegistry
+from utils.dataset_index import DatasetIndex
 
 class FaceTrainer:
-    def __init__(self):
+    def __init__(self, detector=None, quantization=None, calibrate=True, dataset_index=None):
         self.dataset_path = 'face-track-pro/dataset'
         self.model_path = 'face-track-pro/local.pkl'
         self.supported_formats = ['.jpg', '.jpeg', '.png', '.bmp']
+        
+        # Face locations/encodings shared by training, validation and registration
+        self.encoding_cache = EncodingCache.shared(detector=detector)
+        
+        # Stable student IDs; the gallery stores these instead of names
+        self.registry = StudentRegistry.shared()
+        
+        # Image inventory for the admin pages; training records each image's encode status
+        self.dataset_index = dataset_index or DatasetIndex(self.dataset_path)
+        
+        # Optional compressed gallery for the first matching pass (float16, int8 or pq).
+        # None keeps the method of the current model, so a retrain does not drop
+        # an index built with --quantize; 'none' turns it off
+        self.quantization = quantization
+        
+        # Per-student thresholds calibrated from genuine/impostor distances. The
+        # calibration is O(N^2) in gallery rows, so retrains from the web pass
+        # 'keep' to carry the stored thresholds over and leave it to the CLI
+        self.calibrate = calibrate
+        self.default_tolerance = 0.5
     
     def train_model(self):
         """Train the face recognition model with all images in the dataset"""
         print("Starting face recognition model training...")
         
         known_encodings = []
-        known_names = []
+        known_labels = []
+        # The cache is shared with registration; report this run's share of its counters
+        cache_before = self.encoding_cache.get_stats()
         
         # Create dataset directory if it doesn't exist
         os.makedirs(self.dataset_path, exist_ok=True)
         
         # Process each person's folder in the dataset
+        person_folders = set()
         for person_folder in os.listdir(self.dataset_path):
             person_path = os.path.join(self.dataset_path, person_folder)
             
@@ -29,7 +55,9 @@ class FaceTrainer:
                 continue
             
             print(f"Processing images for: {person_folder}")
+            person_folders.add(person_folder)
             person_encodings = []
+            image_status = {}
             
             # Process all images for this person
             for image_file in os.listdir(person_path):
@@ -40,12 +68,11 @@ class FaceTrainer:
                 print(f"  Processing: {image_file}")
                 
                 try:
-                    # Load and process the image
-                    image = face_recognition.load_image_file(image_path)
-                    
                     # Get face encodings (there should be exactly one face per image)
-                    face_encodings = face_recognition.face_encodings(image)
+                    face_locations, face_encodings = self.encoding_cache.get_or_compute(image_path)
                     
+                    image_status[image_file] = {'status': 'encoded' if face_encodings else 'no_face',
+                                                'faces': len(face_encodings)}
                     if len(face_encodings) == 0:
                         print(f"    Warning: No face found in {image_file}")
                         continue
@@ -58,27 +85,49 @@ class FaceTrainer:
                     
                 except Exception as e:
                     print(f"    Error processing {image_file}: {e}")
+                    image_status[image_file] = {'status': 'error', 'faces': 0}
                     continue
             
+            self.dataset_index.sync_folder(person_folder, image_status)
+            
             # Add all encodings for this person
             if person_encodings:
-                # Convert folder name to display name
-                display_name = person_folder.replace('_', ' ').title()
+                # Folders registered before the registry get an ID from their name
+                student_id = self.registry.id_for_folder(person_folder)
+                if student_id is None:
+                    display_name = person_folder.replace('_', ' ').title()
+                    student_id = self.registry.register(display_name, folder=person_folder)['id']
+                display_name = self.registry.name_of(student_id)
                 
-                for encoding in person_encodings:
-                    known_encodings.append(encoding)
-                    known_names.append(display_name)
+                known_encodings.extend(person_encodings)
+                known_labels.extend([student_id] * len(person_encodings))
                 
                 print(f"  Added {len(person_encodings)} encodings for {display_name}")
             else:
                 print(f"  No valid encodings found for {person_folder}")
         
+        self.dataset_index.prune(person_folders)
+        self.dataset_index.save()
+        
         # Save the model
         if known_encodings:
+            labels = np.asarray(known_labels, dtype=np.int32)
             model_data = {
-                'encodings': known_encodings,
-                'names': known_names
+                'encodings': np.asarray(known_encodings, dtype=np.float64),
+                'labels': labels,
+                'students': {int(student_id): self.registry.name_of(int(student_id)) for student_id in np.unique(labels)}
             }
+            previous = self.load_model_file() if self.quantization is None or self.calibrate == 'keep' else {}
+            method = self.quantization
+            if method is None:
+                method = previous.get('quantization', {}).get('method')
+            if method and method != 'none':
+                model_data['quantization'] = self.quantize_gallery(model_data['encodings'], labels, method)
+            if self.calibrate == 'keep':
+                model_data['thresholds'], model_data['calibration'] = self.stored_thresholds(labels, previous)
+            elif self.calibrate:
+                model_data['thresholds'], model_data['calibration'] = self.calibrate_thresholds(
+                    model_data['encodings'], labels, model_data['students'])
             
             # Create directory for model if it doesn't exist
             os.makedirs(os.path.dirname(self.model_path), exist_ok=True)
@@ -88,15 +137,19 @@ class FaceTrainer:
             
             print(f"\nModel training completed!")
             print(f"Total faces trained: {len(known_encodings)}")
-            print(f"Unique persons: {len(set(known_names))}")
+            print(f"Unique persons: {len(model_data['students'])}")
             print(f"Model saved to: {self.model_path}")
             
+            cache_stats = self.encoding_cache.get_stats()
+            print(f"Encoding cache: {cache_stats['hits'] - cache_before['hits']} hits, "
+                  f"{cache_stats['misses'] - cache_before['misses']} misses")
+            
             # Print summary by person
             from collections import Counter
-            person_counts = Counter(known_names)
+            person_counts = Counter(known_labels)
             print("\nTraining summary:")
-            for person, count in person_counts.items():
-                print(f"  {person}: {count} images")
+            for student_id, count in person_counts.items():
+                print(f"  {model_data['students'][student_id]}: {count} images")
                 
         else:
             print("No valid face encodings found. Please check your dataset.")
@@ -104,9 +157,85 @@ class FaceTrainer:
         
         return True
     
-    def add_person(self, person_name, image_paths):
+    def quantize_gallery(self, encodings, labels, method):
+        """Build the compressed gallery and report its size and accuracy change"""
+        from quantization import QuantizedGallery, create_quantizer, evaluate_quantization
+        gallery = QuantizedGallery(encodings, create_quantizer(method).fit(encodings))
+        stats = gallery.get_stats()
+        print(f"\nGallery quantization ({stats['method']}): "
+              f"{stats['float64_bytes'] / 1024:.1f} KB -> {stats['scan_bytes'] / 1024:.1f} KB "
+              f"({stats['compression']}x smaller)")
+        
+        report = evaluate_quantization(encodings, labels, gallery)
+        if report is not None:
+            print(f"Leave-one-out match accuracy: {report['exact_accuracy']:.3f} exact, "
+                  f"{report['quantized_accuracy']:.3f} quantized ({report['accuracy_change']:+.3f}), "
+                  f"same match {report['same_match_rate']:.1%}")
+        return gallery.state()
+    
+    def calibrate_thresholds(self, encodings, labels, students):
+        """Per-student thresholds plus the ROC curve and expected FAR/FRR"""
+        from calibration import calibrate
+        result = calibrate(encodings, labels, default=self.default_tolerance)
+        thresholds = result.pop('thresholds')
+        
+        print(f"\nThreshold calibration:")
+        for name, rates in (('global', result['global']), ('per-student', result['per_identity'])):
+            if rates is not None:
+                print(f"  {name} thresholds: FAR {rates['far']:.2%}, FRR {rates['frr']:.2%} "
+                      f"({rates['queries']} leave-one-out queries)")
+        strict = sorted(thresholds.items(), key=lambda item: item[1])[:5]
+        if strict:
+            print("  Strictest: " + ", ".join(f"{students.get(student_id, student_id)} {threshold:.2f}"
+                                             for student_id, threshold in strict))
+        return thresholds, result
+    
+    def load_model_file(self):
+        """Contents of the current model file, or {} if there is none"""
+        try:
+            with open(self.model_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return {}
+
+    def stored_thresholds(self, labels, previous):
+        """Thresholds of the previous model for students still in the gallery.
+
+        New students fall back to the global tolerance until the next
+        calibration (python train_model.py --calibrate).
+        """
+        present = set(int(label) for label in np.unique(labels))
+        thresholds = {student_id: threshold for student_id, threshold in previous.get('thresholds', {}).items()
+                      if student_id in present}
+        print(f"Kept {len(thresholds)} calibrated thresholds; {len(present) - len(thresholds)} students "
+              f"use the global tolerance until the next calibration")
+        return thresholds, previous.get('calibration')
+
+    def calibrate_model(self):
+        """Recalibrate the thresholds of the trained model without re-encoding the dataset"""
+        if not os.path.exists(self.model_path):
+            print("No trained model to calibrate")
+            return False
+        with open(self.model_path, 'rb') as f:
+            model_data = pickle.load(f)
+        if 'labels' not in model_data:
+            print("Model predates student IDs; retrain it first")
+            return False
+        model_data['thresholds'], model_data['calibration'] = self.calibrate_thresholds(
+            model_data['encodings'], np.asarray(model_data['labels']), model_data.get('students', {}))
+
+        # Replace atomically so a server reloading the model never sees a partial file
+        tmp_path = f"{self.model_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(model_data, f)
+        os.replace(tmp_path, self.model_path)
+        print(f"Calibrated thresholds saved to: {self.model_path}")
+        return True
+
+    def add_person(self, person_name, image_paths, usn=None):
         """Add a new person to the dataset and retrain the model"""
-        person_folder = person_name.lower().replace(' ', '_')
+        cv2 = lazy_import('cv2')
+        person_folder = self.registry.register(person_name, usn)['folder']
         person_path = os.path.join(self.dataset_path, person_folder)
         
         # Create person directory
@@ -115,15 +244,8 @@ class FaceTrainer:
         valid_images = 0
         for i, image_path in enumerate(image_paths):
             try:
-                # Load and validate the image
-                image = cv2.imread(image_path)
-                if image is None:
-                    print(f"Could not load image: {image_path}")
-                    continue
-                
-                # Check if face is detected
-                rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                face_locations = face_recognition.face_locations(rgb_image)
+                # Check if face is detected (cached, so training reuses this pass)
+                face_locations, _ = self.encoding_cache.get_or_compute(image_path)
                 
                 if len(face_locations) == 0:
                     print(f"No face detected in: {image_path}")
@@ -131,10 +253,19 @@ class FaceTrainer:
                 elif len(face_locations) > 1:
                     print(f"Multiple faces detected in: {image_path}, using first face")
                 
-                # Save the image to the person's folder
-                filename = f"{person_folder}_{i+1}.jpg"
-                save_path = os.path.join(person_path, filename)
-                cv2.imwrite(save_path, image)
+                # Save the image to the person's folder. Supported formats are
+                # copied byte-for-byte so the cache entry stays valid.
+                ext = os.path.splitext(image_path)[1].lower()
+                if ext in self.supported_formats:
+                    save_path = os.path.join(person_path, f"{person_folder}_{i+1}{ext}")
+                    shutil.copyfile(image_path, save_path)
+                else:
+                    image = cv2.imread(image_path)
+                    if image is None:
+                        print(f"Could not load image: {image_path}")
+                        continue
+                    save_path = os.path.join(person_path, f"{person_folder}_{i+1}.jpg")
+                    cv2.imwrite(save_path, image)
                 valid_images += 1
                 
             except Exception as e:
@@ -148,14 +279,18 @@ class FaceTrainer:
             print(f"No valid images added for {person_name}")
             return False
     
-    def remove_person(self, person_name):
+    def remove_person(self, person_name, usn=None):
         """Remove a person from the dataset and retrain the model"""
-        person_folder = person_name.lower().replace(' ', '_')
+        student_id = self.registry.id_for_usn(usn) if usn else self.registry.id_for_folder(person_name.lower().replace(' ', '_'))
+        student = self.registry.get(student_id)
+        person_folder = student['folder'] if student else person_name.lower().replace(' ', '_')
         person_path = os.path.join(self.dataset_path, person_folder)
         
         if os.path.exists(person_path):
-            import shutil
             shutil.rmtree(person_path)
+            self.dataset_index.remove_folder(person_folder)
+            if student:
+                self.registry.remove(student_id)
             print(f"Removed {person_name} from dataset")
             return self.train_model()
         else:
@@ -192,8 +327,7 @@ class FaceTrainer:
                 image_path = os.path.join(person_path, image_file)
                 
                 try:
-                    image = face_recognition.load_image_file(image_path)
-                    face_encodings = face_recognition.face_encodings(image)
+                    face_locations, face_encodings = self.encoding_cache.get_or_compute(image_path)
                     
                     if len(face_encodings) == 0:
                         issues.append(f"No face found: {person_folder}/{image_file}")
@@ -233,19 +367,34 @@ def main():
     parser.add_argument('--validate', action='store_true', help='Validate the dataset')
     parser.add_argument('--add-person', type=str, help='Add a new person to the dataset')
     parser.add_argument('--images', nargs='+', help='Image paths for adding a person')
+    parser.add_argument('--usn', type=str, help='USN of the person being added')
+    parser.add_argument('--detector', type=str, help='Detector backend (hog, cnn, haar, dnn, cascade)')
+    parser.add_argument('--detector-scale', type=float, default=1.0, help='Downscale applied before detection')
+    parser.add_argument('--upsample', type=int, default=1, help='Detector upsampling passes')
+    parser.add_argument('--quantize', choices=['float16', 'int8', 'pq', 'none'],
+                        help='Store a compressed gallery for matching (default: same as the current model)')
+    parser.add_argument('--no-calibrate', action='store_true', help='Use the global tolerance for every student')
+    parser.add_argument('--calibrate', action='store_true', help='Recalibrate the thresholds of the trained model')
     
     args = parser.parse_args()
     
-    trainer = FaceTrainer()
+    detector = None
+    if args.detector:
+        from detectors import create_detector
+        detector = create_detector(args.detector, scale=args.detector_scale, upsample=args.upsample)
+    
+    trainer = FaceTrainer(detector=detector, quantization=args.quantize, calibrate=not args.no_calibrate)
     
     if args.validate:
         trainer.validate_dataset()
     elif args.train:
         trainer.train_model()
+    elif args.calibrate:
+        trainer.calibrate_model()
     elif args.add_person and args.images:
-        trainer.add_person(args.add_person, args.images)
+        trainer.add_person(args.add_person, args.images, usn=args.usn)
     else:
-        print("Please specify an action: --train, --validate, or --add-person")
+        print("Please specify an action: --train, --calibrate, --validate, or --add-person")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
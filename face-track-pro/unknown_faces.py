@@ -0,0 +1,241 @@
+"""
+Open-set handling of faces that match no enrolled student.
+
+Unrecognized encodings are clustered online; a face that is close to an
+existing cluster is answered from this small cache instead of a full
+gallery scan. Each cluster keeps a few face crops so a visitor who keeps
+reappearing can be enrolled in one step from the admin panel.
+"""
+
+import os
+import shutil
+import threading
+import time
+import numpy as np
+from utils.startup import lazy_import
+from utils.student_registry import UNKNOWN_ID
+
+
+class UnknownCluster:
+    """Running mean of the encodings of one unrecognized person"""
+    def __init__(self, cluster_id, encoding, now):
+        self.cluster_id = cluster_id
+        self.centroid = np.asarray(encoding, dtype=np.float64).copy()
+        self.count = 1
+        self.hits = 0
+        self.first_seen = now
+        self.last_seen = now
+        self.last_crop_time = 0.0
+        self.crops = []
+
+    def to_dict(self):
+        return {
+            'id': self.cluster_id,
+            'sightings': self.count,
+            'cache_hits': self.hits,
+            'first_seen': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.first_seen)),
+            'last_seen': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_seen)),
+            'crops': len(self.crops)
+        }
+
+
+class UnknownFaceCache:
+    """Online clusters of recent unknown encodings.
+
+    lookup() answers repeats of a known visitor without a gallery scan; every
+    recheck_every-th hit on a cluster falls through to the gallery anyway, so
+    a student enrolled or mis-rejected earlier is not stuck as "Unknown".
+    Clusters not seen for ttl seconds, or beyond max_clusters, are evicted
+    together with their crops.
+
+    Crops are kept under crops_dir across instances; only the server clears
+    the leftovers of its previous run (purge_crops()) at startup. Tools that
+    run next to the server give their cache a directory of their own.
+    """
+
+    def __init__(self, crops_dir='face-track-pro/cache/unknown', max_clusters=200, match_distance=0.4,
+                 ttl=3600.0, recheck_every=10, max_crops=5, crop_interval=2.0):
+        self.crops_dir = crops_dir
+        self.max_clusters = max_clusters
+        self.match_distance = match_distance
+        self.ttl = ttl
+        self.recheck_every = recheck_every
+        self.max_crops = max_crops
+        self.crop_interval = crop_interval
+
+        self.clusters = {}
+        self.cluster_ids = []  # Row order of self.centroids
+        self.centroids = np.empty((0, 128))
+        self.next_cluster_id = 1
+        self.stats = {'lookups': 0, 'hits': 0, 'rechecks': 0, 'created': 0, 'evicted': 0}
+        self.lock = threading.Lock()
+
+    def purge_crops(self):
+        """Delete crops left by a previous run, whose clusters no longer exist"""
+        with self.lock:
+            if not self.clusters:
+                shutil.rmtree(self.crops_dir, ignore_errors=True)
+
+    def nearest(self, encoding):
+        """Closest cluster and its distance, or (None, inf)"""
+        if len(self.cluster_ids) == 0:
+            return None, float('inf')
+        distances = np.linalg.norm(self.centroids - encoding, axis=1)
+        i = int(np.argmin(distances))
+        return self.clusters[self.cluster_ids[i]], float(distances[i])
+
+    def lookup(self, encoding, now=None):
+        """Return the cluster ID if this face is a known unknown, else None"""
+        now = now or time.time()
+        with self.lock:
+            self.stats['lookups'] += 1
+            self.expire(now)
+            cluster, distance = self.nearest(encoding)
+            if cluster is None or distance >= self.match_distance:
+                return None
+            cluster.hits += 1
+            cluster.last_seen = now
+            if cluster.hits % self.recheck_every == 0:
+                self.stats['rechecks'] += 1
+                return None
+            self.stats['hits'] += 1
+            return cluster.cluster_id
+
+    def add(self, encoding, frame=None, location=None, now=None):
+        """Record an encoding the gallery did not recognize; returns its cluster ID"""
+        now = now or time.time()
+        encoding = np.asarray(encoding, dtype=np.float64)
+        with self.lock:
+            cluster, distance = self.nearest(encoding)
+            if cluster is not None and distance < self.match_distance:
+                cluster.count += 1
+                cluster.centroid += (encoding - cluster.centroid) / cluster.count
+                cluster.last_seen = now
+                self.centroids[self.cluster_ids.index(cluster.cluster_id)] = cluster.centroid
+            else:
+                cluster = UnknownCluster(self.next_cluster_id, encoding, now)
+                self.next_cluster_id += 1
+                self.clusters[cluster.cluster_id] = cluster
+                self.cluster_ids.append(cluster.cluster_id)
+                self.centroids = np.vstack([self.centroids, cluster.centroid])
+                self.stats['created'] += 1
+                if len(self.clusters) > self.max_clusters:
+                    oldest = min(self.clusters.values(), key=lambda c: c.last_seen)
+                    self.remove(oldest.cluster_id)
+                    self.stats['evicted'] += 1
+
+            if (frame is not None and location is not None and len(cluster.crops) < self.max_crops
+                    and now - cluster.last_crop_time >= self.crop_interval):
+                self.save_crop(cluster, frame, location)
+                cluster.last_crop_time = now
+            return cluster.cluster_id
+
+    def forget(self, encoding):
+        """Drop clusters that turned out to be an enrolled student"""
+        with self.lock:
+            cluster, distance = self.nearest(np.asarray(encoding, dtype=np.float64))
+            if cluster is not None and distance < self.match_distance:
+                self.remove(cluster.cluster_id)
+
+    def save_crop(self, cluster, frame, location):
+        """Save the face with some margin so it can be re-detected at enrolment"""
+        cv2 = lazy_import('cv2')
+        top, right, bottom, left = location
+        margin = int(max(bottom - top, right - left) * 0.5)
+        height, width = frame.shape[:2]
+        crop = frame[max(0, top - margin):min(height, bottom + margin), max(0, left - margin):min(width, right + margin)]
+        if crop.size == 0:
+            return
+        directory = os.path.join(self.crops_dir, str(cluster.cluster_id))
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{len(cluster.crops) + 1}.jpg")
+        if cv2.imwrite(path, crop):
+            cluster.crops.append(path)
+
+    def remove(self, cluster_id):
+        """Remove a cluster and its crops (caller holds the lock)"""
+        if self.clusters.pop(cluster_id, None) is None:
+            return False
+        row = self.cluster_ids.index(cluster_id)
+        del self.cluster_ids[row]
+        self.centroids = np.delete(self.centroids, row, axis=0)
+        shutil.rmtree(os.path.join(self.crops_dir, str(cluster_id)), ignore_errors=True)
+        return True
+
+    def expire(self, now):
+        """Evict clusters not seen within the TTL (caller holds the lock)"""
+        for cluster in [c for c in self.clusters.values() if now - c.last_seen > self.ttl]:
+            self.remove(cluster.cluster_id)
+            self.stats['evicted'] += 1
+
+    def dismiss(self, cluster_id):
+        with self.lock:
+            return self.remove(cluster_id)
+
+    def clear(self):
+        """Forget all clusters"""
+        with self.lock:
+            for cluster_id in list(self.clusters):
+                self.remove(cluster_id)
+
+    def prune(self, recognize):
+        """Drop clusters the gallery now recognizes, e.g. after a student was enrolled.
+
+        recognize maps an array of centroids to one student ID (or UNKNOWN_ID)
+        each; the gallery is queried outside the lock.
+        """
+        with self.lock:
+            cluster_ids = list(self.cluster_ids)
+            centroids = self.centroids.copy()
+        if not cluster_ids:
+            return 0
+        labels = recognize(centroids)
+        removed = 0
+        with self.lock:
+            for cluster_id, label in zip(cluster_ids, labels):
+                if label != UNKNOWN_ID and self.remove(cluster_id):
+                    removed += 1
+        return removed
+
+    def snapshot(self):
+        """JSON-serializable copy of the clusters, without their crops"""
+        with self.lock:
+            return {
+                'next_cluster_id': self.next_cluster_id,
+                'clusters': [{'id': c.cluster_id, 'centroid': c.centroid.tolist(), 'count': c.count, 'hits': c.hits,
+                              'first_seen': c.first_seen, 'last_seen': c.last_seen}
+                             for c in (self.clusters[cluster_id] for cluster_id in self.cluster_ids)]
+            }
+
+    def restore(self, snapshot):
+        """Replace the clusters with a snapshot() of another cache; crops are not restored"""
+        with self.lock:
+            for cluster_id in list(self.clusters):
+                self.remove(cluster_id)
+            for saved in snapshot['clusters']:
+                cluster = UnknownCluster(saved['id'], saved['centroid'], saved['first_seen'])
+                cluster.count = saved['count']
+                cluster.hits = saved['hits']
+                cluster.last_seen = saved['last_seen']
+                self.clusters[cluster.cluster_id] = cluster
+                self.cluster_ids.append(cluster.cluster_id)
+            self.centroids = (np.array([self.clusters[c].centroid for c in self.cluster_ids])
+                              if self.cluster_ids else np.empty((0, 128)))
+            self.next_cluster_id = snapshot['next_cluster_id']
+
+    def list_clusters(self, min_sightings=1):
+        """Clusters ordered by how often the visitor was seen"""
+        with self.lock:
+            clusters = [c.to_dict() for c in self.clusters.values() if c.count >= min_sightings]
+        return sorted(clusters, key=lambda c: c['sightings'], reverse=True)
+
+    def crop_paths(self, cluster_id):
+        with self.lock:
+            cluster = self.clusters.get(cluster_id)
+            return list(cluster.crops) if cluster else []
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats, clusters=len(self.clusters))
+        stats['hit_rate'] = stats['hits'] / stats['lookups'] if stats['lookups'] else 0.0
+        return stats
@@ -0,0 +1,175 @@
+import csv
+import importlib.util
+import os
+import shutil
+from datetime import date, timedelta
+import numpy as np
+from utils.startup import lazy_import
+
+
+class AttendanceArchive:
+    """Date-partitioned columnar archive of closed attendance days.
+
+    Each closed day lives in its own partition directory
+    (archive/date=YYYY-MM-DD/) as a Parquet file, or as a compressed NumPy
+    file when pyarrow is not installed. Range reads open only the partitions
+    in range and filter on name inside the file; retention deletes whole
+    partitions. The live attendance CSV keeps only the open day.
+    """
+
+    columns = ['Name', 'Date', 'Time', 'Status', 'StudentID']
+
+    def __init__(self, archive_dir='face-track-pro/attendance/archive', use_parquet=None):
+        self.archive_dir = archive_dir
+        if use_parquet is None:
+            use_parquet = importlib.util.find_spec('pyarrow') is not None
+        self.use_parquet = use_parquet
+
+    def partition_dir(self, day):
+        return os.path.join(self.archive_dir, f"date={day}")
+
+    def partition_file(self, day):
+        """Existing data file of a partition, or None"""
+        directory = self.partition_dir(day)
+        for filename in ('part.parquet', 'part.npz'):
+            path = os.path.join(directory, filename)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def list_partitions(self, start_date=None, end_date=None):
+        """Dates of partitions in [start_date, end_date], from directory names only"""
+        if not os.path.exists(self.archive_dir):
+            return []
+        days = []
+        for entry in os.listdir(self.archive_dir):
+            if not entry.startswith('date='):
+                continue
+            day = entry[5:]
+            if (start_date is None or day >= start_date) and (end_date is None or day <= end_date):
+                days.append(day)
+        return sorted(days)
+
+    def archive_closed_days(self, attendance_file, today=None):
+        """Move rows of days before today from the live CSV into partitions.
+
+        Rewrites the CSV, so writers must be held off: call it through
+        AttendanceLog.archive_closed_days(), which holds the log's lock.
+        """
+        today = today or date.today().strftime("%Y-%m-%d")
+        if not os.path.exists(attendance_file) or os.path.getsize(attendance_file) == 0:
+            return 0
+
+        closed = {}
+        open_rows = []
+        with open(attendance_file, newline='') as f:
+            for row in csv.DictReader(f):
+                day = row.get('Date') or today
+                if day < today:
+                    closed.setdefault(day, []).append(row)
+                else:
+                    open_rows.append(row)
+
+        if not closed:
+            return 0
+
+        for day, rows in closed.items():
+            self.write_partition(day, rows)
+
+        # Rewrite the live CSV with just the open day (small by construction)
+        tmp_file = f"{attendance_file}.tmp"
+        with open(tmp_file, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.columns, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(open_rows)
+        os.replace(tmp_file, attendance_file)
+
+        archived = sum(len(rows) for rows in closed.values())
+        print(f"Archived {archived} attendance records from {len(closed)} closed days")
+        return archived
+
+    def write_partition(self, day, rows):
+        """Write (or merge into) the partition for one day"""
+        existing = self.read_partition(day)
+        if existing:
+            seen = {self.row_key(row) for row in existing}
+            rows = existing + [row for row in rows if self.row_key(row) not in seen]
+
+        directory = self.partition_dir(day)
+        os.makedirs(directory, exist_ok=True)
+        data = {column: [row.get(column, '') for row in rows] for column in self.columns}
+
+        if self.use_parquet:
+            pd = lazy_import('pandas')
+            path = os.path.join(directory, 'part.parquet')
+            pd.DataFrame(data, columns=self.columns).to_parquet(f"{path}.tmp", engine='pyarrow', index=False)
+        else:
+            path = os.path.join(directory, 'part.npz')
+            with open(f"{path}.tmp", 'wb') as f:
+                np.savez_compressed(f, **{column: np.asarray(values, dtype=str) for column, values in data.items()})
+        os.replace(f"{path}.tmp", path)
+
+        # A partition holds one format; drop the other if the backend changed
+        for filename in ('part.parquet', 'part.npz'):
+            other = os.path.join(directory, filename)
+            if other != path and os.path.exists(other):
+                os.remove(other)
+
+    @staticmethod
+    def row_key(row):
+        """One record per student and day; older rows without an ID use the name"""
+        student_id = row.get('StudentID')
+        return (f"id:{student_id}" if student_id not in (None, '') else f"name:{row['Name']}", row['Date'])
+
+    def read_partition(self, day, names=None):
+        """Read one partition as a list of row dicts, filtered by name"""
+        path = self.partition_file(day)
+        if path is None:
+            return []
+
+        if path.endswith('.parquet'):
+            pd = lazy_import('pandas')
+            filters = [('Name', 'in', list(names))] if names else None
+            df = pd.read_parquet(path, engine='pyarrow', filters=filters)
+            return df.reindex(columns=self.columns, fill_value='').astype(str).to_dict('records')
+
+        with np.load(path) as data:
+            # Load the Name column first and only the matching rows of the others
+            name_column = data['Name']
+            mask = np.isin(name_column, list(names)) if names else slice(None)
+            # Partitions written before a column existed read it as empty strings
+            columns = {column: data[column][mask] if column in data.files else np.full(len(name_column), '')[mask]
+                       for column in self.columns}
+        return [dict(zip(self.columns, values)) for values in zip(*(columns[c].tolist() for c in self.columns))]
+
+    def read_range(self, start_date, end_date, names=None):
+        """Read archived rows between two dates (inclusive) as a DataFrame"""
+        pd = lazy_import('pandas')
+        rows = []
+        for day in self.list_partitions(start_date, end_date):
+            rows.extend(self.read_partition(day, names))
+        return pd.DataFrame(rows, columns=self.columns)
+
+    def count_rows(self):
+        """Total archived rows, read from file metadata rather than the data"""
+        total = 0
+        for day in self.list_partitions():
+            path = self.partition_file(day)
+            if path is None:
+                continue
+            if path.endswith('.parquet'):
+                parquet = lazy_import('pyarrow.parquet')
+                total += parquet.ParquetFile(path).metadata.num_rows
+            else:
+                with np.load(path) as data:
+                    total += len(data['Name'])
+        return total
+
+    def apply_retention(self, days_to_keep=90, today=None):
+        """Delete partitions older than the retention window"""
+        today = today or date.today()
+        cutoff = (today - timedelta(days=days_to_keep)).strftime("%Y-%m-%d")
+        expired = [day for day in self.list_partitions(end_date=cutoff) if day < cutoff]
+        for day in expired:
+            shutil.rmtree(self.partition_dir(day), ignore_errors=True)
+        return len(expired)
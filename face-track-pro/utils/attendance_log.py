@@ -0,0 +1,98 @@
+import csv
+import os
+import threading
+from datetime import datetime
+
+
+class AttendanceLog:
+    """Append-only attendance CSV with a daily-rotated dedup index.
+
+    Only the students already logged today are kept in memory; the index is
+    rebuilt from the CSV (streamed, not loaded into a DataFrame) when the date
+    changes, so memory stays bounded by one day of attendance. Students are
+    deduplicated by their integer ID, so namesakes are logged separately.
+    """
+
+    fieldnames = ['Name', 'Date', 'Time', 'Status', 'StudentID']
+
+    def __init__(self, attendance_file='face-track-pro/attendance/attendance.csv', archive=None):
+        self.attendance_file = attendance_file
+        self.archive = archive  # Optional AttendanceArchive that closed days are rolled into
+        self.current_date = None
+        self.logged_today = set()
+        self.lock = threading.Lock()
+
+    def log(self, name, when=None, status='Present', student_id=None):
+        """Append a record unless the student is already logged today.
+
+        Returns the written record, or None if it was a duplicate.
+        """
+        when = when or datetime.now()
+        record = {
+            'Name': name,
+            'Date': when.strftime("%Y-%m-%d"),
+            'Time': when.strftime("%H:%M:%S"),
+            'Status': status,
+            'StudentID': student_id if student_id is not None else ''
+        }
+
+        with self.lock:
+            if record['Date'] != self.current_date:
+                self.load_day(record['Date'])
+            key = self.dedup_key(record)
+            if key in self.logged_today:
+                return None
+
+            write_header = not os.path.exists(self.attendance_file) or os.path.getsize(self.attendance_file) == 0
+            with open(self.attendance_file, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                if write_header:
+                    writer.writeheader()
+                writer.writerow(record)
+            self.logged_today.add(key)
+
+        return record
+
+    def archive_closed_days(self, today=None, archive=None):
+        """Roll closed days into the archive without racing concurrent log() calls"""
+        archive = archive or self.archive
+        if archive is None:
+            return 0
+        with self.lock:
+            return archive.archive_closed_days(self.attendance_file, today)
+
+    @staticmethod
+    def dedup_key(record):
+        """Student ID, or the name for records written before IDs existed"""
+        student_id = record.get('StudentID')
+        return f"id:{student_id}" if student_id not in (None, '') else f"name:{record.get('Name')}"
+
+    def load_day(self, day):
+        """Rotate the dedup index to a new day, seeding it from the CSV"""
+        self.current_date = day
+        self.logged_today = set()
+        if self.archive is not None:
+            try:
+                self.archive.archive_closed_days(self.attendance_file, day)
+            except Exception as e:
+                print(f"Error archiving attendance: {e}")
+        if not os.path.exists(self.attendance_file):
+            return
+        with open(self.attendance_file, newline='') as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                if row.get('Date') == day:
+                    self.logged_today.add(self.dedup_key(row))
+            header = reader.fieldnames
+
+        if header is not None and header != self.fieldnames:
+            self.upgrade_header()
+
+    def upgrade_header(self):
+        """Rewrite a CSV with an older header so appended rows line up"""
+        tmp_file = f"{self.attendance_file}.tmp"
+        with open(self.attendance_file, newline='') as src, open(tmp_file, 'w', newline='') as dst:
+            writer = csv.DictWriter(dst, fieldnames=self.fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(csv.DictReader(src))
+        os.replace(tmp_file, self.attendance_file)
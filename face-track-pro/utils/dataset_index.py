@@ -0,0 +1,248 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+IMAGE_FORMATS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class DatasetIndex:
+    """Maintained inventory of the dataset directory.
+
+    For every student folder the index keeps each image's size, mtime, SHA-1
+    and encode status ('pending', 'encoded', 'no_face' or 'error'), plus the
+    folder's own mtime. Registration and training update it directly; a
+    background reconcile stats only the student directories and rescans the
+    ones whose mtime moved, so admin pages and stats never walk the tree.
+    Totals are kept up to date on every change.
+    """
+
+    def __init__(self, dataset_path='face-track-pro/dataset', index_path=None, reconcile_interval=60.0):
+        self.dataset_path = dataset_path
+        self.index_path = index_path or os.path.join(os.path.dirname(dataset_path.rstrip('/\\')), 'dataset_index.json')
+        self.reconcile_interval = reconcile_interval
+
+        self.folders = {}  # Folder -> {'dir_mtime', 'images': {filename: entry}}
+        self.summaries = {}  # Folder -> per-folder counts, derived from self.folders
+        self.totals = Counter()
+        self.loaded_mtime = None
+        self.last_reconciled = None
+        self.lock = threading.RLock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        self.load()
+
+    def load(self):
+        """Load the index file, if there is one"""
+        with self.lock:
+            self.folders, self.summaries, self.totals = {}, {}, Counter()
+            self.loaded_mtime = None
+            if not os.path.exists(self.index_path):
+                return
+            try:
+                with open(self.index_path) as f:
+                    data = json.load(f)
+                self.loaded_mtime = os.path.getmtime(self.index_path)
+            except (OSError, ValueError) as e:
+                print(f"Error loading dataset index: {e}")
+                return
+            for folder, record in data.get('folders', {}).items():
+                self.set_folder(folder, record)
+
+    def save(self):
+        """Write the index atomically"""
+        with self.lock:
+            directory = os.path.dirname(self.index_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.index_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'folders': self.folders}, f)
+            os.replace(tmp_path, self.index_path)
+            self.loaded_mtime = os.path.getmtime(self.index_path)
+
+    def set_folder(self, folder, record):
+        """Replace a folder record and adjust the running totals (caller holds the lock)"""
+        self.drop_folder(folder)
+        statuses = Counter(entry['status'] for entry in record['images'].values())
+        summary = {
+            'images': len(record['images']),
+            'statuses': dict(statuses),
+            'last_modified': max((entry['mtime'] for entry in record['images'].values()), default=record['dir_mtime'])
+        }
+        self.folders[folder] = record
+        self.summaries[folder] = summary
+        self.totals['students'] += 1
+        self.totals['images'] += summary['images']
+        self.totals.update(statuses)
+
+    def drop_folder(self, folder):
+        """Remove a folder record and its share of the totals (caller holds the lock)"""
+        if self.folders.pop(folder, None) is None:
+            return False
+        summary = self.summaries.pop(folder)
+        self.totals['students'] -= 1
+        self.totals['images'] -= summary['images']
+        self.totals.subtract(summary['statuses'])
+        return True
+
+    @staticmethod
+    def file_sha1(path):
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def sync_folder(self, folder, updates=None):
+        """Rescan one student folder; updates maps filename -> known status/faces/sha1.
+
+        Unchanged files (same size and mtime) keep their hash and status; new
+        or modified files are hashed and marked pending unless updates says
+        otherwise. Hashing runs outside the lock, so the result is merged into
+        the record as it is at write time: an entry another sync stored for
+        the same file version meanwhile wins over one derived from the older
+        snapshot. Does not save.
+        """
+        folder_path = os.path.join(self.dataset_path, folder)
+        updates = updates or {}
+        try:
+            dir_mtime = os.stat(folder_path).st_mtime
+            files = [entry for entry in os.scandir(folder_path)
+                     if entry.is_file() and entry.name.lower().endswith(IMAGE_FORMATS)]
+        except OSError:
+            with self.lock:
+                self.drop_folder(folder)
+            return
+
+        with self.lock:
+            previous = self.folders.get(folder, {}).get('images', {})
+        images = {}
+        for file in files:
+            old = previous.get(file.name)
+            known = updates.get(file.name, {})
+            try:
+                stat = file.stat()
+                unchanged = old is not None and old['size'] == stat.st_size and old['mtime'] == stat.st_mtime
+                sha1 = known.get('sha1') or (old['sha1'] if unchanged else self.file_sha1(file.path))
+            except OSError:
+                continue  # Removed while scanning
+            images[file.name] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'sha1': sha1,
+                'status': known.get('status') or (old['status'] if unchanged else 'pending'),
+                'faces': known.get('faces', old['faces'] if unchanged else None)
+            }
+
+        with self.lock:
+            current = self.folders.get(folder, {}).get('images', {})
+            for name, entry in images.items():
+                latest = current.get(name)
+                if (name not in updates and latest is not None and latest is not previous.get(name)
+                        and latest['size'] == entry['size'] and latest['mtime'] == entry['mtime']):
+                    images[name] = latest
+            for name, latest in current.items():
+                # Written by another sync after this scan listed the folder
+                if (name not in images and latest is not previous.get(name)
+                        and os.path.exists(os.path.join(folder_path, name))):
+                    images[name] = latest
+            self.set_folder(folder, {'dir_mtime': dir_mtime, 'images': images})
+
+    def remove_folder(self, folder):
+        with self.lock:
+            if self.drop_folder(folder):
+                self.save()
+
+    def prune(self, folders):
+        """Drop folders that are not in the given set (caller saves)"""
+        with self.lock:
+            for folder in [f for f in self.folders if f not in folders]:
+                self.drop_folder(folder)
+
+    def reconcile(self):
+        """Bring the index in line with the filesystem; returns the number of folders rescanned"""
+        with self.lock:
+            # Another process (CLI training, bulk import) may have saved a newer index
+            try:
+                if self.loaded_mtime is not None and os.path.getmtime(self.index_path) > self.loaded_mtime:
+                    self.load()
+            except OSError:
+                pass
+            known = {folder: record['dir_mtime'] for folder, record in self.folders.items()}
+
+        present = set()
+        rescanned = 0
+        if os.path.isdir(self.dataset_path):
+            for entry in os.scandir(self.dataset_path):
+                if not entry.is_dir():
+                    continue
+                present.add(entry.name)
+                if known.get(entry.name) != entry.stat().st_mtime:
+                    self.sync_folder(entry.name)
+                    rescanned += 1
+
+        with self.lock:
+            # Only folders seen before the scan can be gone; newer ones were added meanwhile
+            missing = set(known) - present
+            for folder in missing:
+                self.drop_folder(folder)
+            removed = len(missing)
+            if rescanned or removed or self.loaded_mtime is None:
+                self.save()
+            self.last_reconciled = time.time()
+        return rescanned + removed
+
+    def start(self):
+        """Reconcile in a background thread every reconcile_interval seconds"""
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+
+    def run(self):
+        # The first pass also builds the index on a fresh install
+        while True:
+            try:
+                self.reconcile()
+            except Exception as e:
+                print(f"Error reconciling dataset index: {e}")
+            if self.stop_event.wait(self.reconcile_interval):
+                break
+
+    def stop(self):
+        self.stop_event.set()
+
+    def student_count(self):
+        return self.totals['students']
+
+    def image_count(self):
+        return self.totals['images']
+
+    def folder_hashes(self, folder):
+        """SHA-1 -> file name of a folder's indexed images"""
+        with self.lock:
+            images = self.folders.get(folder, {}).get('images', {})
+            return {entry['sha1']: name for name, entry in images.items()}
+
+    def folder_summary(self, folder):
+        with self.lock:
+            summary = self.summaries.get(folder)
+            return dict(summary) if summary else None
+
+    def list_folders(self):
+        """(folder, summary) pairs, without touching the filesystem"""
+        with self.lock:
+            return [(folder, dict(summary)) for folder, summary in sorted(self.summaries.items())]
+
+    def get_stats(self):
+        with self.lock:
+            stats = {key: count for key, count in self.totals.items() if count}
+            stats.setdefault('students', 0)
+            stats.setdefault('images', 0)
+        stats['last_reconciled'] = (time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_reconciled))
+                                    if self.last_reconciled else None)
+        return stats
@@ -0,0 +1,204 @@
+import hashlib
+import os
+import threading
+import numpy as np
+from utils.startup import lazy_import
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+class EncodingCache:
+    """Content-addressed on-disk cache of face locations and encodings.
+
+    Entries are keyed by the SHA-1 of the image bytes plus the detector and
+    encoder parameters, so validation, training and re-registration of the
+    same file reuse one decode and detection pass. Each entry is a small .npz
+    file; the least recently used entries are evicted once the cache exceeds
+    max_bytes.
+    """
+
+    def __init__(self, cache_dir='face-track-pro/cache/encodings', max_bytes=256 * 1024 * 1024,
+                 detection_model='hog', upsample=1, num_jitters=1, detector=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.detection_model = detection_model
+        self.upsample = upsample
+        self.num_jitters = num_jitters
+        self.detector = detector  # Optional detectors.FaceDetector overriding detection_model/upsample
+
+        self.hits = 0
+        self.misses = 0
+        self.entries = None  # key -> (size, last_used), loaded on first use
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def shared(cls, cache_dir='face-track-pro/cache/encodings', detector=None):
+        """The process-wide cache for a cache directory and detector parameters.
+
+        Detectors with the same cache_tag() share one instance; a detector
+        whose results are not cacheable gets a cache of its own.
+        """
+        candidate = cls(cache_dir, detector=detector)
+        tag = candidate.params_tag()
+        if tag is None:
+            return candidate
+        with _shared_lock:
+            return _shared.setdefault((cache_dir, tag), candidate)
+
+    def params_tag(self):
+        """Model parameters that make up part of every cache key, or None if results are not cacheable"""
+        if self.detector is not None:
+            tag = self.detector.cache_tag()
+            return f"{tag}:{self.num_jitters}" if tag is not None else None
+        return f"{self.detection_model}:{self.upsample}:{self.num_jitters}"
+
+    def cache_key(self, image_path):
+        """Hash the image contents together with the model parameters (None: do not cache)"""
+        tag = self.params_tag()
+        if tag is None:
+            return None
+        digest = hashlib.sha1()
+        with open(image_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        digest.update(tag.encode())
+        return digest.hexdigest()
+
+    def bytes_key(self, data):
+        """Cache key for image bytes held in memory (None: do not cache)"""
+        tag = self.params_tag()
+        if tag is None:
+            return None
+        digest = hashlib.sha1(data)
+        digest.update(tag.encode())
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        """Path of the .npz file for a cache key"""
+        return os.path.join(self.cache_dir, key[:2], f"{key}.npz")
+
+    def load_index(self):
+        """Scan the cache directory once to learn entry sizes and ages"""
+        if self.entries is not None:
+            return
+        self.entries = {}
+        self.total_bytes = 0
+        if not os.path.exists(self.cache_dir):
+            return
+        for root, dirs, files in os.walk(self.cache_dir):
+            for filename in files:
+                if not filename.endswith('.npz'):
+                    continue
+                stat = os.stat(os.path.join(root, filename))
+                self.entries[filename[:-4]] = (stat.st_size, stat.st_mtime)
+                self.total_bytes += stat.st_size
+
+    def get(self, key):
+        """Return cached (face_locations, face_encodings) or None"""
+        with self.lock:
+            self.load_index()
+            if key is None or key not in self.entries:
+                self.misses += 1
+                return None
+
+        path = self.entry_path(key)
+        try:
+            with np.load(path) as data:
+                locations = [tuple(int(v) for v in row) for row in data['locations']]
+                encodings = list(data['encodings'])
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            with self.lock:
+                self.discard(key)
+                self.misses += 1
+            return None
+
+        with self.lock:
+            size = self.entries[key][0] if key in self.entries else 0
+            self.entries[key] = (size, os.path.getmtime(path))
+            self.hits += 1
+        return locations, encodings
+
+    def put(self, key, face_locations, face_encodings):
+        """Store face locations and encodings for a cache key; a None key is not stored"""
+        if key is None:
+            return
+        path = self.entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        locations = np.asarray(face_locations, dtype=np.int32).reshape(-1, 4)
+        encodings = np.asarray(face_encodings, dtype=np.float64).reshape(-1, 128)
+
+        # Write to a temporary file first so readers never see a partial entry
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, locations=locations, encodings=encodings)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            self.load_index()
+            size = os.path.getsize(path)
+            if key in self.entries:
+                self.total_bytes -= self.entries[key][0]
+            self.entries[key] = (size, os.path.getmtime(path))
+            self.total_bytes += size
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1][1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self.discard(key)
+
+    def discard(self, key):
+        """Remove one entry from disk and the index"""
+        size = self.entries.pop(key, (0, 0))[0]
+        self.total_bytes -= size
+        try:
+            os.remove(self.entry_path(key))
+        except OSError:
+            pass
+
+    def detect(self, image):
+        """Detect faces in an RGB image with the cache's detector settings"""
+        if self.detector is not None:
+            return self.detector.detect(image)
+        face_recognition = lazy_import('face_recognition')
+        return face_recognition.face_locations(
+            image, number_of_times_to_upsample=self.upsample, model=self.detection_model
+        )
+
+    def get_or_compute(self, image_path):
+        """Return (face_locations, face_encodings) for an image, using the cache"""
+        key = self.cache_key(image_path)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        face_recognition = lazy_import('face_recognition')
+        image = face_recognition.load_image_file(image_path)
+        face_locations = self.detect(image)
+        face_encodings = face_recognition.face_encodings(
+            image, face_locations, num_jitters=self.num_jitters
+        )
+        self.put(key, face_locations, face_encodings)
+        return face_locations, face_encodings
+
+    def get_stats(self):
+        """Get cache hit/miss counts and size"""
+        with self.lock:
+            self.load_index()
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'size_bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / total) if total else 0.0
+            }
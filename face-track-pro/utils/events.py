@@ -0,0 +1,108 @@
+import json
+import threading
+import time
+from collections import deque
+
+
+class EventBroadcaster:
+    """In-memory fan-out of server events to Server-Sent Events clients.
+
+    Producers call publish() once per event; every connected client reads the
+    same buffered event, so no client ever triggers recomputation. A bounded
+    history lets reconnecting clients resume from their Last-Event-ID.
+    """
+
+    def __init__(self, history_size=500, heartbeat_interval=15.0, max_subscribers=100):
+        self.history = deque(maxlen=history_size)
+        self.max_subscribers = max_subscribers
+        self.subscribers = 0
+        self.heartbeat_interval = heartbeat_interval
+        self.last_event_id = 0
+        self.condition = threading.Condition()
+
+    def publish(self, event, data):
+        """Publish an event to all subscribers and return its ID"""
+        with self.condition:
+            self.last_event_id += 1
+            self.history.append((self.last_event_id, event, json.dumps(data, default=str)))
+            self.condition.notify_all()
+            return self.last_event_id
+
+    def events_since(self, last_event_id):
+        """Return buffered events newer than last_event_id"""
+        with self.condition:
+            return [item for item in self.history if item[0] > last_event_id]
+
+    def is_full(self):
+        """Check whether the subscriber cap has been reached"""
+        with self.condition:
+            return self.subscribers >= self.max_subscribers
+
+    def subscribe(self, last_event_id=None):
+        """Generator yielding SSE-formatted messages for one client"""
+        with self.condition:
+            self.subscribers += 1
+        try:
+            yield from self.stream(last_event_id)
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+    def stream(self, last_event_id):
+        """Replay missed events, then stream live ones"""
+        reason = None
+        with self.condition:
+            if last_event_id is not None and last_event_id > self.last_event_id:
+                # An ID this server never issued (e.g. from before a restart): the
+                # client's view cannot be patched with deltas, so it must reload
+                reason = 'unknown_event_id'
+            elif last_event_id is not None and last_event_id + 1 < (
+                    self.history[0][0] if self.history else self.last_event_id + 1):
+                # The client missed events that were already evicted
+                reason = 'history_expired'
+            if last_event_id is None or reason is not None:
+                last_event_id = self.last_event_id
+
+        if reason is not None:
+            yield self.format_message(None, 'resync', json.dumps({'reason': reason}))
+
+        yield 'retry: 3000\n\n'
+
+        while True:
+            with self.condition:
+                if self.last_event_id <= last_event_id:
+                    self.condition.wait(timeout=self.heartbeat_interval)
+                pending = [item for item in self.history if item[0] > last_event_id]
+
+            if not pending:
+                # Comment line keeps proxies from closing an idle connection
+                yield f': heartbeat {int(time.time())}\n\n'
+                continue
+
+            if pending[0][0] > last_event_id + 1:
+                # This client fell more than history_size events behind and the gap
+                # was evicted: it must reload, as on a reconnect past the history
+                last_event_id = pending[-1][0]
+                yield self.format_message(None, 'resync', json.dumps({'reason': 'history_expired'}))
+                continue
+
+            for event_id, event, payload in pending:
+                last_event_id = event_id
+                yield self.format_message(event_id, event, payload)
+
+    @staticmethod
+    def format_message(event_id, event, payload):
+        """Format a single SSE message"""
+        message = ''
+        if event_id is not None:
+            message += f'id: {event_id}\n'
+        message += f'event: {event}\ndata: {payload}\n\n'
+        return message
+
+    @staticmethod
+    def parse_last_event_id(value):
+        """Parse a Last-Event-ID header or query value"""
+        try:
+            return int(value) if value not in (None, '') else None
+        except (TypeError, ValueError):
+            return None
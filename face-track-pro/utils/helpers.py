@@ -1,7 +1,7 @@
 import os
-import pandas as pd
 from datetime import datetime, date, timedelta
 import csv
+from utils.startup import lazy_import
 
 def ensure_directories():
     """Ensure all required directories exist"""
@@ -21,7 +21,16 @@ def ensure_directories():
     if not os.path.exists(attendance_file):
         with open(attendance_file, 'w', newline='') as f:
             writer = csv.writer(f)
-            writer.writerow(['Name', 'Date', 'Time', 'Status'])
+            writer.writerow(['Name', 'Date', 'Time', 'Status', 'StudentID'])
+
+def load_dataset_index(dataset_index=None):
+    """Shared dataset index, or one read from disk (built by a scan the first time)"""
+    if dataset_index is None:
+        from utils.dataset_index import DatasetIndex
+        dataset_index = DatasetIndex()
+        if dataset_index.loaded_mtime is None:
+            dataset_index.reconcile()
+    return dataset_index
 
 def format_time(timestamp=None):
     """Format timestamp for display"""
@@ -41,11 +50,16 @@ def format_datetime(datetime_obj=None):
         datetime_obj = datetime.now()
     return datetime_obj.strftime("%Y-%m-%d %H:%M:%S")
 
-def get_attendance_stats():
+def is_late_arrival(time_str, late_time='09:00:00'):
+    """Check whether an HH:MM:SS time string is after the late arrival threshold"""
+    return time_str > late_time
+
+def get_attendance_stats(dataset_index=None):
     """Get comprehensive attendance statistics"""
-    attendance_file = 'face-track-pro/attendance/attendance.csv'
+    pd = lazy_import('pandas')
     
     stats = {
+        'date': date.today().strftime("%Y-%m-%d"),  # Lets the dashboard notice a day rollover
         'total_students': 0,
         'present_today': 0,
         'absent_today': 0,
@@ -57,40 +71,35 @@ def get_attendance_stats():
     
     try:
         # Get registered students count
-        dataset_dir = 'face-track-pro/dataset'
-        if os.path.exists(dataset_dir):
-            stats['total_students'] = len([d for d in os.listdir(dataset_dir) 
-                                         if os.path.isdir(os.path.join(dataset_dir, d))])
+        stats['total_students'] = load_dataset_index(dataset_index).student_count()
         
-        # Read attendance data
-        if os.path.exists(attendance_file) and os.path.getsize(attendance_file) > 0:
-            df = pd.read_csv(attendance_file)
+        # Read the last 7 days of attendance (archive partitions plus the live CSV)
+        today = stats['date']
+        week_start = (date.today() - timedelta(days=6)).strftime("%Y-%m-%d")
+        df = load_attendance_records(week_start, today)
+        
+        if not df.empty:
+            # Today's attendance
+            today_df = df[df['Date'] == today].copy()
+            stats['present_today'] = len(today_df)
+            
+            # Calculate attendance rate
+            if stats['total_students'] > 0:
+                stats['attendance_rate'] = (stats['present_today'] / stats['total_students']) * 100
+            
+            # Today's attendance list
+            stats['today_attendance'] = today_df.to_dict('records')
+            
+            # Recent attendance (last 7 days)
+            stats['recent_attendance'] = df.tail(10).to_dict('records')
             
-            if not df.empty:
-                today = date.today().strftime("%Y-%m-%d")
-                
-                # Today's attendance
-                today_df = df[df['Date'] == today]
-                stats['present_today'] = len(today_df)
-                stats['absent_today'] = max(0, stats['total_students'] - stats['present_today'])
-                
-                # Calculate attendance rate
-                if stats['total_students'] > 0:
-                    stats['attendance_rate'] = (stats['present_today'] / stats['total_students']) * 100
-                
-                # Today's attendance list
-                stats['today_attendance'] = today_df.to_dict('records')
-                
-                # Recent attendance (last 7 days)
-                recent_dates = [(date.today() - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(7)]
-                recent_df = df[df['Date'].isin(recent_dates)]
-                stats['recent_attendance'] = recent_df.tail(10).to_dict('records')
-                
-                # Calculate late arrivals (after 9:00 AM)
-                today_df['Time'] = pd.to_datetime(today_df['Time'], format='%H:%M:%S').dt.time
-                late_time = pd.to_datetime('09:00:00', format='%H:%M:%S').time()
-                stats['late_today'] = len(today_df[today_df['Time'] > late_time])
+            # Calculate late arrivals (after 9:00 AM)
+            today_df['Time'] = pd.to_datetime(today_df['Time'], format='%H:%M:%S').dt.time
+            late_time = pd.to_datetime('09:00:00', format='%H:%M:%S').time()
+            stats['late_today'] = len(today_df[today_df['Time'] > late_time])
         
+        stats['absent_today'] = max(0, stats['total_students'] - stats['present_today'])
+    
     except Exception as e:
         print(f"Error calculating attendance stats: {e}")
     
@@ -98,63 +107,77 @@ def get_attendance_stats():
 
 def get_weekly_attendance():
     """Get weekly attendance statistics"""
-    attendance_file = 'face-track-pro/attendance/attendance.csv'
     weekly_stats = {}
     
     try:
-        if os.path.exists(attendance_file) and os.path.getsize(attendance_file) > 0:
-            df = pd.read_csv(attendance_file)
-            
-            # Get last 7 days
-            for i in range(7):
-                check_date = (date.today() - timedelta(days=i)).strftime("%Y-%m-%d")
-                day_attendance = len(df[df['Date'] == check_date])
-                weekly_stats[check_date] = day_attendance
+        week_start = (date.today() - timedelta(days=6)).strftime("%Y-%m-%d")
+        df = load_attendance_records(week_start, date.today().strftime("%Y-%m-%d"))
+        daily_counts = df.groupby('Date').size().to_dict()
+        
+        # Get last 7 days
+        for i in range(7):
+            check_date = (date.today() - timedelta(days=i)).strftime("%Y-%m-%d")
+            weekly_stats[check_date] = int(daily_counts.get(check_date, 0))
     
     except Exception as e:
         print(f"Error getting weekly attendance: {e}")
     
     return weekly_stats
 
-def export_attendance_report(start_date=None, end_date=None):
-    """Export attendance report for a date range"""
-    attendance_file = 'face-track-pro/attendance/attendance.csv'
-    
+def export_attendance_report(start_date=None, end_date=None, names=None):
+    """Export attendance report for a date range, optionally for some students"""
     if start_date is None:
         start_date = (date.today() - timedelta(days=30)).strftime("%Y-%m-%d")
     if end_date is None:
         end_date = date.today().strftime("%Y-%m-%d")
     
     try:
-        if os.path.exists(attendance_file) and os.path.getsize(attendance_file) > 0:
-            df = pd.read_csv(attendance_file)
-            
-            # Filter by date range
-            mask = (df['Date'] >= start_date) & (df['Date'] <= end_date)
-            filtered_df = df[mask]
-            
-            # Generate report
-            report = {
-                'total_records': len(filtered_df),
-                'unique_students': filtered_df['Name'].nunique(),
-                'date_range': f"{start_date} to {end_date}",
-                'daily_summary': filtered_df.groupby('Date').size().to_dict(),
-                'student_summary': filtered_df.groupby('Name').size().to_dict()
-            }
-            
-            return report, filtered_df
+        # Only the archive partitions inside the range are read
+        filtered_df = load_attendance_records(start_date, end_date, names)
+        
+        # Generate report
+        report = {
+            'total_records': len(filtered_df),
+            'unique_students': filtered_df['Name'].nunique(),
+            'date_range': f"{start_date} to {end_date}",
+            'daily_summary': filtered_df.groupby('Date').size().to_dict(),
+            'student_summary': filtered_df.groupby('Name').size().to_dict()
+        }
+        
+        return report, filtered_df
     
     except Exception as e:
         print(f"Error generating attendance report: {e}")
         return None, None
 
+def load_attendance_records(start_date=None, end_date=None, names=None):
+    """Load attendance rows in a date range from the archive and the live CSV"""
+    pd = lazy_import('pandas')
+    from utils.attendance_archive import AttendanceArchive
+    attendance_file = 'face-track-pro/attendance/attendance.csv'
+    
+    frames = [AttendanceArchive().read_range(start_date, end_date, names)]
+    if os.path.exists(attendance_file) and os.path.getsize(attendance_file) > 0:
+        live_df = pd.read_csv(attendance_file, dtype=str)
+        mask = pd.Series(True, index=live_df.index)
+        if start_date is not None:
+            mask &= live_df['Date'] >= start_date
+        if end_date is not None:
+            mask &= live_df['Date'] <= end_date
+        if names:
+            mask &= live_df['Name'].isin(list(names))
+        frames.append(live_df[mask])
+    
+    return pd.concat(frames, ignore_index=True)
+
 def validate_image_for_face(image_path):
     """Validate if an image contains a detectable face"""
     try:
-        import face_recognition
+        from utils.encoding_cache import EncodingCache
         
-        image = face_recognition.load_image_file(image_path)
-        face_locations = face_recognition.face_locations(image)
+        # Shares cache entries with FaceTrainer, so a later training run skips detection;
+        # one instance per process keeps the index scan and hit counts across calls
+        face_locations, _ = EncodingCache.shared().get_or_compute(image_path)
         
         return len(face_locations) > 0, len(face_locations)
     
@@ -162,35 +185,31 @@ def validate_image_for_face(image_path):
         print(f"Error validating image {image_path}: {e}")
         return False, 0
 
-def cleanup_old_logs(days_to_keep=90):
-    """Clean up old attendance logs"""
-    attendance_file = 'face-track-pro/attendance/attendance.csv'
+def cleanup_old_logs(days_to_keep=90, attendance_log=None):
+    """Archive closed days and drop archive partitions past the retention window.
+
+    Pass the AttendanceLog that is appending to the CSV (the app's), so the
+    rewrite holds its lock.
+    """
+    from utils.attendance_archive import AttendanceArchive
+    from utils.attendance_log import AttendanceLog
     
     try:
-        if os.path.exists(attendance_file) and os.path.getsize(attendance_file) > 0:
-            df = pd.read_csv(attendance_file)
-            
-            cutoff_date = (date.today() - timedelta(days=days_to_keep)).strftime("%Y-%m-%d")
-            
-            # Keep only recent records
-            recent_df = df[df['Date'] >= cutoff_date]
-            
-            if len(recent_df) < len(df):
-                # Backup old file
-                backup_file = f"face-track-pro/attendance/attendance_backup_{datetime.now().strftime('%Y%m%d')}.csv"
-                df.to_csv(backup_file, index=False)
-                
-                # Save cleaned data
-                recent_df.to_csv(attendance_file, index=False)
-                
-                print(f"Cleaned up {len(df) - len(recent_df)} old records")
-                print(f"Backup saved to {backup_file}")
+        attendance_log = attendance_log or AttendanceLog()
+        archive = attendance_log.archive or AttendanceArchive()
+        attendance_log.archive_closed_days(archive=archive)
+        
+        # Retention removes whole date partitions; nothing is rewritten
+        removed = archive.apply_retention(days_to_keep)
+        if removed:
+            print(f"Removed {removed} archived days older than {days_to_keep} days")
     
     except Exception as e:
         print(f"Error cleaning up logs: {e}")
 
-def get_system_status():
+def get_system_status(dataset_index=None):
     """Get system status information"""
+    pd = lazy_import('pandas')
     status = {
         'model_exists': os.path.exists('face-track-pro/local.pkl'),
         'dataset_size': 0,
@@ -200,12 +219,9 @@ def get_system_status():
     
     try:
         # Check dataset size
-        dataset_dir = 'face-track-pro/dataset'
-        if os.path.exists(dataset_dir):
-            total_images = 0
-            for root, dirs, files in os.walk(dataset_dir):
-                total_images += len([f for f in files if f.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp'))])
-            status['dataset_size'] = total_images
+        dataset_index = load_dataset_index(dataset_index)
+        status['dataset_size'] = dataset_index.image_count()
+        status['dataset'] = dataset_index.get_stats()
         
         # Check attendance records
         attendance_file = 'face-track-pro/attendance/attendance.csv'
@@ -213,6 +229,9 @@ def get_system_status():
             df = pd.read_csv(attendance_file)
             status['attendance_records'] = len(df)
         
+        from utils.attendance_archive import AttendanceArchive
+        status['attendance_records'] += AttendanceArchive().count_rows()
+        
         # Check last training time
         model_file = 'face-track-pro/local.pkl'
         if os.path.exists(model_file):
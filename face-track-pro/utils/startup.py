@@ -0,0 +1,58 @@
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Heavy modules (cv2, face_recognition/dlib, pandas) are imported on first use
+# through lazy_import() so the server binds and CLI commands start quickly.
+_process_start = time.time()
+_import_times = {}
+_phase_times = {}
+_lock = threading.Lock()
+
+
+def lazy_import(module_name):
+    """Import a module on first use and record how long the import took"""
+    already_imported = module_name in sys.modules
+
+    # import_module also waits for an import still in progress on another thread
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    elapsed = time.perf_counter() - start
+
+    if not already_imported:
+        with _lock:
+            _import_times.setdefault(module_name, elapsed)
+    return module
+
+
+@contextmanager
+def record_phase(name):
+    """Time a startup phase such as model loading or detector warm-up"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        with _lock:
+            _phase_times[name] = time.perf_counter() - start
+
+
+def startup_report():
+    """Get import and startup phase timings in milliseconds"""
+    with _lock:
+        return {
+            'imports_ms': {name: round(t * 1000, 1) for name, t in _import_times.items()},
+            'phases_ms': {name: round(t * 1000, 1) for name, t in _phase_times.items()},
+            'uptime_s': round(time.time() - _process_start, 1)
+        }
+
+
+def print_startup_report():
+    """Print the startup report to the console"""
+    report = startup_report()
+    print("Startup report:")
+    for name, ms in report['imports_ms'].items():
+        print(f"  import {name}: {ms} ms")
+    for name, ms in report['phases_ms'].items():
+        print(f"  {name}: {ms} ms")
@@ -0,0 +1,237 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl  # Cross-process lock around read-modify-write (POSIX only)
+except ImportError:
+    fcntl = None
+
+UNKNOWN_ID = -1  # Label of a face that matched no enrolled student
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+class StudentRegistry:
+    """Enrolled students keyed by USN, each with a stable integer ID.
+
+    The gallery, tracks and attendance records carry only the integer ID;
+    names are looked up here when something is displayed. Each student also
+    owns a dataset folder, so two students with the same name no longer share
+    (and overwrite) one folder.
+
+    Use StudentRegistry.shared() so every component of a process works on one
+    instance. Changes re-read the file first (under a file lock where the
+    platform has one), so another process such as a CLI bulk import cannot
+    be handed the same ID or have its students dropped by a stale save.
+    """
+
+    def __init__(self, registry_path='face-track-pro/students.json'):
+        self.registry_path = registry_path
+        self.students = {}  # id -> {'id', 'usn', 'name', 'folder'}
+        self.by_usn = {}
+        self.by_folder = {}
+        self.next_id = 1
+        self.loaded_stat = None  # (inode, mtime) of the file as last read or written
+        self.lock = threading.RLock()
+        self.load()
+
+    @classmethod
+    def shared(cls, registry_path='face-track-pro/students.json'):
+        """The process-wide registry for a registry file"""
+        with _shared_lock:
+            registry = _shared.get(registry_path)
+            if registry is None:
+                registry = _shared[registry_path] = cls(registry_path)
+            return registry
+
+    def load(self):
+        """Load the registry file, if there is one"""
+        with self.lock:
+            self.students, self.by_usn, self.by_folder = {}, {}, {}
+            self.next_id = 1
+            self.loaded_stat = None
+            if not os.path.exists(self.registry_path):
+                return
+            try:
+                self.loaded_stat = self.file_stat()
+                with open(self.registry_path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error loading student registry: {e}")
+                return
+            for student in data.get('students', []):
+                self.index(student)
+            self.next_id = max(data.get('next_id', 1), max(self.students, default=0) + 1)
+
+    def file_stat(self):
+        # Every save replaces the file, so the inode changes even within one mtime tick
+        stat = os.stat(self.registry_path)
+        return stat.st_ino, stat.st_mtime_ns
+
+    def refresh(self):
+        """Reload if another process saved the file since it was loaded"""
+        with self.lock:
+            try:
+                current = self.file_stat()
+            except OSError:
+                return
+            if current != self.loaded_stat:
+                self.load()
+
+    @contextmanager
+    def updating(self):
+        """Hold the thread and file locks and reload before a change is made"""
+        with self.lock:
+            lock_file = None
+            if fcntl is not None:
+                directory = os.path.dirname(self.registry_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                lock_file = open(f"{self.registry_path}.lock", 'a')
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                self.refresh()
+                yield
+            finally:
+                if lock_file is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                    lock_file.close()
+
+    def save(self):
+        """Write the registry atomically (callers hold updating())"""
+        with self.lock:
+            data = {'next_id': self.next_id, 'students': sorted(self.students.values(), key=lambda s: s['id'])}
+            directory = os.path.dirname(self.registry_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.registry_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.registry_path)
+            self.loaded_stat = self.file_stat()
+
+    def index(self, student):
+        self.students[student['id']] = student
+        if student.get('usn'):
+            self.by_usn[student['usn']] = student['id']
+        self.by_folder[student['folder']] = student['id']
+
+    @staticmethod
+    def normalize_usn(usn):
+        return usn.strip().upper() if usn and usn.strip() else None
+
+    def register(self, name, usn=None, folder=None):
+        """Return the record for a student, creating it if needed.
+
+        A known USN keeps its ID (the name is updated). Without a USN the
+        student is identified by its dataset folder, which is how galleries
+        trained before the registry existed are adopted.
+        """
+        usn = self.normalize_usn(usn)
+        with self.updating():
+            student_id = self.by_usn.get(usn) if usn else None
+            if student_id is None and folder is not None:
+                student_id = self.by_folder.get(folder)
+                if student_id is not None and usn and self.students[student_id].get('usn') not in (None, usn):
+                    student_id = None  # Folder belongs to a different student
+            if student_id is None and folder is None:
+                # Same-name folder: adopt it unless it already belongs to another USN
+                candidate = self.by_folder.get(self.base_folder(name))
+                if candidate is not None and (usn is None or self.students[candidate].get('usn') is None):
+                    student_id = candidate
+
+            if student_id is not None:
+                student = self.students[student_id]
+                changed = student['name'] != name or (usn and student.get('usn') != usn)
+                student['name'] = name
+                if usn:
+                    student['usn'] = usn
+                    self.by_usn[usn] = student_id
+                if changed:
+                    self.save()
+                return dict(student)
+
+            student = {
+                'id': self.next_id,
+                'usn': usn,
+                'name': name,
+                'folder': folder or self.free_folder(name, usn)
+            }
+            self.next_id += 1
+            self.index(student)
+            self.save()
+            return dict(student)
+
+    @staticmethod
+    def base_folder(name):
+        return name.lower().replace(' ', '_')
+
+    def free_folder(self, name, usn):
+        """Dataset folder for a new student that no other student owns"""
+        folder = self.base_folder(name)
+        if folder in self.by_folder and usn:
+            folder = f"{folder}_{usn.lower()}"
+        suffix = 2
+        candidate = folder
+        while candidate in self.by_folder:
+            candidate = f"{folder}_{suffix}"
+            suffix += 1
+        return candidate
+
+    def remove(self, student_id):
+        """Forget a student; the ID is never reused"""
+        with self.updating():
+            student = self.students.pop(student_id, None)
+            if student is None:
+                return False
+            self.by_folder.pop(student['folder'], None)
+            if student.get('usn'):
+                self.by_usn.pop(student['usn'], None)
+            self.save()
+            return True
+
+    def get(self, student_id):
+        with self.lock:
+            student = self.students.get(student_id)
+            return dict(student) if student else None
+
+    def id_for_usn(self, usn):
+        with self.lock:
+            self.refresh()
+            return self.by_usn.get(self.normalize_usn(usn))
+
+    def id_for_folder(self, folder):
+        with self.lock:
+            self.refresh()
+            return self.by_folder.get(folder)
+
+    def name_of(self, student_id):
+        with self.lock:
+            student = self.students.get(student_id)
+            return student['name'] if student else "Unknown"
+
+    def __len__(self):
+        return len(self.students)
+
+
+def gallery_labels(data, registry=None):
+    """Integer labels and an id -> name map for a loaded gallery pickle.
+
+    Galleries trained before the registry stored one name string per row;
+    those names are mapped onto registry IDs by their dataset folder.
+    """
+    if 'labels' in data:
+        labels = np.asarray(data['labels'], dtype=np.int32)
+        return labels, {int(k): v for k, v in data.get('students', {}).items()}
+
+    registry = registry or StudentRegistry.shared()
+    label_of = {}
+    for name in data.get('names', []):
+        if name not in label_of:
+            label_of[name] = registry.register(name, folder=StudentRegistry.base_folder(name))['id']
+    labels = np.asarray([label_of[name] for name in data.get('names', [])], dtype=np.int32)
+    return labels, {student_id: name for name, student_id in label_of.items()}